@@ -3,74 +3,200 @@
 import os
 import tempfile
 import subprocess
-from google import genai
 import textwrap
 import shutil
+from functools import lru_cache
 from dotenv import load_dotenv
 
+import encoding
+
 load_dotenv()
 
 THUMBNAIL_DIR = "thumbnails"
 
 # ---------------------------
-# ⚡ Set ImageMagick executable path here
-# Example: r"C:\Program Files\ImageMagick-7.1.1-Q16\magick.exe"
-IMAGEMAGICK_PATH = r"C:\Program Files\ImageMagick-7.1.2-Q16-HDRI\magick.exe"
+# Text overlay style (Pillow)
+# ---------------------------
+# First font that exists wins; set OVERLAY_FONT to force one.
+FONT_CANDIDATES = [
+    os.getenv("OVERLAY_FONT"),
+    r"C:\Windows\Fonts\arialbd.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+    "/Library/Fonts/Arial Bold.ttf",
+    "DejaVuSans-Bold.ttf",
+]
+TEXT_POINTSIZE = 100          # at 1080 px wide; scaled with the image width
+TEXT_FILL = (0, 0, 0, 255)
+TEXT_STROKE_FILL = (0, 0, 0, 255)
+TEXT_STROKE_WIDTH = 5
+TEXT_UNDERCOLOR = (255, 255, 255, 204)   # rgba(255,255,255,0.8)
+TEXT_WRAP_CHARS = 20
 
 
 # ---------------------------
 # Step 1: Generate Hook Text
 # ---------------------------
-def generate_hook_text(topic: str, api_key: str) -> str:
-    client = genai.Client(api_key=api_key)
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            topic,
-            "Create an engaging hook text for a thumbnail and video. "
-            "You can use emojis."
-            "Response one line only. Max 6-8 words."
-        ]
-    )
-    return response.text.strip()
+def generate_hook_text(topic: str, api_key: str, script_text: str = None) -> str:
+    """
+    Hook text from the topic's content package (generated once, shared with script and metadata).
+    Pass `script_text` when the script was supplied, so the hook is written for that script.
+    """
+    from content_package import get_content_package
+
+    return get_content_package(topic, script_text=script_text, api_key=api_key)["hook_text"]
 
 
 # ---------------------------
-# Step 2: Overlay Text on Image (ImageMagick)
+# Step 2: Overlay Text on Image (Pillow)
 # ---------------------------
-def overlay_text_on_image(image_path: str, text: str, output_path: str):
+@lru_cache(maxsize=None)
+def _font_path():
+    for candidate in FONT_CANDIDATES:
+        if candidate and (os.path.exists(candidate) or not os.path.dirname(candidate)):
+            try:
+                from PIL import ImageFont
+                ImageFont.truetype(candidate, 10)
+                return candidate
+            except OSError:
+                continue
+    return None
+
+
+@lru_cache(maxsize=32)
+def load_font(size: int):
+    """Returns a cached bold TrueType font at `size` px (Pillow's default if none is found)."""
+    from PIL import ImageFont
+
+    path = _font_path()
+    if path is None:
+        print("⚠️ No bold TrueType font found, using Pillow default. Set OVERLAY_FONT.")
+        return ImageFont.load_default()
+    return ImageFont.truetype(path, size)
+
+
+def _is_emoji(ch: str) -> bool:
+    cp = ord(ch)
+    return (
+        0x1F000 <= cp <= 0x1FAFF
+        or 0x2600 <= cp <= 0x27BF
+        or 0x2B00 <= cp <= 0x2BFF
+    )
+
+
+def _split_runs(line: str):
+    """Splits a line into [(is_emoji, text)] runs; emoji runs keep ZWJ sequences together."""
+    runs = []
+    i = 0
+    while i < len(line):
+        if _is_emoji(line[i]):
+            j = i + 1
+            while j < len(line) and (line[j] in "\u200d\ufe0f" or (line[j - 1] == "\u200d" and _is_emoji(line[j]))):
+                j += 1
+            runs.append((True, line[i:j]))
+            i = j
+        else:
+            j = i
+            while j < len(line) and not _is_emoji(line[j]):
+                j += 1
+            runs.append((False, line[i:j]))
+            i = j
+    return runs
+
+
+@lru_cache(maxsize=64)
+def _emoji_image(sequence: str, height: int, assets_dir: str = None):
+    """
+    Twemoji PNG for an emoji sequence scaled to `height`, or None if unavailable.
+    The PNG is written to `assets_dir` (default: transcribe.TEMP_ASSETS).
+    """
+    from PIL import Image
+    from transcribe import download_emoji_png, TEMP_ASSETS
+
+    code = "-".join(f"{ord(c):x}" for c in sequence if c != "\ufe0f")
+    path = download_emoji_png(code, f"emoji_{code}", assets_dir or TEMP_ASSETS)
+    if not path or not os.path.exists(path):
+        return None
+    with Image.open(path) as img:
+        return img.convert("RGBA").resize((height, height), Image.LANCZOS)
+
+
+def _draw_text(base, text: str, assets_dir: str = None):
+    """Draws centred, wrapped hook text with stroke and translucent undercolour onto an RGBA image."""
+    from PIL import Image, ImageDraw
+
+    width, height = base.size
+    font = load_font(max(12, int(TEXT_POINTSIZE * width / 1080)))
+    ascent, descent = font.getmetrics()
+    line_h = ascent + descent
+    pad = max(4, line_h // 10)
+    stroke = max(1, int(TEXT_STROKE_WIDTH * width / 1080))
+
+    # Measure every line as a sequence of text and emoji runs
+    lines = []
+    for line in textwrap.wrap(text, width=TEXT_WRAP_CHARS) or [text]:
+        runs = _split_runs(line)
+        widths = [line_h if is_emoji else font.getlength(chunk) for is_emoji, chunk in runs]
+        lines.append((runs, widths, sum(widths)))
+
+    layer = Image.new("RGBA", base.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    y = (height - line_h * len(lines)) // 2
+
+    for runs, widths, line_w in lines:
+        x = (width - line_w) / 2
+        draw.rectangle([x - pad, y, x + line_w + pad, y + line_h], fill=TEXT_UNDERCOLOR)
+        for (is_emoji, chunk), w in zip(runs, widths):
+            sprite = _emoji_image(chunk, line_h, assets_dir) if is_emoji else None
+            if sprite is not None:
+                layer.alpha_composite(sprite, (int(x), int(y)))
+            elif not is_emoji:
+                draw.text((x, y), chunk, font=font, fill=TEXT_FILL,
+                          stroke_width=stroke, stroke_fill=TEXT_STROKE_FILL)
+            x += w
+        y += line_h
+
+    return Image.alpha_composite(base, layer)
+
+
+def render_text_variants(image_path: str, texts, output_paths, assets_dir: str = None):
+    """
+    Batch API: decodes the base image once and renders every hook-text variant onto it.
+    Emoji sprites are downloaded into `assets_dir` (e.g. the job's scratch).
+
+    Returns:
+        list: Output paths that were written.
+    """
+    from PIL import Image
+
     if not os.path.exists(image_path):
         print(f"❌ Error: Image not found: {image_path}")
-        return
+        return []
 
-    # Wrap text (2 lines max)
-    lines = textwrap.wrap(text, width=20)
-    text_wrapped = "\n".join(lines)
+    with Image.open(image_path) as img:
+        base = img.convert("RGBA")
+
+    written = []
+    for text, output_path in zip(texts, output_paths):
+        try:
+            result = _draw_text(base, text, assets_dir)
+            if output_path.lower().endswith((".jpg", ".jpeg")):
+                result = result.convert("RGB")
+            result.save(output_path)
+            written.append(output_path)
+            print(f"✅ Thumbnail with text saved: {output_path}")
+        except Exception as e:
+            print(f"❌ Failed to overlay text on image: {e}")
+    return written
 
-    # ImageMagick draw command
-    cmd = [
-        IMAGEMAGICK_PATH, image_path,
-        "-gravity", "center",
-        "-fill", "Black",
-        "-stroke", "black",
-        "-strokewidth", "5",
-        "-undercolor", "rgba(255,255,255,0.8)",
-        "-font", "Arial-Bold",
-        "-pointsize", "100",
-        "-annotate", "+0+0", text_wrapped,
-        output_path
-    ]
 
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print(f"✅ Thumbnail with text saved: {output_path}")
-    except FileNotFoundError:
-        print("❌ ImageMagick not found. Check IMAGEMAGICK_PATH.")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to overlay text on image: {e.stderr.decode()}")
+def overlay_text_on_image(image_path: str, text: str, output_path: str, assets_dir: str = None):
+    written = render_text_variants(image_path, [text], [output_path], assets_dir)
+    return written[0] if written else None
 
 # ---------------------------
-# Step 3: Overlay Text on Video (ImageMagick + FFmpeg)
+# Step 3: Overlay Text on Video (FFmpeg)
 # ---------------------------
 def overlay_text_on_video(video_path: str, text: str, output_path: str, duration_sec: int = None):
     """
@@ -99,6 +225,7 @@ def overlay_text_on_video(video_path: str, text: str, output_path: str, duration
         "ffmpeg", "-y",
         "-i", video_path,
         "-vf", drawtext_filter,
+    ] + encoding.video_args() + [
         "-c:a", "copy",
         output_path
     ]
@@ -135,9 +262,7 @@ def append_thumbnail_to_video_with_audio(video_path: str, thumbnail_path: str, o
         "-i", f"anullsrc=channel_layout=stereo:sample_rate=44100",
         "-t", str(last_frame_sec),
         "-vf", "scale=1080:1920",
-        "-c:v", "libx264",
-        "-c:a", "aac",
-        "-pix_fmt", "yuv420p",
+    ] + encoding.video_args(intermediate=True) + encoding.audio_args() + [
         temp_thumb_video
     ]
     subprocess.run(cmd_thumb, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -156,9 +281,7 @@ def append_thumbnail_to_video_with_audio(video_path: str, thumbnail_path: str, o
         "-f", "concat",
         "-safe", "0",
         "-i", concat_list.name,
-        "-c:v", "libx264",
-        "-c:a", "aac",
-        "-pix_fmt", "yuv420p",
+    ] + encoding.video_args() + encoding.audio_args() + [
         output_path
     ]
     subprocess.run(cmd_concat, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -184,7 +307,7 @@ if __name__ == "__main__":
     hook_text = generate_hook_text(TOPIC, API_KEY)
     print(f"🧠 Generated Hook Text: {hook_text}")
 
-    # 2️⃣ Overlay on thumbnail (ImageMagick)
+    # 2️⃣ Overlay on thumbnail (Pillow)
     overlay_text_on_image(THUMBNAIL_PATH, hook_text, OUTPUT_THUMBNAIL_PATH)
 
     append_thumbnail_to_video_with_audio(VIDEO_PATH, OUTPUT_THUMBNAIL_PATH, OUTPUT_VIDEO_PATH, last_frame_sec=1)
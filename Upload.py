@@ -1,12 +1,6 @@
 import os
 import pickle
 import time
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
-from google.auth.transport.requests import Request
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -26,10 +20,19 @@ SCOPES = ["https://www.googleapis.com/auth/youtube.upload", "https://www.googlea
 # === 🔥 Hardcoded Topic (edit this per video) ===
 VIDEO_TOPIC = "Greatest inventions of the 21st century"
 
+_creds = None   # kept between uploads in long-running processes (daemon, queue worker)
+
+
 # === Authenticate YouTube ===
 def authenticate_youtube():
-    creds = None
-    if os.path.exists(TOKEN_FILE):
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+    from google.auth.transport.requests import Request
+
+    global _creds
+
+    creds = _creds
+    if creds is None and os.path.exists(TOKEN_FILE):
         with open(TOKEN_FILE, "rb") as f:
             creds = pickle.load(f)
 
@@ -41,40 +44,19 @@ def authenticate_youtube():
             creds = flow.run_local_server(port=8080, prompt="consent")
         with open(TOKEN_FILE, "wb") as f:
             pickle.dump(creds, f)
+    _creds = creds
     return build("youtube", "v3", credentials=creds)
 
-# === Generate Metadata using Gemini ===
+# === Metadata from the content package ===
 def generate_metadata_with_gemini(topic):
-    genai.configure(api_key=GEMINI_API_KEY)
-    prompt = f"""
-    You are an expert YouTube content strategist.
-    Based on the Script "{topic}", generate the following:
-    1️⃣ A catchy and clickable video title (under 90 characters, add #shorts)
-    2️⃣ A compelling YouTube short description along with tags, also topic relevant queries for SEO.
-    3️⃣ 5–8 highly relevant YouTube tags (comma-separated)
-    Include more like different variations of topic questions and queries for SEO
-
-    Format your answer EXACTLY like this:
-    TITLE: ...
-    DESCRIPTION: ...
-    TAGS: ...
     """
+    Returns (title, description, tags) from the content package for `topic`
+    (a topic or its script), generating the package with one structured call if needed.
+    """
+    from content_package import get_content_package
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt)
-    text = response.text.strip()
-
-    # === Parse output ===
-    title, description, tags = "", "", []
-    for line in text.splitlines():
-        if line.startswith("TITLE:"):
-            title = line.replace("TITLE:", "").strip()
-        elif line.startswith("DESCRIPTION:"):
-            description = line.replace("DESCRIPTION:", "").strip()
-        elif line.startswith("TAGS:"):
-            tags = [t.strip() for t in line.replace("TAGS:", "").split(",")]
-
-    return title, description, tags
+    package = get_content_package(topic, api_key=GEMINI_API_KEY)
+    return package["title"], package["description"], package["tags"]
 
 def wait_until_ready(youtube, video_id, max_retries=10):
     for i in range(max_retries):
@@ -89,7 +71,15 @@ def wait_until_ready(youtube, video_id, max_retries=10):
     return False
 
 # === Upload to YouTube ===
-def upload_video(youtube, video_path, thumbnail_path, title, description, tags):
+def upload_video(youtube, video_path, thumbnail_path, title, description, tags, on_uploaded=None):
+    """
+    Inserts the video, then sets the thumbnail. Only the insert may raise: once it
+    returns, the video is on the channel, so `on_uploaded(video_id)` is called
+    right away and the processing wait and thumbnail are best-effort.
+    """
+    from googleapiclient.http import MediaFileUpload
+    from googleapiclient.errors import HttpError
+
     body = {
         "snippet": {
             "title": title,
@@ -109,21 +99,26 @@ def upload_video(youtube, video_path, thumbnail_path, title, description, tags):
     response = request.execute()
     video_id = response["id"]
     print(f"✅ Uploaded successfully | Video ID: {video_id}")
+    if on_uploaded:
+        on_uploaded(video_id)
 
     # === Wait before thumbnail upload ===
     print("⏳ Waiting 10 seconds before setting thumbnail...")
     time.sleep(10)
-    wait_until_ready(youtube, video_id)
+    try:
+        wait_until_ready(youtube, video_id)
+    except Exception as e:
+        print(f"⚠️ Could not check processing status, continuing anyway: {e}")
 
     # === Upload thumbnail ===
-    if os.path.exists(thumbnail_path):
+    if thumbnail_path and os.path.exists(thumbnail_path):
         try:
             youtube.thumbnails().set(
                 videoId=video_id,
                 media_body=MediaFileUpload(thumbnail_path)
             ).execute()
             print("🖼️ Thumbnail uploaded successfully!")
-        except HttpError as e:
+        except (HttpError, OSError) as e:
             print(f"❌ Thumbnail upload failed: {e}")
     else:
         print("⚠️ Thumbnail file not found — skipping thumbnail upload.")
@@ -131,7 +126,7 @@ def upload_video(youtube, video_path, thumbnail_path, title, description, tags):
     return video_id
 
 # === Main Flow ===
-def upload_to_youtube(video_path, thumbnail_path, topic):
+def upload_to_youtube(video_path, thumbnail_path, topic, metadata=None, on_uploaded=None):
     """
     Uploads a video to YouTube using an AI-generated title, description, and tags.
 
@@ -139,6 +134,9 @@ def upload_to_youtube(video_path, thumbnail_path, topic):
         video_path (str): Path to the video file.
         thumbnail_path (str): Path to the thumbnail image.
         topic (str): The main topic of the video for metadata generation.
+        metadata (dict): Optional {"title", "description", "tags"} decided at render time;
+            skips metadata generation.
+        on_uploaded (callable): Called with the video ID as soon as the insert returns.
     """
     print("🔐 Authenticating YouTube...")
     youtube = authenticate_youtube()
@@ -148,18 +146,21 @@ def upload_to_youtube(video_path, thumbnail_path, topic):
         print(f"❌ Video file not found: {video_path}")
         return
 
-    if not os.path.exists(thumbnail_path):
-        print(f"⚠️ Thumbnail not found: {thumbnail_path}")
-        return
+    if not thumbnail_path or not os.path.exists(thumbnail_path):
+        print(f"⚠️ Thumbnail not found: {thumbnail_path} — uploading without it.")
 
-    print(f"🤖 Generating metadata for topic: '{topic}' using Gemini...")
-    title, description, tags = generate_metadata_with_gemini(topic)
+    if metadata:
+        title, description, tags = metadata["title"], metadata["description"], metadata["tags"]
+    else:
+        print(f"🤖 Generating metadata for topic: '{topic}' using Gemini...")
+        title, description, tags = generate_metadata_with_gemini(topic)
 
     print(f"\n📝 Title: {title}")
     print(f"📄 Description:\n{description}")
     print(f"🏷️ Tags: {tags}\n")
 
-    video_id = upload_video(youtube, video_path, thumbnail_path, title, description, tags)
+    video_id = upload_video(youtube, video_path, thumbnail_path, title, description, tags,
+                            on_uploaded=on_uploaded)
     print("✅ Upload completed successfully!")
 
     return video_id
@@ -6,12 +6,15 @@ import os
 import requests
 import json
 import random
-from moviepy.editor import VideoFileClip, AudioFileClip, concatenate_videoclips
+from moviepy.editor import VideoFileClip, AudioFileClip
+from fast_concat import concatenate_clips
 import re
 from transcribe import generate_subtitled_video
 from thumbnail import download_pexels_images
 from Overlay import generate_hook_text, overlay_text_on_image, overlay_text_on_video, append_thumbnail_to_video_with_audio
 import shutil
+import encoding
+import llm_cache
 from Upload import upload_to_youtube
 from dotenv import load_dotenv
 
@@ -29,10 +32,6 @@ OUTPUT_THUMBNAIL_PATH = "thumbnails/thumbnail_with_text.jpg"
 VIDEO_PATH = "final_tiktok_video.mp4"
 OUTPUT_VIDEO_PATH = "final_video_with_text.mp4"
 
-# Ensure the download directory exists
-if not os.path.exists(VIDEO_CLIPS_DIR):
-    os.makedirs(VIDEO_CLIPS_DIR)
-
 def generate_script_and_speech(topic):
     """Generates a short video script and converts the dialogue to speech."""
     try:
@@ -51,7 +50,9 @@ def generate_script_and_speech(topic):
         [NARRATOR]: Solar, wind, and hydro are changing the game.
         [NARRATOR]: Don't forget to like and subscribe for more content like this!
         """
-        script_response = client.models.generate_content(
+        script_response = llm_cache.generate_content(
+            client,
+            site="script",
             model='gemini-2.5-flash',
             contents=script_prompt
         )
@@ -79,7 +80,9 @@ def generate_script_and_speech(topic):
         
         tts_prompt = f"TTS the following text with a conversational and energetic tone: {tts_text}"
         
-        tts_response = client.models.generate_content(
+        tts_response = llm_cache.generate_content(
+            client,
+            site="tts",
             model="gemini-2.5-flash-preview-tts",
             contents=tts_prompt,
             config=types.GenerateContentConfig(
@@ -110,6 +113,9 @@ def generate_script_and_speech(topic):
 def download_pexels_videos(topic, video_duration_secs):
     """Downloads a series of videos from Pexels based on the script's topic and total duration."""
     headers = {'Authorization': PEXELS_API_KEY}
+
+    # Ensure the download directory exists
+    os.makedirs(VIDEO_CLIPS_DIR, exist_ok=True)
     
     # Calculate how many video clips we need
     num_clips_needed = int(video_duration_secs / CLIP_DURATION) + 1
@@ -168,9 +174,11 @@ def create_final_video(video_clips_paths, audio_file_path):
         print("No video clips to create video.")
         return False
 
+    sources = []        # every opened file reader, closed on success and on error
     try:
         # Load the audio clip to get its duration
         audio_clip = AudioFileClip(audio_file_path)
+        sources.append(audio_clip)
         audio_duration = audio_clip.duration
         print(f"Audio duration: {audio_duration:.2f} seconds")
 
@@ -183,14 +191,15 @@ def create_final_video(video_clips_paths, audio_file_path):
                 break
 
             clip = VideoFileClip(clip_path)
+            sources.append(clip)
 
             # Trim to desired CLIP_DURATION
             if clip.duration > CLIP_DURATION:
                 start_time = random.uniform(0, clip.duration - CLIP_DURATION)
                 clip = clip.subclip(start_time, start_time + CLIP_DURATION)
 
-            # Resize to 1080x1920 (portrait)
-            clip = clip.resize((1080, 1920))
+            # Resize to 1080x1920 (portrait) and a common fps so concatenation can skip compositing
+            clip = clip.resize((1080, 1920)).set_fps(24)
 
             video_clips.append(clip)
             current_video_time += clip.duration
@@ -203,8 +212,8 @@ def create_final_video(video_clips_paths, audio_file_path):
             video_clips[-1] = last_clip.subclip(0, last_clip.duration - excess_time)
             print(f"Trimmed last clip by {excess_time:.2f} seconds to match audio")
 
-        # Concatenate clips using 'compose' to avoid FPS/resolution issues
-        final_video_clip = concatenate_videoclips(video_clips, method="compose")
+        # Uniform clips are joined by direct frame lookup; mixed ones still use 'compose'
+        final_video_clip = concatenate_clips(video_clips)
 
         # Set audio and force video duration = audio duration
         final_video_clip = final_video_clip.set_audio(audio_clip)
@@ -212,12 +221,7 @@ def create_final_video(video_clips_paths, audio_file_path):
 
         # Write the final video
         print(f"Writing final video to {FINAL_VIDEO_FILE}...")
-        final_video_clip.write_videofile(FINAL_VIDEO_FILE, fps=24, codec="libx264", audio_codec="aac")
-
-        # Close clips to free memory
-        for clip in video_clips:
-            clip.close()
-        audio_clip.close()
+        final_video_clip.write_videofile(FINAL_VIDEO_FILE, fps=24, **encoding.moviepy_kwargs())
 
         print("✅ Video creation successful!")
         return True
@@ -225,6 +229,9 @@ def create_final_video(video_clips_paths, audio_file_path):
     except Exception as e:
         print(f"An error occurred during video editing: {e}")
         return False
+    finally:
+        for clip in sources:
+            clip.close()
 
 # --- Main Execution ---
 if __name__ == "__main__":
@@ -257,6 +264,9 @@ if __name__ == "__main__":
     if os.path.exists("final_tiktok_video.mp4"):
         thumbnails = download_pexels_images(topic, num_images=1)
     
+        if thumbnails:
+            THUMBNAIL_PATH = thumbnails[0]
+    
     hook_text = generate_hook_text(topic, GEMINI_API_KEY)
     print(f"Generated Hook Text: {hook_text}")
 
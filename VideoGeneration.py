@@ -4,6 +4,7 @@ from google.genai import types
 from io import BytesIO
 import os
 from dotenv import load_dotenv
+import llm_cache
 
 load_dotenv()
 
@@ -13,7 +14,9 @@ prompt = """
     Show me a picture of a nano banana dish in a fancy restaurant with a Gemini theme
   """
 
-response = client.models.generate_content(
+response = llm_cache.generate_content(
+    client,
+    site="image",
     model="gemini-2.5-flash-image",
     contents=[prompt],
 )
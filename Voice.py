@@ -4,6 +4,7 @@ from pydub import AudioSegment
 from io import BytesIO
 import os
 from dotenv import load_dotenv
+import llm_cache
 
 load_dotenv()
 
@@ -28,7 +29,9 @@ def generate_script_and_speech(topic, output_file_name="generated_video_audio.mp
         """
 
         # Step 2: Generate the script using the text generation model
-        script_response = client.models.generate_content(
+        script_response = llm_cache.generate_content(
+            client,
+            site="script",
             model='gemini-2.5-pro',
             contents=script_prompt
         )
@@ -49,7 +52,9 @@ def generate_script_and_speech(topic, output_file_name="generated_video_audio.mp
         tts_prompt = f"TTS the following text with conversational and energetic tones: {tts_text}"
         
         # Step 3: Use the correct syntax for SpeechConfig
-        tts_response = client.models.generate_content(
+        tts_response = llm_cache.generate_content(
+            client,
+            site="tts",
             model="gemini-2.5-flash-preview-tts",
             contents=tts_prompt,
             config=types.GenerateContentConfig(
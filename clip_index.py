@@ -0,0 +1,179 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from topic_planner import file_lock
+
+# Pexels returns the same (or near-identical) footage for related keywords.
+# Before downloading a candidate we hash a few of its preview pictures
+# (`video_pictures`, a few KB each) with a 64-bit difference hash and compare
+# them against the clips already chosen in this run and in recent runs.
+# Hashes are computed once per Pexels video id and persisted.
+
+INDEX_FILE = "clip_index.json"
+SAMPLE_PICTURES = 4           # preview frames hashed per clip
+MATCH_BITS = 10               # frames within this Hamming distance look the same
+MATCH_FRACTION = 0.5          # a clip is a duplicate when this share of its frames match
+RECENT_CLIPS = 60             # chosen clips remembered across runs (~6 shorts)
+MAX_CLIPS = 5000              # hashed clips kept in the index
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def dhash(images):
+    """
+    64-bit difference hashes of a batch of images.
+
+    Args:
+        images: uint8 array (N, 8, 9) of grayscale thumbnails.
+
+    Returns:
+        np.ndarray: uint64 hashes (N,).
+    """
+    import numpy as np
+
+    bits = images[:, :, 1:] > images[:, :, :-1]               # (N, 8, 8)
+    packed = np.packbits(bits.reshape(len(images), 64), axis=1)  # (N, 8) bytes
+    return packed.view(">u8").ravel().astype(np.uint64)
+
+
+def hamming(a, b):
+    """Pairwise Hamming distances between uint64 arrays a (K,) and b (M,) -> (K, M)."""
+    import numpy as np
+
+    x = np.bitwise_xor(a[:, None], b[None, :])
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return np.unpackbits(x.view(np.uint8).reshape(*x.shape, 8), axis=-1).sum(axis=-1)
+
+
+def _read_index(path):
+    """Returns (hashes, recent) from the index file, or empty ones."""
+    if not os.path.exists(path):
+        return {}, []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        hashes = {k: [int(h, 16) for h in v] for k, v in data.get("hashes", {}).items()}
+        return hashes, [str(v) for v in data.get("recent", [])]
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Clip index unreadable, starting fresh: {e}")
+        return {}, []
+
+
+def _thumbnail(url):
+    import requests
+    from io import BytesIO
+    from PIL import Image
+
+    resp = requests.get(url, timeout=15)
+    resp.raise_for_status()
+    img = Image.open(BytesIO(resp.content))
+    img.draft("L", (64, 64))
+    return img.convert("L").resize((9, 8), Image.BILINEAR)
+
+
+class ClipIndex:
+    """Persisted preview hashes per Pexels video id, plus the clips already chosen."""
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.hashes, self.recent = _read_index(path)   # id -> [hash, ...]; ids chosen recently
+        self.chosen = []                                 # ids chosen in this process
+
+    def fingerprint(self, video):
+        """Hashes of the clip's preview pictures (fetched once, then cached)."""
+        import numpy as np
+
+        vid = str(video["id"])
+        with _index_lock:
+            known = self.hashes.get(vid)
+        if known is None:
+            pictures = [p["picture"] for p in video.get("video_pictures", []) if p.get("picture")]
+            if len(pictures) > SAMPLE_PICTURES:
+                step = len(pictures) / SAMPLE_PICTURES
+                pictures = [pictures[int(i * step)] for i in range(SAMPLE_PICTURES)]
+            if not pictures and video.get("image"):
+                pictures = [video["image"]]
+
+            thumbs = []
+            with ThreadPoolExecutor(max_workers=SAMPLE_PICTURES) as pool:
+                for result in pool.map(lambda url: _safe(_thumbnail, url), pictures):
+                    if result is not None:
+                        thumbs.append(np.asarray(result, dtype=np.uint8))
+            known = [int(h) for h in dhash(np.stack(thumbs))] if thumbs else []
+            with _index_lock:            # save() iterates and replaces self.hashes
+                self.hashes[vid] = known
+        return np.array(known, dtype=np.uint64)
+
+    def _chosen_hashes(self):
+        """Caller holds _index_lock."""
+        import numpy as np
+
+        ids = set(self.recent) | set(self.chosen)
+        values = [h for vid in ids for h in self.hashes.get(vid, [])]
+        return np.array(values, dtype=np.uint64)
+
+    def is_duplicate(self, video):
+        """True when `video` is, or looks like, a clip that was already chosen."""
+        vid = str(video["id"])
+        with _index_lock:
+            if vid in self.chosen or vid in self.recent:
+                return True
+
+        candidate = self.fingerprint(video)      # network, outside the lock
+        with _index_lock:
+            chosen = self._chosen_hashes()
+        if len(candidate) == 0 or len(chosen) == 0:
+            return False
+
+        matches = (hamming(candidate, chosen) <= MATCH_BITS).any(axis=1)
+        return matches.mean() >= MATCH_FRACTION
+
+    def mark_chosen(self, video):
+        vid = str(video["id"])
+        with _index_lock:
+            if vid not in self.chosen:
+                self.chosen.append(vid)
+        self.save()
+
+    def save(self):
+        """Merges this process's hashes and choices into the shared index file."""
+        with _index_lock, file_lock(self.path):
+            hashes, disk_recent = _read_index(self.path)
+            hashes.update(self.hashes)
+            recent = [v for v in disk_recent if v not in self.chosen] + self.chosen
+            recent = recent[-RECENT_CLIPS:]
+
+            # Keep recently chosen clips, then the newest of the rest
+            keep = set(recent)
+            others = [k for k in hashes if k not in keep][-(MAX_CLIPS - len(keep)):]
+            hashes = {k: hashes[k] for k in others + [k for k in recent if k in hashes]}
+
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "hashes": {k: [f"{h:016x}" for h in v] for k, v in hashes.items()},
+                    "recent": recent,
+                }, f)
+            os.replace(tmp, self.path)
+            self.hashes, self.recent = hashes, recent
+
+
+def _safe(fn, *args):
+    try:
+        return fn(*args)
+    except Exception:
+        return None
+
+
+def get_clip_index():
+    """Process-wide index (loaded on first use)."""
+    global _index
+
+    with _index_lock:
+        if _index is None:
+            _index = ClipIndex()
+    return _index
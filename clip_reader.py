@@ -0,0 +1,369 @@
+import os
+import threading
+import subprocess
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# ffmpeg does the seek, trim, fps conversion and scale/crop while decoding, so
+# Python only ever receives frames at the output size for the window we use.
+#
+# Every reader is registered with a per-process ReaderPool: at most
+# MAX_OPEN_READERS ffmpeg decoders run at once (the least recently used one is
+# stopped and transparently reopened at its position when needed again),
+# identical windows of the same clip share one reader, and the pool records its
+# high-water marks.
+
+MAX_OPEN_READERS = int(os.getenv("MAX_OPEN_READERS", "6"))
+
+
+def ffmpeg_binary():
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+
+def probe_duration(path):
+    """Returns the container duration of a media file in seconds (0.0 if unknown)."""
+    import ffmpeg
+
+    try:
+        info = ffmpeg.probe(path)
+        return float(info.get("format", {}).get("duration") or 0.0)
+    except Exception as e:
+        print(f"⚠️ Could not probe {path}: {e}")
+        return 0.0
+
+
+# Pick windows from the clip's motion/scene-cut index (motion_index.py) instead of at random
+USE_MOTION_INDEX = True
+
+# Clips fetched partially (see partial_fetch.py) only hold data for one window
+_fixed_windows = {}
+
+
+def register_window(path, start):
+    """Pins the window of a partially downloaded clip so choose_window reuses it."""
+    _fixed_windows[os.path.abspath(path)] = float(start)
+
+
+def forget_windows(root=None):
+    """Unpins the windows of clips under `root` (all when None), e.g. at job end."""
+    prefix = os.path.join(os.path.abspath(root), "") if root else ""
+    for key in [k for k in list(_fixed_windows) if k.startswith(prefix)]:
+        _fixed_windows.pop(key, None)
+
+
+def choose_window(path, duration, clip_duration=None):
+    """
+    Picks which part of a source clip fills a segment of `duration` seconds:
+    the pinned window of a partial fetch, else the best-scoring window from the
+    motion index, else a random one.
+
+    Returns:
+        (start_sec, loop): loop is True when the source is too short and must repeat.
+    """
+    import random
+
+    fixed = _fixed_windows.get(os.path.abspath(path))
+    if fixed is not None:
+        return fixed, False
+
+    if clip_duration is None:
+        clip_duration = probe_duration(path)
+    if clip_duration <= 0:
+        raise Exception(f"Could not read clip duration: {path}")
+
+    if clip_duration > duration + 0.05:
+        if USE_MOTION_INDEX:
+            try:
+                from motion_index import best_window
+                return best_window(path, duration), False
+            except Exception as e:
+                print(f"⚠️ Motion index unavailable for {os.path.basename(path)}: {e}")
+        return random.uniform(0, max(0, clip_duration - duration)), False
+    if clip_duration < duration - 0.05:
+        return 0.0, True
+    return 0.0, False
+
+
+def scale_crop_filter(size, fps):
+    """Cover-scale to `size` (no distortion), centre-crop, then normalise SAR."""
+    w, h = size
+    return (
+        f"fps={fps},"
+        f"scale={w}:{h}:force_original_aspect_ratio=increase,"
+        f"crop={w}:{h},setsar=1"
+    )
+
+
+class ScaledClipReader:
+    """
+    Streams RGB frames for [start, start + duration) of a clip through one ffmpeg
+    process with input seek (-ss before -i) and decode-side scaling.
+
+    Frames are read sequentially; a backwards seek or a long jump forwards
+    restarts the process at the requested frame. A reader inherited through
+    fork() never touches the parent's pipe: it opens its own on first use.
+    """
+
+    MAX_SKIP_FRAMES = 48    # read through shorter forward jumps instead of re-seeking
+
+    def __init__(self, path, start, duration, size, fps, loop=False):
+        self.path = path
+        self.start = max(0.0, float(start))
+        self.duration = float(duration)
+        self.size = tuple(size)
+        self.fps = fps
+        self.loop = loop
+        self.n_frames = max(1, int(round(self.duration * fps)))
+        self.frame_bytes = self.size[0] * self.size[1] * 3
+        self.proc = None
+        self.pid = None         # process that owns self.proc
+        self.pos = 0            # index of the next frame the pipe will deliver
+        self.last_frame = None
+        self.pool_key = None
+        self._lock = threading.RLock()   # the pool may stop this reader from another thread
+
+    def _command(self, first_frame=0):
+        cmd = [ffmpeg_binary(), "-loglevel", "error", "-nostdin"]
+        if self.loop:
+            cmd += ["-stream_loop", "-1"]
+        offset = first_frame / self.fps
+        cmd += [
+            "-ss", f"{self.start + offset:.3f}",
+            "-i", self.path,
+            "-t", f"{self.duration - offset:.3f}",
+            "-an", "-sn",
+            "-vf", scale_crop_filter(self.size, self.fps),
+            "-f", "rawvideo", "-pix_fmt", "rgb24",
+            "-"
+        ]
+        return cmd
+
+    def _open(self, first_frame=0):
+        self.close()
+        if self.loop:
+            first_frame = 0     # -ss is not reliable across -stream_loop iterations
+        self.proc = subprocess.Popen(
+            self._command(first_frame),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=self.frame_bytes * 2
+        )
+        self.pid = os.getpid()
+        self.pos = first_frame
+        reader_pool.opened(self)
+
+    def _read_next(self):
+        import numpy as np
+
+        raw = self.proc.stdout.read(self.frame_bytes)
+        self.pos += 1
+        if len(raw) < self.frame_bytes:
+            # Source ran short of the requested window: hold the last good frame
+            if self.last_frame is None:
+                w, h = self.size
+                self.last_frame = np.zeros((h, w, 3), dtype=np.uint8)
+            return self.last_frame
+
+        w, h = self.size
+        self.last_frame = np.frombuffer(raw, dtype=np.uint8).reshape(h, w, 3)
+        return self.last_frame
+
+    def get_frame(self, t):
+        index = min(self.n_frames - 1, max(0, int(t * self.fps + 1e-6)))
+
+        if self.pid is not None and self.pid != os.getpid():
+            # Inherited from a forked parent: forget its process, don't stop it
+            self._lock = threading.RLock()
+            self.proc = None
+            self.pid = None
+            self.last_frame = None
+
+        with self._lock:
+            if self.proc is None or index < self.pos - 1 or index - self.pos > self.MAX_SKIP_FRAMES:
+                self._open(index)
+            elif index == self.pos - 1 and self.last_frame is not None:
+                return self.last_frame
+            else:
+                reader_pool.touch(self)
+
+            while self.pos <= index:
+                frame = self._read_next()
+            return frame
+
+    def close(self, blocking=True):
+        """
+        Stops the decoder (the reader reopens at its position if used again).
+
+        Returns:
+            bool: False if `blocking` is False and another thread is reading.
+        """
+        if not self._lock.acquire(blocking):
+            return False
+        try:
+            if self.proc is not None and self.pid != os.getpid():
+                self.proc = None    # belongs to the parent process
+            if self.proc is not None:
+                try:
+                    self.proc.stdout.close()
+                    self.proc.terminate()
+                    self.proc.wait(timeout=5)
+                except Exception:
+                    try:
+                        self.proc.kill()
+                    except Exception:
+                        pass
+                self.proc = None
+                reader_pool.closed(self)
+            self.last_frame = None
+            return True
+        finally:
+            self._lock.release()
+
+    def __del__(self):
+        self.close()
+
+
+class ReaderPool:
+    """
+    Caps live ffmpeg decoders in this process and shares identical readers.
+
+    Usage:
+        reader = reader_pool.acquire(path, start, duration, size, fps)
+        ...
+        reader_pool.release(reader)       # or: with pooled_reader(...) as reader
+    """
+
+    def __init__(self, max_open=MAX_OPEN_READERS):
+        self.max_open = max(1, max_open)
+        self.live = OrderedDict()      # id(reader) -> reader with a running process, LRU first
+        self.shared = {}               # window key -> [reader, refcount]
+        self.stats = {"opened": 0, "evicted": 0, "shared": 0, "peak_open": 0, "peak_readers": 0}
+        self._lock = threading.Lock()
+
+    def _after_fork(self):
+        # Forked child: the parent's decoders are not ours to count or stop
+        self._lock = threading.Lock()
+        self.live.clear()
+        self.shared.clear()
+        self.stats = dict.fromkeys(self.stats, 0)
+
+    def opened(self, reader):
+        """Registers a started decoder and stops the least recently used ones over the cap."""
+        with self._lock:
+            self.live[id(reader)] = reader
+            self.live.move_to_end(id(reader))
+            self.stats["opened"] += 1
+            victims = []
+            while len(self.live) > self.max_open:
+                _, victim = self.live.popitem(last=False)
+                victims.append(victim)
+
+        # Outside the pool lock; a reader busy in another thread is kept open
+        busy = [v for v in victims if not v.close(blocking=False)]
+        with self._lock:
+            for victim in busy:
+                self.live[id(victim)] = victim
+            self.stats["evicted"] += len(victims) - len(busy)
+            self.stats["peak_open"] = max(self.stats["peak_open"], len(self.live))
+
+    def touch(self, reader):
+        with self._lock:
+            if id(reader) in self.live:
+                self.live.move_to_end(id(reader))
+
+    def closed(self, reader):
+        with self._lock:
+            self.live.pop(id(reader), None)
+
+    def acquire(self, path, start, duration, size, fps, loop=False):
+        """Returns the reader for this window, shared with other holders of the same window."""
+        key = (os.path.abspath(path), round(float(start), 3), round(float(duration), 3),
+               tuple(size), fps, loop)
+        with self._lock:
+            entry = self.shared.get(key)
+            if entry:
+                entry[1] += 1
+                self.stats["shared"] += 1
+                return entry[0]
+            reader = ScaledClipReader(path, start, duration, size, fps, loop=loop)
+            reader.pool_key = key
+            self.shared[key] = [reader, 1]
+            self.stats["peak_readers"] = max(self.stats["peak_readers"], len(self.shared))
+            return reader
+
+    def release(self, reader):
+        """Drops one holder; the decoder stops when the last holder releases it."""
+        key = getattr(reader, "pool_key", None)
+        with self._lock:
+            entry = self.shared.get(key)
+            if entry and entry[0] is reader:
+                entry[1] -= 1
+                if entry[1] > 0:
+                    return
+                del self.shared[key]
+        reader.close()
+
+    def close_all(self):
+        """Stops every decoder this process started (readers reopen if used again)."""
+        with self._lock:
+            readers = list(self.live.values())
+        for reader in readers:
+            reader.close()
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, "open": len(self.live), "readers": len(self.shared),
+                    "max_open": self.max_open}
+
+
+reader_pool = ReaderPool()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reader_pool._after_fork)
+
+
+@contextmanager
+def pooled_reader(path, start, duration, size, fps, loop=False):
+    """`with pooled_reader(...) as reader:` — released (and stopped if unshared) on exit."""
+    reader = reader_pool.acquire(path, start, duration, size, fps, loop=loop)
+    try:
+        yield reader
+    finally:
+        reader_pool.release(reader)
+
+
+_segment_clip_class = None
+
+
+def _segment_clip_type():
+    """MoviePy VideoClip subclass whose close() also stops the ffmpeg reader."""
+    global _segment_clip_class
+
+    if _segment_clip_class is None:
+        from moviepy.editor import VideoClip
+
+        class SegmentClip(VideoClip):
+            def close(self):
+                if self.reader is not None:
+                    reader_pool.release(self.reader)
+                    self.reader = None
+                super().close()
+
+        _segment_clip_class = SegmentClip
+    return _segment_clip_class
+
+
+def open_segment_clip(path, start, duration, size, fps, loop=False):
+    """
+    Returns a MoviePy clip for [start, start + duration) of `path`, already at
+    `size` and `fps`. Use loop=True when the source is shorter than `duration`.
+    The reader comes from reader_pool; close the clip (or use it in a `with`
+    block) to release it.
+    """
+    reader = reader_pool.acquire(path, start, duration, size, fps, loop=loop)
+
+    clip = _segment_clip_type()(make_frame=reader.get_frame, duration=duration)
+    clip.fps = fps
+    clip.reader = reader
+    clip.filename = os.path.abspath(path)
+    return clip
@@ -0,0 +1,129 @@
+import bisect
+
+# CompositeVideoClip asks every layer whether it is playing on every frame and
+# blits each one onto a fresh copy of the whole frame. With hundreds of caption
+# and sticker layers that is (layers x frames) work even though only two or
+# three are ever on screen. Here the layer start/end times are indexed once into
+# elementary intervals, so a frame visits only its active layers and blends only
+# inside each layer's bounding box, in place.
+
+
+class IntervalIndex:
+    """
+    Maps a time to the layers active at that time.
+
+    Built once with a sweep over start/end points; lookups are a binary search.
+    """
+
+    def __init__(self, layers):
+        points = {0.0}
+        for layer in layers:
+            points.add(float(layer.start))
+            if layer.end is not None:
+                points.add(float(layer.end))
+        self.bounds = sorted(points)
+        # active[i] = layers (in stacking order) playing during [bounds[i], bounds[i + 1])
+        self.active = self._sweep(layers)
+
+    def _sweep(self, layers):
+        starts = {}
+        ends = {}
+        for order, layer in enumerate(layers):
+            starts.setdefault(float(layer.start), []).append(order)
+            if layer.end is not None:
+                ends.setdefault(float(layer.end), []).append(order)
+
+        live = set()
+        active = []
+        for left in self.bounds:
+            live.difference_update(ends.get(left, ()))
+            live.update(starts.get(left, ()))
+            active.append([layers[i] for i in sorted(live)])
+        return active
+
+    def at(self, t):
+        i = bisect.bisect_right(self.bounds, t) - 1
+        return self.active[i] if i >= 0 else []
+
+
+def _resolve_position(layer, t, frame_w, frame_h, layer_w, layer_h):
+    """Same position rules as MoviePy's blit_on (keywords, relative, callables)."""
+    pos = layer.pos(t)
+    if isinstance(pos, str):
+        pos = {
+            "center": ["center", "center"],
+            "left": ["left", "center"],
+            "right": ["right", "center"],
+            "top": ["center", "top"],
+            "bottom": ["center", "bottom"],
+        }[pos]
+    else:
+        pos = list(pos)
+
+    if getattr(layer, "relative_pos", False):
+        for i, dim in enumerate((frame_w, frame_h)):
+            if not isinstance(pos[i], str):
+                pos[i] = dim * pos[i]
+
+    if isinstance(pos[0], str):
+        pos[0] = {"left": 0, "center": (frame_w - layer_w) / 2, "right": frame_w - layer_w}[pos[0]]
+    if isinstance(pos[1], str):
+        pos[1] = {"top": 0, "center": (frame_h - layer_h) / 2, "bottom": frame_h - layer_h}[pos[1]]
+    return int(pos[0]), int(pos[1])
+
+
+def blend_layer(frame, layer, t):
+    """Draws `layer` at composite time `t` onto `frame` in place, inside its box only."""
+    import numpy as np
+
+    local_t = t - layer.start
+    img = layer.get_frame(local_t)
+    frame_h, frame_w = frame.shape[:2]
+    layer_h, layer_w = img.shape[:2]
+    x, y = _resolve_position(layer, local_t, frame_w, frame_h, layer_w, layer_h)
+
+    # Clip the layer box to the frame
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(frame_w, x + layer_w), min(frame_h, y + layer_h)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+
+    src = img[y0 - y:y1 - y, x0 - x:x1 - x, :3]
+    region = frame[y0:y1, x0:x1]
+
+    if layer.mask is None:
+        region[:] = src
+        return frame
+
+    alpha = layer.mask.get_frame(local_t)[y0 - y:y1 - y, x0 - x:x1 - x]
+    alpha = np.asarray(alpha, dtype=np.float32)[..., None]
+    region[:] = (alpha * src + (1.0 - alpha) * region).astype(np.uint8)
+    return frame
+
+
+def composite_layers(base, layers):
+    """
+    Drop-in replacement for CompositeVideoClip([base] + layers) when `base` fills
+    the frame: size, fps and duration come from `base`.
+    """
+    from moviepy.editor import VideoClip, CompositeAudioClip
+
+    layers = [layer for layer in layers if layer.end is None or layer.end > layer.start]
+    index = IntervalIndex(layers)
+
+    def make_frame(t):
+        frame = base.get_frame(t).copy()   # readers may hand out read-only buffers
+        for layer in index.at(t):
+            blend_layer(frame, layer, t)
+        return frame
+
+    result = VideoClip(make_frame=make_frame, duration=base.duration)
+    result.size = base.size
+    result.fps = getattr(base, "fps", None)
+    result.clips = [base] + layers
+    result.index = index
+
+    audio = [c.audio.set_start(c.start) for c in [base] + layers if c.audio is not None]
+    if audio:
+        result.audio = CompositeAudioClip(audio).set_duration(base.duration)
+    return result
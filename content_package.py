@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import threading
+from dotenv import load_dotenv
+
+import llm_cache
+
+load_dotenv()
+
+# One structured Gemini call returns everything text-shaped a video needs:
+# the narrator script, the thumbnail hook and the YouTube metadata. The older
+# per-field functions (script, generate_hook_text, generate_metadata_with_gemini)
+# are thin accessors over the package cached here.
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+PACKAGE_MODEL = "gemini-3-flash-preview"
+
+CHANNEL_BRIEF = """
+    Channel: "Healthy Stop", a fitness and healthy lifestyle YouTube & short-form content channel.
+
+    Audience:
+    - Teenagers starting fitness
+    - Adults trying to lose fat, gain strength, and build healthy habits
+    - Busy people looking for simple, realistic health advice
+"""
+
+SCRIPT_FIELD = """
+    - "script": a **30-second fast-paced, informational, science-backed** social media script.
+      Beginner-friendly, educational but motivating, simple global English, practical and realistic,
+      confident fitness-coach style. Avoid medical or scientific jargon. No fluff.
+      Every spoken line formatted exactly as: [NARRATOR]: line text  (lines separated by \\n)"""
+
+META_FIELDS = """
+    - "hook_text": an engaging hook for the thumbnail and video, one line, max 6-8 words, emojis allowed
+    - "title": a catchy, clickable YouTube title under 90 characters that includes #shorts
+    - "description": a compelling YouTube Shorts description with topic-relevant queries and
+      question variations for SEO
+    - "tags": 5-8 highly relevant YouTube tags (JSON array of strings)
+"""
+
+PACKAGE_FIELDS = "\n    Fields:" + SCRIPT_FIELD + META_FIELDS
+
+# Packages belong to the job that made them: each thread running a job (daemon
+# workers run one job at a time) has its own topic/script -> package map, and
+# run_pipeline drops it with clear_packages() when the job ends.
+_local = threading.local()
+
+
+def _packages():
+    if not hasattr(_local, "packages"):
+        _local.packages = {}
+    return _local.packages
+
+
+def validate_package(data, topic, script_text=None):
+    """
+    Checks and normalises one content package. With `script_text` (a script the
+    caller already has), that script is used and `data` needs no "script".
+
+    Returns:
+        dict: {"topic", "script", "hook_text", "title", "description", "tags"}
+    Raises:
+        ValueError: if a required field is missing or unusable.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("package is not a JSON object")
+
+    if script_text:
+        script = script_text.strip()
+    else:
+        script = str(data.get("script", "")).strip()
+        if not re.search(r'\[NARRATOR\]: \S', script):
+            raise ValueError("script has no [NARRATOR]: lines")
+
+    hook_text = " ".join(str(data.get("hook_text", "")).split())
+    if not hook_text:
+        raise ValueError("hook_text is empty")
+
+    title = " ".join(str(data.get("title", "")).split())
+    if not title:
+        raise ValueError("title is empty")
+    if "#shorts" not in title.lower():
+        title = f"{title} #shorts"
+    title = title[:100]   # YouTube's hard limit
+
+    description = str(data.get("description", "")).strip()
+
+    tags = data.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    tags = [str(t).strip().lstrip("#") for t in tags if str(t).strip()][:15]
+
+    return {
+        "topic": topic,
+        "script": script,
+        "hook_text": hook_text,
+        "title": title,
+        "description": description,
+        "tags": tags,
+    }
+
+
+def register_package(package):
+    """Makes a package (e.g. popped from the planner queue) visible to the accessors."""
+    packages = _packages()
+    packages[package["topic"]] = package
+    packages[package["script"]] = package
+    return package
+
+
+def find_package(key):
+    """Looks up a cached package by topic or by its script text."""
+    packages = _packages()
+    return packages.get(key) or packages.get(str(key).strip())
+
+
+def clear_packages():
+    """Forgets this job's packages so the next job on the thread starts clean."""
+    _packages().clear()
+
+
+def generate_content_package(topic, script_text=None, api_key=None):
+    """
+    Makes one Gemini call returning script, hook text, title, description and tags.
+    When `script_text` is given, only the metadata is requested and the script is kept.
+    """
+    from google.genai import types
+
+    client = llm_cache.get_client(api_key or GEMINI_API_KEY)
+
+    if script_text:
+        # The script already exists: ask only for the metadata, never for an echo of it
+        prompt = f"""
+    You are the YouTube content strategist for this channel.
+    {CHANNEL_BRIEF}
+    Write the metadata for a video about: "{topic}", based on this script:
+    {script_text}
+
+    Fields:{META_FIELDS}
+    Return only a JSON object with the keys hook_text, title, description, tags.
+    """
+    else:
+        prompt = f"""
+    You are the scriptwriter and YouTube content strategist for this channel.
+    {CHANNEL_BRIEF}
+    Create the content package for a video about: "{topic}"
+    {PACKAGE_FIELDS}
+    Return only a JSON object with the keys script, hook_text, title, description, tags.
+    """
+
+    response = llm_cache.generate_content(
+        client,
+        site="package_meta" if script_text else "package",
+        model=PACKAGE_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(response_mime_type="application/json")
+    )
+    if not response or not getattr(response, "text", None):
+        raise Exception("Content package call returned nothing.")
+
+    return validate_package(json.loads(response.text), topic, script_text)
+
+
+def get_content_package(topic, script_text=None, api_key=None):
+    """
+    Returns the cached package for `topic`, generating it once if needed. With
+    `script_text`, only a package built around that script matches.
+    """
+    package = find_package(script_text) if script_text else find_package(topic)
+    if package is None:
+        print(f"📦 Generating content package for: {topic}")
+        package = register_package(generate_content_package(topic, script_text, api_key))
+    return package
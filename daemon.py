@@ -0,0 +1,361 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import socket
+import argparse
+import threading
+import socketserver
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Long-running pipeline process. A scheduled `python test.py` pays interpreter
+# startup, the heavy imports, the Whisper model load and the OAuth token reload
+# on every video. The daemon does all of that once, then runs jobs from an
+# in-process queue fed by a localhost socket (and optionally a fixed schedule).
+# Warm state: the Whisper model (transcribe.load_whisper_model), Gemini clients
+# (llm_cache.get_client), fonts and emoji sprites (Overlay / transcribe caches)
+# and YouTube credentials (Upload.authenticate_youtube).
+#
+# Protocol: one JSON object per line, one JSON reply per line.
+#   {"cmd": "submit", "topic": "Gut Health", "long_form": false, "script": null}
+#   {"cmd": "health"}   {"cmd": "stats"}   {"cmd": "shutdown"}
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+DAEMON_HOST = "127.0.0.1"                       # local only: the socket has no authentication
+DAEMON_PORT = int(os.getenv("DAEMON_PORT", "8765"))
+DAEMON_WORKERS = int(os.getenv("DAEMON_WORKERS", "1"))
+MAX_QUEUED = 50
+RECENT_JOBS = 50                                # durations kept for throughput stats
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class PipelineDaemon:
+    """
+    Warm pipeline process with a job queue, worker threads and an optional schedule.
+
+    Usage:
+        daemon = PipelineDaemon(workers=1, every_min=60)
+        daemon.warm_up()
+        daemon.serve()              # blocks until {"cmd": "shutdown"} or Ctrl+C
+    """
+
+    def __init__(self, workers=DAEMON_WORKERS, every_min=0, upload=False,
+                 host=DAEMON_HOST, port=DAEMON_PORT):
+        self.workers = max(1, workers)
+        self.every_min = every_min
+        self.upload = upload
+        self.address = (host, port)
+        self.jobs = queue.Queue(maxsize=MAX_QUEUED)
+        self.started_at = time.time()
+        self.warm = {}                                   # resource -> load seconds (or error)
+        self.running = {}                                # job id -> job
+        self.recent = deque(maxlen=RECENT_JOBS)          # finished jobs, newest last
+        self.counts = {"submitted": 0, "completed": 0, "failed": 0, "scheduled": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._workers = []
+
+    # ============================
+    # Warm-up
+    # ============================
+    def _warm(self, name, fn):
+        t0 = time.time()
+        try:
+            fn()
+            self.warm[name] = round(time.time() - t0, 2)
+            print(f"🔥 Warmed {name} ({self.warm[name]}s)")
+        except Exception as e:
+            self.warm[name] = f"error: {e}"
+            print(f"⚠️ Could not warm {name}: {e}")
+
+    def warm_up(self):
+        """Loads heavy modules, the Whisper model, API clients, fonts and credentials once."""
+        import llm_cache
+        import transcribe
+
+        def imports():
+            import moviepy.editor  # noqa: F401
+            import pydub  # noqa: F401
+            import google.genai  # noqa: F401
+            import test  # noqa: F401
+
+        def fonts():
+            from Overlay import load_font, _font_path
+            _font_path()
+            load_font(96)
+
+        self._warm("imports", imports)
+        self._warm("whisper", transcribe.load_whisper_model)
+        self._warm("imagemagick", transcribe.configure_imagemagick)
+        self._warm("fonts", fonts)
+        if GEMINI_API_KEY:
+            self._warm("gemini", lambda: llm_cache.get_client(GEMINI_API_KEY))
+        if self.upload:
+            from Upload import TOKEN_FILE, authenticate_youtube
+            if os.path.exists(TOKEN_FILE):
+                self._warm("youtube", authenticate_youtube)
+
+    # ============================
+    # Jobs
+    # ============================
+    def submit(self, topic=None, long_form=False, script_text=None, source="socket"):
+        """
+        Queues one video.
+
+        Returns:
+            str: job id.
+
+        Raises:
+            queue.Full: when MAX_QUEUED jobs are already waiting.
+        """
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "topic": topic,
+            "long_form": bool(long_form),
+            "script_text": script_text,
+            "source": source,
+            "submitted_at": time.time(),
+        }
+        self.jobs.put_nowait(job)
+        with self._lock:
+            self.counts["submitted"] += 1
+        print(f"📥 Job {job['id']} queued ({source}, topic={topic or 'auto'})")
+        return job["id"]
+
+    def _run_job(self, job):
+        from test import run_pipeline
+
+        job["started_at"] = time.time()
+        with self._lock:
+            self.running[job["id"]] = job
+        job_key = None
+        try:
+            job_key = run_pipeline(topic=job["topic"], long_form=job["long_form"],
+                                   script_text=job["script_text"])
+        except Exception as e:
+            job["error"] = str(e)
+            print(f"❌ Job {job['id']} crashed: {e}")
+        finally:
+            job["finished_at"] = time.time()
+            job["upload_key"] = job_key
+            job["ok"] = job_key is not None
+            with self._lock:
+                self.running.pop(job["id"], None)
+                self.recent.append(job)
+                self.counts["completed" if job["ok"] else "failed"] += 1
+            print(f"{'✅' if job['ok'] else '⚠️'} Job {job['id']} finished in "
+                  f"{job['finished_at'] - job['started_at']:.1f}s")
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                job = self.jobs.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self._run_job(job)
+            finally:
+                self.jobs.task_done()
+
+    def _scheduler(self):
+        """Queues an auto-topic video every `every_min` minutes unless work is already pending."""
+        while not self._stop.wait(self.every_min * 60):
+            with self._lock:
+                busy = bool(self.running)
+            if busy or not self.jobs.empty():
+                print("⏭ Scheduled run skipped: previous job still pending.")
+                continue
+            try:
+                self.submit(source="schedule")
+                with self._lock:
+                    self.counts["scheduled"] += 1
+            except queue.Full:
+                pass
+
+    # ============================
+    # Stats
+    # ============================
+    def health(self):
+        return {
+            "status": "ok" if not self._stop.is_set() else "stopping",
+            "pid": os.getpid(),
+            "uptime_sec": round(time.time() - self.started_at, 1),
+            "queued": self.jobs.qsize(),
+            "running": len(self.running),
+            "warm": self.warm,
+        }
+
+    def stats(self):
+        """Counts, per-job wall times and throughput over the recent jobs."""
+        with self._lock:
+            recent = list(self.recent)
+            running = [{"id": j["id"], "topic": j["topic"],
+                        "elapsed_sec": round(time.time() - j["started_at"], 1)}
+                       for j in self.running.values()]
+            counts = dict(self.counts)
+
+        durations = sorted(j["finished_at"] - j["started_at"] for j in recent if j["ok"])
+        waits = [j["started_at"] - j["submitted_at"] for j in recent]
+        uptime_h = (time.time() - self.started_at) / 3600
+        return {
+            **counts,
+            "queued": self.jobs.qsize(),
+            "running": running,
+            "avg_job_sec": round(sum(durations) / len(durations), 1) if durations else None,
+            "p50_job_sec": round(durations[len(durations) // 2], 1) if durations else None,
+            "avg_wait_sec": round(sum(waits) / len(waits), 1) if waits else None,
+            "videos_per_hour": round(counts["completed"] / uptime_h, 2) if uptime_h > 0 else None,
+            "peak_rss_mb": _peak_rss_mb(),
+            "last_jobs": [{"id": j["id"], "topic": j["topic"], "ok": j["ok"],
+                           "sec": round(j["finished_at"] - j["started_at"], 1),
+                           "upload_key": j["upload_key"], "error": j.get("error")}
+                          for j in recent[-5:]],
+        }
+
+    # ============================
+    # Socket server
+    # ============================
+    def handle(self, request):
+        cmd = request.get("cmd")
+        if cmd == "submit":
+            try:
+                job_id = self.submit(request.get("topic"), request.get("long_form", False),
+                                     request.get("script"))
+            except queue.Full:
+                return {"ok": False, "error": f"queue full ({MAX_QUEUED} jobs)"}
+            return {"ok": True, "job_id": job_id, "queued": self.jobs.qsize()}
+        if cmd == "health":
+            return {"ok": True, **self.health()}
+        if cmd == "stats":
+            return {"ok": True, **self.stats()}
+        if cmd == "shutdown":
+            threading.Thread(target=self.stop, daemon=True).start()
+            return {"ok": True, "status": "stopping"}
+        return {"ok": False, "error": f"unknown command: {cmd!r}"}
+
+    def serve(self):
+        """Starts workers, the scheduler and the socket server; blocks until stopped."""
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        reply = daemon.handle(json.loads(line))
+                    except ValueError as e:
+                        reply = {"ok": False, "error": f"bad request: {e}"}
+                    self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+        # Jobs, the socket server, the scheduler and the upload worker all run as
+        # threads here, so forking encode pools could deadlock the children
+        from parallel_encode import disable_fork
+        disable_fork()
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer(self.address, Handler)
+        self._server.daemon_threads = True
+
+        # Not daemon threads: a running job must reach its workspace cleanup
+        self._workers = [threading.Thread(target=self._worker, name=f"pipeline-{i}")
+                         for i in range(self.workers)]
+        for thread in self._workers:
+            thread.start()
+        if self.every_min > 0:
+            threading.Thread(target=self._scheduler, name="scheduler", daemon=True).start()
+        if self.upload:
+            from upload_queue import run_worker
+            threading.Thread(target=run_worker, name="uploads", daemon=True).start()
+
+        print(f"🛰 Pipeline daemon listening on {self.address[0]}:{self.address[1]} "
+              f"({self.workers} worker(s), schedule={'every %g min' % self.every_min if self.every_min else 'off'})")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            print("🛑 Daemon stopping...")
+        finally:
+            self._stop.set()
+            self._server.server_close()
+            running = len(self.running)
+            if running:
+                print(f"⏳ Waiting for {running} running job(s) to finish...")
+            for thread in self._workers:
+                thread.join()
+            print("👋 Daemon stopped.")
+
+    def stop(self):
+        """Stops accepting work; jobs already running finish in their worker threads."""
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+
+
+def send_command(request, host=DAEMON_HOST, port=DAEMON_PORT, timeout=10):
+    """Sends one command to a running daemon and returns its JSON reply."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as f:
+            return json.loads(f.readline())
+
+
+if __name__ == "__main__":
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--port", type=int, default=DAEMON_PORT)
+
+    parser = argparse.ArgumentParser(description="Warm long-running pipeline daemon")
+    sub = parser.add_subparsers(dest="command")
+
+    serve = sub.add_parser("serve", parents=[common], help="run the daemon (default)")
+    serve.add_argument("--workers", type=int, default=DAEMON_WORKERS,
+                       help="videos rendered concurrently")
+    serve.add_argument("--every", type=float, default=0,
+                       help="queue an auto-topic video every N minutes (0 = only on request)")
+    serve.add_argument("--upload", action="store_true",
+                       help="also run the upload queue worker in this process")
+
+    submit = sub.add_parser("submit", parents=[common], help="queue a video on the running daemon")
+    submit.add_argument("--topic")
+    submit.add_argument("--long-form", action="store_true")
+    submit.add_argument("--script-file")
+
+    sub.add_parser("health", parents=[common], help="print the daemon's health")
+    sub.add_parser("stats", parents=[common], help="print job counts and throughput")
+    sub.add_parser("shutdown", parents=[common], help="stop the daemon after running jobs finish")
+    args = parser.parse_args()
+    port = getattr(args, "port", DAEMON_PORT)
+
+    if args.command in (None, "serve"):
+        daemon = PipelineDaemon(
+            workers=getattr(args, "workers", DAEMON_WORKERS),
+            every_min=getattr(args, "every", 0),
+            upload=getattr(args, "upload", False),
+            port=port
+        )
+        daemon.warm_up()
+        daemon.serve()
+    else:
+        request = {"cmd": args.command}
+        if args.command == "submit":
+            script = None
+            if args.script_file:
+                with open(args.script_file, "r", encoding="utf-8") as f:
+                    script = f.read()
+            request.update(topic=args.topic, long_form=args.long_form, script=script)
+        try:
+            print(json.dumps(send_command(request, port=port), indent=2))
+        except OSError as e:
+            print(f"❌ Daemon not reachable on port {port}: {e}")
+            sys.exit(1)
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+# One place for H.264/AAC encoder settings. Every writer (MoviePy write_videofile
+# calls and raw ffmpeg commands) asks this module for its arguments, so switching
+# the whole pipeline between draft and archival output is one setting.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CALIBRATION_FILE = os.path.join(BASE_DIR, "logs", "encoding_calibration.json")
+
+VIDEO_CODEC = "libx264"
+AUDIO_CODEC = "aac"
+PIX_FMT = "yuv420p"
+
+# Constant-quality (CRF) encoding: size follows content instead of a fixed bitrate
+PROFILES = {
+    "draft":    {"preset": "ultrafast", "crf": 26, "audio_bitrate": "128k"},
+    "standard": {"preset": "veryfast",  "crf": 21, "audio_bitrate": "192k"},
+    "archival": {"preset": "slow",      "crf": 17, "audio_bitrate": "256k"},
+}
+# Outputs that get decoded and re-encoded later in the pipeline are written at
+# higher quality so the generation loss is not paid twice
+INTERMEDIATE_CRF_OFFSET = -4
+
+# "auto" picks from this host's calibration (see auto_profile); "standard" without one
+AUTO_PROFILE = "auto"
+FALLBACK_PROFILE = "standard"
+QUALITY_ORDER = ("archival", "standard", "draft")
+MIN_REALTIME_FACTOR = 1.5      # auto: best quality that still encodes this much faster than realtime
+DEFAULT_PROFILE = os.getenv("ENCODING_PROFILE", AUTO_PROFILE)
+
+_auto = None
+
+
+def encoder_threads():
+    """Encoder threads for a single writer: every core this process may use."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:   # Windows / macOS
+        return os.cpu_count() or 2
+
+
+def auto_profile(path=CALIBRATION_FILE):
+    """
+    The highest-quality profile whose calibrated realtime factor reaches
+    MIN_REALTIME_FACTOR (fastest profile if none does). FALLBACK_PROFILE when
+    there is no calibration or it was measured with a different CPU count.
+    Read once per process.
+    """
+    global _auto
+
+    if _auto is not None:
+        return _auto
+    _auto = FALLBACK_PROFILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            measured = json.load(f)
+    except (OSError, ValueError):
+        return _auto
+    if measured.get("cpu_count") != os.cpu_count():
+        print(f"ℹ️ {path} was measured on {measured.get('cpu_count')} CPUs; using '{_auto}'. "
+              f"Re-run `python encoding.py --calibrate`.")
+        return _auto
+
+    speeds = {name: m.get("realtime_factor", 0) for name, m in measured.get("profiles", {}).items()}
+    ranked = [name for name in QUALITY_ORDER if name in speeds]
+    if ranked:
+        fast_enough = [name for name in ranked if speeds[name] >= MIN_REALTIME_FACTOR]
+        _auto = fast_enough[0] if fast_enough else max(ranked, key=speeds.get)
+    return _auto
+
+
+def get_profile(name=None, intermediate=False):
+    """
+    Returns a copy of a named profile with the crf adjusted for intermediates.
+    "auto" (the default) resolves through auto_profile().
+
+    Raises:
+        ValueError: if the profile name is unknown.
+    """
+    name = name or DEFAULT_PROFILE
+    if name == AUTO_PROFILE:
+        name = auto_profile()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoding profile '{name}' (choose from {', '.join(PROFILES)})")
+    profile = dict(PROFILES[name], name=name)
+    if intermediate:
+        profile["crf"] = max(0, profile["crf"] + INTERMEDIATE_CRF_OFFSET)
+    return profile
+
+
+def video_args(name=None, intermediate=False, threads=None):
+    """ffmpeg output arguments for the video stream."""
+    profile = get_profile(name, intermediate)
+    return [
+        "-c:v", VIDEO_CODEC,
+        "-preset", profile["preset"],
+        "-crf", str(profile["crf"]),
+        "-pix_fmt", PIX_FMT,
+        "-threads", str(threads or encoder_threads()),
+    ]
+
+
+def audio_args(name=None):
+    """ffmpeg output arguments for the audio stream."""
+    return ["-c:a", AUDIO_CODEC, "-b:a", get_profile(name)["audio_bitrate"]]
+
+
+def moviepy_kwargs(name=None, intermediate=False, threads=None):
+    """Keyword arguments for MoviePy's write_videofile / write_videofile-alikes."""
+    profile = get_profile(name, intermediate)
+    return {
+        "codec": VIDEO_CODEC,
+        "audio_codec": AUDIO_CODEC,
+        "audio_bitrate": profile["audio_bitrate"],
+        "preset": profile["preset"],
+        "threads": threads or encoder_threads(),
+        "ffmpeg_params": ["-crf", str(profile["crf"])],
+    }
+
+
+# ============================
+# Calibration
+# ============================
+def _encode_once(name, source_args, seconds, fps, threads):
+    from clip_reader import ffmpeg_binary
+
+    out = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
+    cmd = (
+        [ffmpeg_binary(), "-y", "-loglevel", "error", "-nostdin"]
+        + source_args
+        + ["-t", str(seconds), "-r", str(fps), "-an"]
+        + video_args(name, threads=threads)
+        + [out]
+    )
+    try:
+        started = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(out)
+    finally:
+        if os.path.exists(out):
+            os.remove(out)
+
+    frames = int(seconds * fps)
+    return {
+        "encode_fps": round(frames / elapsed, 1),
+        "realtime_factor": round(seconds / elapsed, 2),
+        "mbit_per_sec": round(size * 8 / seconds / 1e6, 2),
+        "bytes": size,
+    }
+
+
+def calibrate(input_path=None, seconds=10, size=(1080, 1920), fps=24, profiles=None,
+              output_path=CALIBRATION_FILE):
+    """
+    Encodes the same material with every profile and records encode speed and
+    output size for this machine.
+
+    Args:
+        input_path (str): Real footage to encode; a synthetic test pattern is used if omitted.
+
+    Returns:
+        dict: {"cpu_count", "threads", "source", "profiles": {name: measurements}}
+    """
+    if input_path:
+        source_args = ["-i", input_path, "-vf", f"scale={size[0]}:{size[1]}"]
+    else:
+        source_args = ["-f", "lavfi", "-i", f"testsrc2=size={size[0]}x{size[1]}:rate={fps}"]
+
+    threads = encoder_threads()
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "threads": threads,
+        "source": input_path or "testsrc2",
+        "seconds": seconds,
+        "profiles": {},
+    }
+
+    for name in profiles or PROFILES:
+        measured = _encode_once(name, source_args, seconds, fps, threads)
+        result["profiles"][name] = measured
+        print(f"🎚️ {name:<9} {measured['encode_fps']:>7.1f} fps  "
+              f"x{measured['realtime_factor']:<6} {measured['mbit_per_sec']:>6.2f} Mbit/s")
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"📝 Calibration saved to {output_path}")
+
+    global _auto
+    _auto = None
+    print(f"✅ ENCODING_PROFILE=auto now uses '{auto_profile(output_path)}'")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encoding profiles and calibration")
+    parser.add_argument("--calibrate", action="store_true", help="measure every profile on this machine")
+    parser.add_argument("--input", help="footage to calibrate with (default: synthetic test pattern)")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    if args.calibrate:
+        try:
+            calibrate(args.input, seconds=args.seconds)
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Calibration encode failed: {e.stderr.decode(errors='ignore')[-500:]}")
+            sys.exit(1)
+    else:
+        for profile_name in PROFILES:
+            print(profile_name, video_args(profile_name), audio_args(profile_name))
+        print(f"auto → {auto_profile()}")
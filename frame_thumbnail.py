@@ -0,0 +1,196 @@
+import os
+import subprocess
+
+from clip_reader import ffmpeg_binary, probe_duration, ScaledClipReader
+
+# Picks the thumbnail from the rendered video itself: frames are sampled at low
+# resolution, scored in vectorised batches, and only the winner is decoded
+# again at full resolution from the source.
+
+SAMPLE_SIZE = (180, 320)      # portrait analysis size (w, h)
+SAMPLE_EVERY_SEC = 0.5
+MAX_SAMPLES = 240             # long-form: sample less often instead of holding more frames
+SCORE_BATCH = 32              # frames converted to float32 at a time
+EDGE_SKIP = 0.05              # ignore the first/last 5% (fades, end cards)
+
+# Relative weights of the normalised scores
+WEIGHTS = {
+    "sharpness": 0.35,
+    "contrast": 0.20,
+    "colourfulness": 0.25,
+    "clear_centre": 0.20,
+}
+
+
+def sample_frames(video_path, size=SAMPLE_SIZE, every_sec=SAMPLE_EVERY_SEC):
+    """
+    Decodes one low-resolution frame every `every_sec` seconds (spread further
+    apart on long videos so at most MAX_SAMPLES frames are kept).
+
+    Returns:
+        (times, frames): list of timestamps and a uint8 array (N, H, W, 3).
+    """
+    import numpy as np
+
+    duration = probe_duration(video_path)
+    if duration <= 0:
+        raise Exception(f"Could not read duration of {video_path}")
+
+    every_sec = max(every_sec, duration / MAX_SAMPLES)
+    fps = 1.0 / every_sec
+    reader = ScaledClipReader(video_path, 0.0, duration, size, fps)
+    try:
+        times = [i / fps for i in range(reader.n_frames)]
+        frames = np.stack([reader.get_frame(t).copy() for t in times])
+    finally:
+        reader.close()
+    return times, frames
+
+
+def _frame_metrics(frames):
+    """Raw metrics (and mean brightness) of a small batch of RGB frames (n, H, W, 3)."""
+    import numpy as np
+
+    rgb = frames.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    gray = 0.299 * r + 0.587 * g + 0.114 * b
+
+    # Sharpness: variance of the 4-neighbour Laplacian
+    lap = (
+        gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:]
+        - 4.0 * gray[:, 1:-1, 1:-1]
+    )
+    sharpness = lap.var(axis=(1, 2))
+
+    contrast = gray.std(axis=(1, 2))
+
+    # Hasler & Süsstrunk colourfulness
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    colourfulness = (
+        np.sqrt(rg.std(axis=(1, 2)) ** 2 + yb.std(axis=(1, 2)) ** 2)
+        + 0.3 * np.sqrt(rg.mean(axis=(1, 2)) ** 2 + yb.mean(axis=(1, 2)) ** 2)
+    )
+
+    # Clear centre: little skin tone (a cheap stand-in for faces) where the hook text goes
+    h, w = gray.shape[1:]
+    centre = (slice(None), slice(h // 3, 2 * h // 3), slice(w // 6, 5 * w // 6))
+    cb = 128 - 0.168736 * r[centre] - 0.331264 * g[centre] + 0.5 * b[centre]
+    cr = 128 + 0.5 * r[centre] - 0.418688 * g[centre] - 0.081312 * b[centre]
+    skin = ((cb >= 77) & (cb <= 127) & (cr >= 133) & (cr <= 173)).mean(axis=(1, 2))
+    clear_centre = 1.0 - skin
+
+    return {
+        "sharpness": sharpness,
+        "contrast": contrast,
+        "colourfulness": colourfulness,
+        "clear_centre": clear_centre,
+        "brightness": gray.mean(axis=(1, 2)),
+    }
+
+
+class RenderSampler:
+    """
+    Keeps low-resolution thumbnail candidates of frames as a renderer produces
+    them, so the thumbnail needs no second decode of the output.
+
+    Usage:
+        sampler = RenderSampler(duration, fps, size=(320, 180))
+        sampler.offer(frame_index, frame)          # for every rendered frame
+        extract_best_thumbnail(path, out, frames=sampler.frames, times=sampler.times)
+    """
+
+    def __init__(self, duration, fps, size=SAMPLE_SIZE, every_sec=SAMPLE_EVERY_SEC):
+        self.fps = fps
+        self.size = size
+        self.step = max(1, int(round(max(every_sec, duration / MAX_SAMPLES) * fps)))
+        self.times = []
+        self.frames = []
+
+    def offer(self, index, frame):
+        """Keeps every `step`-th frame, nearest-neighbour downscaled to `size`."""
+        import numpy as np
+
+        if index % self.step:
+            return
+        h, w = frame.shape[:2]
+        sw, sh = self.size
+        ys = np.arange(sh) * h // sh
+        xs = np.arange(sw) * w // sw
+        self.frames.append(frame[ys][:, xs, :3])
+        self.times.append(index / self.fps)
+
+
+def score_frames(frames, batch=SCORE_BATCH):
+    """
+    Scores a stack of RGB frames (N, H, W, 3) for thumbnail quality. Metrics are
+    computed `batch` frames at a time, then normalised over the whole stack.
+
+    Returns:
+        (scores, metrics): combined score per frame and the raw metric arrays.
+    """
+    import numpy as np
+
+    parts = [_frame_metrics(frames[i:i + batch]) for i in range(0, len(frames), batch)]
+    metrics = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    brightness = metrics.pop("brightness")
+
+    scores = np.zeros(len(frames), dtype=np.float32)
+    for name, weight in WEIGHTS.items():
+        values = metrics[name]
+        span = values.max() - values.min()
+        scores += weight * ((values - values.min()) / span if span > 0 else 0.0)
+
+    # Near-black frames (fades) never win
+    scores[brightness < 20] = -1.0
+    return scores, metrics
+
+
+def grab_frame(video_path, t, output_path):
+    """Writes the full-resolution frame at `t` seconds of the source video."""
+    cmd = [
+        ffmpeg_binary(), "-y", "-loglevel", "error", "-nostdin",
+        "-ss", f"{t:.3f}", "-i", video_path,
+        "-frames:v", "1", "-q:v", "2",
+        output_path
+    ]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return output_path
+
+
+def extract_best_thumbnail(video_path, output_path, frames=None, times=None, size=SAMPLE_SIZE):
+    """
+    Saves the best-scoring frame of a rendered video as the thumbnail.
+
+    Args:
+        frames, times: low-resolution frames already decoded elsewhere, e.g. by a
+            RenderSampler during the render; when omitted (or empty) they are
+            sampled from `video_path`.
+        size: analysis size (w, h); should match the video's orientation.
+
+    Returns:
+        str: output_path, or None if no frame could be chosen.
+    """
+    import numpy as np
+
+    try:
+        if frames is None or times is None or len(frames) == 0:
+            times, frames = sample_frames(video_path, size=size)
+        frames = np.asarray(frames)
+
+        scores, _ = score_frames(frames)
+        n = len(scores)
+        skip = int(n * EDGE_SKIP)
+        if n - 2 * skip > 0:
+            scores[:skip] = -1.0
+            scores[n - skip:] = -1.0
+
+        best = int(np.argmax(scores))
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        grab_frame(video_path, times[best], output_path)
+        print(f"🖼️ Thumbnail frame at {times[best]:.2f}s (score {scores[best]:.2f}) → {output_path}")
+        return output_path
+
+    except Exception as e:
+        print(f"⚠️ Could not extract thumbnail frame: {e}")
+        return None
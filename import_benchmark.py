@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# --- Configuration ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "logs", "import_times.jsonl")
+ENTRY_MODULES = ["test", "transcribe", "thumbnail", "Overlay", "Upload", "upload_queue"]
+
+
+def measure_import(module, runs=3):
+    """
+    Imports `module` in a fresh interpreter with `-X importtime` and returns the
+    best-of-N total plus the slowest top-level imports it pulled in.
+
+    Returns:
+        dict: {"module", "total_ms", "top": [(name, cumulative_ms), ...]}
+    """
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=BASE_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+        # Lines look like: "import time:       123 |        456 |   package.module"
+        entries = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            try:
+                _, cumulative, name = line[len("import time:"):].split("|")
+                entries.append((name.rstrip(), int(cumulative)))
+            except ValueError:
+                continue  # header row
+
+        # Top-level imports are the ones without indentation under the package column
+        top_level = [(n.strip(), us) for n, us in entries if not n.startswith("   ")]
+        own = next((us for n, us in top_level if n == module), None)
+        total_us = own if own is not None else sum(us for _, us in top_level)
+
+        if best is None or total_us < best["total_us"]:
+            children = sorted(
+                ((n.strip(), us) for n, us in entries if n.startswith("   ") and not n.startswith("     ")),
+                key=lambda e: e[1],
+                reverse=True
+            )
+            best = {"total_us": total_us, "top": children[:5]}
+
+    return {
+        "module": module,
+        "total_ms": round(best["total_us"] / 1000.0, 1),
+        "top": [(n, round(us / 1000.0, 1)) for n, us in best["top"]]
+    }
+
+
+def run_benchmark(modules=ENTRY_MODULES, runs=3, record=True):
+    results = []
+    for module in modules:
+        result = measure_import(module, runs=runs)
+        results.append(result)
+        print(f"⏱ {module:<14} {result['total_ms']:>8.1f} ms")
+        for name, ms in result["top"]:
+            print(f"      {name:<40} {ms:>8.1f} ms")
+
+    if record:
+        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": sys.version.split()[0],
+                "results": {r["module"]: r["total_ms"] for r in results}
+            }) + "\n")
+        print(f"📈 Appended to {HISTORY_FILE}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start import cost of the pipeline entry points")
+    parser.add_argument("modules", nargs="*", default=ENTRY_MODULES)
+    parser.add_argument("--runs", type=int, default=3, help="best-of-N fresh interpreters")
+    parser.add_argument("--max-ms", type=float, help="exit non-zero if any module exceeds this budget")
+    parser.add_argument("--no-record", action="store_true", help="do not append to the history file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.modules, runs=args.runs, record=not args.no_record)
+
+    if args.max_ms is not None:
+        over = [r for r in results if r["total_ms"] > args.max_ms]
+        if over:
+            print(f"❌ Over budget ({args.max_ms} ms): {', '.join(r['module'] for r in over)}")
+            sys.exit(1)
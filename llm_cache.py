@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from contextlib import closing, contextmanager
+
+# Every Gemini generate_content call goes through generate_content() below.
+# Text responses from call sites that opt in are stored compressed in SQLite,
+# keyed by a fingerprint of model + prompt + config, with size and age limits.
+
+CACHE_DB = os.getenv("LLM_CACHE_DB", os.path.join("cache", "llm_cache.db"))
+STATS_FILE = os.path.join("logs", "llm_cache_stats.json")
+MAX_BYTES = 50 * 1024 * 1024
+MAX_AGE_SEC = 14 * 24 * 60 * 60
+
+# Per call site: True = cached. Creative or non-text calls stay uncached.
+SITE_POLICY = {
+    "keywords": True,        # visual search keywords per segment
+    "package_meta": True,    # hook/title/description/tags for a given script
+    "package": False,        # full package includes a fresh script
+    "plan": False,           # batch topic planning
+    "topic": False,          # topic selection
+    "script": False,
+    "tts": False,            # audio, not text
+    "image": False,          # image, not text
+}
+
+# LLM_CACHE=off disables caching; LLM_CACHE_SITES="keywords,package" overrides the policy
+_env_sites = os.getenv("LLM_CACHE_SITES")
+if _env_sites is not None:
+    SITE_POLICY = {site: False for site in SITE_POLICY}
+    SITE_POLICY.update({s.strip(): True for s in _env_sites.split(",") if s.strip()})
+CACHE_ENABLED = os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    site        TEXT,
+    model       TEXT,
+    payload     BLOB NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    site   TEXT PRIMARY KEY,
+    hits   INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    bypass INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_lock = threading.Lock()
+_clients = {}                 # api key -> genai.Client, reused for the life of the process
+_bypassed = {}                # site -> uncached calls not yet written to the stats table
+
+
+class CachedResponse:
+    """Stands in for a Gemini response on a cache hit (text-only)."""
+
+    def __init__(self, text):
+        self.text = text
+        self.candidates = None
+        self.cached = True
+
+
+def _connect():
+    os.makedirs(os.path.dirname(CACHE_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+@contextmanager
+def _session():
+    """
+    One locked transaction on a connection that is closed afterwards (sqlite3's own
+    context manager commits but never closes). Pending bypass counts are flushed.
+    """
+    with _lock, closing(_connect()) as conn, conn:
+        for site, n in _bypassed.items():
+            conn.execute("INSERT OR IGNORE INTO stats (site) VALUES (?)", (site,))
+            conn.execute("UPDATE stats SET bypass = bypass + ? WHERE site = ?", (n, site))
+        yield conn
+        _bypassed.clear()        # kept for the next session if this one rolled back
+
+
+def _config_fingerprint(config):
+    if config is None:
+        return None
+    if hasattr(config, "model_dump"):
+        return config.model_dump(mode="json", exclude_none=True)
+    if isinstance(config, dict):
+        return config
+    return repr(config)
+
+
+def fingerprint(model, contents, config=None):
+    """Stable key for (model, prompt, config)."""
+    blob = json.dumps(
+        {"model": model, "contents": contents, "config": _config_fingerprint(config)},
+        sort_keys=True,
+        default=str,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _count(conn, site, field):
+    conn.execute("INSERT OR IGNORE INTO stats (site) VALUES (?)", (site,))
+    conn.execute(f"UPDATE stats SET {field} = {field} + 1 WHERE site = ?", (site,))
+
+
+def _get(key, site):
+    with _session() as conn:
+        row = conn.execute(
+            "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row and time.time() - row[1] <= MAX_AGE_SEC:
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            _count(conn, site, "hits")
+            return zlib.decompress(row[0]).decode("utf-8")
+        _count(conn, site, "misses")
+        return None
+
+
+def _put(key, site, model, text):
+    payload = zlib.compress(text.encode("utf-8"), 6)
+    now = time.time()
+    with _session() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, site, model, payload, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, site, model, payload, len(payload), now, now)
+        )
+        _evict(conn, now)
+
+
+def _evict(conn, now):
+    """Drops expired entries, then least recently used ones until under MAX_BYTES."""
+    conn.execute("DELETE FROM responses WHERE created_at < ?", (now - MAX_AGE_SEC,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        total -= size
+        if total <= MAX_BYTES:
+            break
+
+
+def get_client(api_key):
+    """Shared Gemini client for `api_key` (created once per process)."""
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            import google.genai as genai
+            client = _clients[api_key] = genai.Client(api_key=api_key)
+        return client
+
+
+def generate_content(client, site, model, contents, config=None, cache=None):
+    """
+    Calls client.models.generate_content, serving text responses from the cache
+    when the call site opts in.
+
+    Args:
+        site (str): Call-site name used for the policy and hit-rate stats.
+        cache (bool): Per-call override of SITE_POLICY.
+    """
+    use_cache = CACHE_ENABLED and (SITE_POLICY.get(site, False) if cache is None else cache)
+
+    kwargs = {"model": model, "contents": contents}
+    if config is not None:
+        kwargs["config"] = config
+
+    if not use_cache:
+        # Counted in memory; written with the next cache lookup or stats export
+        with _lock:
+            _bypassed[site] = _bypassed.get(site, 0) + 1
+        return client.models.generate_content(**kwargs)
+
+    key = fingerprint(model, contents, config)
+    try:
+        text = _get(key, site)
+        if text is not None:
+            return CachedResponse(text)
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM cache read failed: {e}")
+
+    response = client.models.generate_content(**kwargs)
+    text = getattr(response, "text", None)
+    if text:
+        try:
+            _put(key, site, model, text)
+        except sqlite3.Error as e:
+            print(f"⚠️ LLM cache write failed: {e}")
+    return response
+
+
+def cache_stats():
+    """Per-site hits/misses/bypass counts and hit rates, plus store size."""
+    with _session() as conn:
+        rows = conn.execute("SELECT site, hits, misses, bypass FROM stats ORDER BY site").fetchall()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    sites = {}
+    for site, hits, misses, bypass in rows:
+        looked_up = hits + misses
+        sites[site] = {
+            "hits": hits,
+            "misses": misses,
+            "bypass": bypass,
+            "hit_rate": round(hits / looked_up, 3) if looked_up else None,
+        }
+    return {"entries": entries, "bytes": size, "sites": sites}
+
+
+def export_stats(path=STATS_FILE):
+    """Writes cache_stats() as JSON (for dashboards/cron) and returns it."""
+    stats = cache_stats()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+
+if __name__ == "__main__":
+    print(json.dumps(export_stats(), indent=2))
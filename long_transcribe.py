@@ -0,0 +1,148 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Long narrations (minutes, not seconds) are split at pauses found by a cheap
+# energy VAD and the pieces are transcribed concurrently by one faster-whisper
+# model (num_workers > 1 lets CTranslate2 serve parallel calls). Timestamps are
+# shifted back by each chunk's offset so the result reads like one transcript.
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+CHUNK_TARGET_SEC = 30        # start looking for a pause after this much audio
+CHUNK_MAX_SEC = 45           # cut here even without a pause
+MIN_PAUSE_SEC = 0.2
+TRANSCRIBE_CORES = int(os.getenv("TRANSCRIBE_CORES", "0"))   # 0 = all usable cores
+
+Segment = namedtuple("Segment", ["start", "end", "text"])
+
+
+def core_budget():
+    if TRANSCRIBE_CORES:
+        return TRANSCRIBE_CORES
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 2
+
+
+def frame_energy(audio, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """RMS energy per frame (dB) of a float32 mono array."""
+    import numpy as np
+
+    frame = int(sample_rate * frame_ms / 1000)
+    n = len(audio) // frame
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n * frame].reshape(n, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+
+def find_speech_chunks(audio, sample_rate=SAMPLE_RATE, target_sec=CHUNK_TARGET_SEC,
+                       max_sec=CHUNK_MAX_SEC):
+    """
+    Splits audio at voice-activity boundaries.
+
+    Frames quieter than a threshold derived from the noise floor count as
+    silence; each chunk ends in the middle of the longest pause between
+    `target_sec` and `max_sec` (or at the quietest frame if there is none).
+    Chunks with no speech at all are dropped.
+
+    Returns:
+        list: (start_sample, end_sample) pairs in order.
+    """
+    import numpy as np
+
+    frame = int(sample_rate * FRAME_MS / 1000)
+    energy = frame_energy(audio, sample_rate)
+    n = len(energy)
+    if n == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    floor = np.percentile(energy, 10)
+    peak = np.percentile(energy, 95)
+    threshold = floor + 0.25 * (peak - floor)
+    silent = energy < threshold
+
+    per_sec = 1000 / FRAME_MS
+    target, limit = int(target_sec * per_sec), int(max_sec * per_sec)
+    min_pause = max(1, int(MIN_PAUSE_SEC * per_sec))
+
+    cuts = []
+    start = 0
+    while n - start > limit:
+        lo, hi = start + target, min(n, start + limit)
+
+        # Longest silent run inside the search window
+        best_len, best_mid, run = 0, None, 0
+        for i in range(lo, hi):
+            run = run + 1 if silent[i] else 0
+            if run >= min_pause and run > best_len:
+                best_len, best_mid = run, i - run // 2
+        cut = best_mid if best_mid is not None else lo + int(np.argmin(energy[lo:hi]))
+        cuts.append(cut)
+        start = cut
+
+    bounds = [0] + cuts + [n]
+    chunks = []
+    for a, b in zip(bounds, bounds[1:]):
+        if silent[a:b].all():
+            continue
+        end = len(audio) if b == n else b * frame
+        chunks.append((a * frame, end))
+    return chunks
+
+
+def transcribe_long(model, audio, workers, sample_rate=SAMPLE_RATE, **transcribe_kwargs):
+    """
+    Transcribes VAD chunks concurrently and stitches the segments together.
+
+    Args:
+        model: a faster_whisper.WhisperModel created with num_workers >= workers.
+
+    Returns:
+        (segments, stats): time-ordered Segment tuples and
+            {"audio_sec", "wall_sec", "realtime_factor", "chunks", "workers"}.
+    """
+    chunks = find_speech_chunks(audio, sample_rate)
+    started = time.perf_counter()
+
+    def run(chunk):
+        a, b = chunk
+        offset = a / sample_rate
+        pieces, _ = model.transcribe(audio[a:b], **transcribe_kwargs)
+        # The generator does the decoding, so consume it inside the worker
+        return [
+            Segment(offset + seg.start, min(offset + seg.end, b / sample_rate), seg.text)
+            for seg in pieces
+        ]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(run, chunks))
+
+    wall = time.perf_counter() - started
+    audio_sec = len(audio) / sample_rate
+    stats = {
+        "audio_sec": round(audio_sec, 2),
+        "wall_sec": round(wall, 2),
+        "realtime_factor": round(audio_sec / wall, 2) if wall > 0 else None,
+        "chunks": len(chunks),
+        "workers": workers,
+    }
+    segments = [seg for chunk_segments in results for seg in chunk_segments]
+    return segments, stats
+
+
+def plan_workers(audio, sample_rate=SAMPLE_RATE, cores=None):
+    """
+    Splits the core budget between concurrent chunks.
+
+    Returns:
+        (workers, cpu_threads): model num_workers and threads per worker.
+    """
+    cores = cores or core_budget()
+    n_chunks = max(1, int(len(audio) / sample_rate // CHUNK_TARGET_SEC))
+    workers = max(1, min(n_chunks, cores // 2))
+    return workers, max(1, cores // workers)
@@ -0,0 +1,146 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import encoding
+from clip_reader import ffmpeg_binary, choose_window, scale_crop_filter
+
+# Every segment is transcoded into the same "mezzanine" format (size, fps, GOP,
+# pix_fmt, timebase, exact frame count) so the final assembly is a stream-copy
+# concat plus one audio mux instead of a MoviePy compose + full re-encode.
+
+MEZZANINE_SIZE = (1080, 1920)
+MEZZANINE_FPS = 24
+MEZZANINE_GOP = 48              # one closed GOP per 2 s at 24 fps
+MEZZANINE_PIX_FMT = encoding.PIX_FMT
+MEZZANINE_PROFILE = None       # encoding profile (None = encoding.DEFAULT_PROFILE)
+PLACEHOLDER_COLOR = "0x141414"  # same dark grey as the MoviePy placeholder
+
+
+def _frame_count(duration, fps):
+    return max(1, int(round(duration * fps)))
+
+
+def _encode_args(fps, threads):
+    return [
+        "-an", "-sn",
+    ] + encoding.video_args(MEZZANINE_PROFILE, intermediate=True, threads=threads) + [
+        "-r", str(fps),
+        "-g", str(MEZZANINE_GOP),
+        "-keyint_min", str(MEZZANINE_GOP),
+        "-sc_threshold", "0",
+        "-flags", "+cgop",
+        "-video_track_timescale", str(fps * 512),
+    ]
+
+
+def normalize_clip(src, out_path, duration, start=0.0, loop=False,
+                   size=MEZZANINE_SIZE, fps=MEZZANINE_FPS, threads=1):
+    """Transcodes [start, start + duration) of `src` into a mezzanine segment."""
+    cmd = [ffmpeg_binary(), "-y", "-loglevel", "error", "-nostdin"]
+    if loop:
+        cmd += ["-stream_loop", "-1"]
+    cmd += [
+        "-ss", f"{start:.3f}",
+        "-i", src,
+        # tpad clones the last frame if the source ends early, -frames:v cuts exactly
+        "-vf", scale_crop_filter(size, fps) + f",tpad=stop_mode=clone:stop_duration={duration:.3f}",
+        "-frames:v", str(_frame_count(duration, fps)),
+    ] + _encode_args(fps, threads) + [out_path]
+
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return out_path
+
+
+def placeholder_segment(out_path, duration, size=MEZZANINE_SIZE, fps=MEZZANINE_FPS, threads=1):
+    """Solid-colour mezzanine segment used when no clip could be found."""
+    w, h = size
+    cmd = [
+        ffmpeg_binary(), "-y", "-loglevel", "error", "-nostdin",
+        "-f", "lavfi",
+        "-i", f"color=c={PLACEHOLDER_COLOR}:s={w}x{h}:r={fps}",
+        "-vf", "setsar=1",
+        "-frames:v", str(_frame_count(duration, fps)),
+    ] + _encode_args(fps, threads) + [out_path]
+
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return out_path
+
+
+class MezzaninePool:
+    """
+    Normalises segments in a worker pool while later clips are still downloading.
+
+    Usage:
+        pool = MezzaninePool(out_dir)
+        pool.submit(0, clip_path, 3.0)     # as soon as each download finishes
+        paths = pool.results()             # ordered by segment index
+    """
+
+    def __init__(self, out_dir, workers=None, size=MEZZANINE_SIZE, fps=MEZZANINE_FPS):
+        cores = os.cpu_count() or 2
+        self.workers = workers or max(1, min(4, cores // 2))
+        self.threads = max(1, cores // self.workers)
+        self.out_dir = out_dir
+        self.size = size
+        self.fps = fps
+        self.futures = {}
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _job(self, index, src, duration):
+        out_path = os.path.join(self.out_dir, f"seg_{index:04d}.mp4")
+        if src:
+            try:
+                start, loop = choose_window(src, duration)
+                return normalize_clip(src, out_path, duration, start, loop,
+                                      self.size, self.fps, self.threads)
+            except Exception as e:
+                detail = getattr(e, "stderr", b"") or b""
+                print(f"⚠️ Segment {index + 1} normalisation failed, using placeholder: "
+                      f"{e} {detail.decode(errors='ignore')[-300:]}")
+        return placeholder_segment(out_path, duration, self.size, self.fps, self.threads)
+
+    def submit(self, index, src, duration):
+        self.futures[index] = self.executor.submit(self._job, index, src, duration)
+
+    def results(self):
+        """Waits for every segment and returns their paths in index order."""
+        try:
+            return [self.futures[i].result() for i in sorted(self.futures)]
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def cancel(self):
+        for future in self.futures.values():
+            future.cancel()
+        self.executor.shutdown(wait=True)
+
+
+def concat_with_audio(segment_paths, audio_path, output_path, duration=None, profile=None):
+    """
+    Joins mezzanine segments by stream copy and muxes the narration in one pass,
+    encoding the audio with `profile` (None = encoding.DEFAULT_PROFILE).
+    """
+    list_path = os.path.splitext(output_path)[0] + "_segments.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    cmd = [
+        ffmpeg_binary(), "-y", "-loglevel", "error", "-nostdin",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy",
+    ] + encoding.audio_args(profile)
+    if duration:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-movflags", "+faststart", output_path]
+
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+    return output_path
@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import bisect
+import random
+import hashlib
+import threading
+
+from clip_reader import probe_duration, ScaledClipReader
+
+# Picks the subclip window instead of a blind random.uniform(): a clip is
+# sampled at low resolution, frame differences give a motion score per step
+# and flag scene cuts, dark samples mark fades. Whole clips are analysed off
+# the render path (warm(), e.g. by the prefetcher) and the scores cached in a
+# sidecar keyed by Pexels video id under MOTION_CACHE_DIR, validated by a
+# content key; window scores for a given length are one vectorised prefix-sum
+# pass, sorted once, after which picks are a bisect. A clip without an index
+# on the render path only has a few candidate windows decoded.
+
+MOTION_CACHE_DIR = os.getenv("MOTION_CACHE_DIR", os.path.join("cache", "motion"))
+
+ANALYSIS_SIZE = (64, 112)        # w, h (portrait-ish; aspect only affects the crop)
+ANALYSIS_FPS = 4
+MOTION_REF = 0.04                # mean abs luma change per step that counts as "lively"
+CUT_MIN = 0.20                   # a step this different (and >> median) is a hard cut
+CUT_MEDIAN_FACTOR = 4.0
+DARK_LUMA = 0.08                 # fades / black frames
+CUT_PENALTY = 2.0
+TOP_FRACTION = 0.9               # choose randomly among windows scoring >= 90% of the best
+CANDIDATE_WINDOWS = 6            # windows decoded when a clip has no index yet
+CONTENT_BLOCKS = 16              # blocks hashed for the sidecar's content key
+BLOCK_BYTES = 4096
+INDEX_VERSION = 2
+
+_memo = {}                       # clip path -> MotionIndex (per job, see forget)
+_memo_lock = threading.Lock()
+
+
+def sidecar_path(path):
+    """
+    Cache file for a clip: cache/motion/<pexels id>.json for downloaded clips
+    ("..._<id>.mp4"), else "<clip>.motion.json" next to the clip.
+    """
+    match = re.search(r"_(\d+)\.mp4$", os.path.basename(path))
+    if match:
+        return os.path.join(MOTION_CACHE_DIR, f"{match.group(1)}.json")
+    return path + ".motion.json"
+
+
+class MotionIndex:
+    """Per-step scores of one clip and cached window scores per window length."""
+
+    def __init__(self, fps, motion, cuts, dark, duration):
+        import numpy as np
+
+        self.fps = fps
+        self.duration = duration
+        self.motion = np.asarray(motion, dtype=np.float32)   # per step (between samples)
+        self.cuts = np.asarray(cuts, dtype=np.float32)       # 1.0 where a step is a cut
+        self.dark = np.asarray(dark, dtype=np.float32)       # per sample
+        self._windows = {}
+        self._ranked = {}                                    # length -> (sorted scores, starts)
+
+    def to_json(self):
+        return {
+            "version": INDEX_VERSION,
+            "fps": self.fps,
+            "duration": self.duration,
+            "motion": [round(float(v), 4) for v in self.motion],
+            "cuts": [int(v) for v in self.cuts],
+            "dark": [int(v) for v in self.dark],
+        }
+
+    def window_scores(self, length):
+        """Score of every window of `length` samples (vectorised, memoised per length)."""
+        import numpy as np
+
+        if length not in self._windows:
+            steps = length - 1
+            n_starts = len(self.dark) - length + 1
+            if n_starts <= 0 or steps <= 0:
+                self._windows[length] = np.zeros(max(1, n_starts), dtype=np.float32)
+            else:
+                quality = np.minimum(self.motion / MOTION_REF, 1.0)
+                q = np.concatenate([[0.0], np.cumsum(quality)])
+                c = np.concatenate([[0.0], np.cumsum(self.cuts)])
+                d = np.concatenate([[0.0], np.cumsum(self.dark)])
+                starts = np.arange(n_starts)
+                score = (
+                    (q[starts + steps] - q[starts]) / steps
+                    - CUT_PENALTY * (c[starts + steps] - c[starts])
+                    - (d[starts + length] - d[starts]) / length
+                )
+                self._windows[length] = score.astype(np.float32)
+        return self._windows[length]
+
+    def ranked_windows(self, length):
+        """Window scores for `length` in ascending order and their start samples (memoised)."""
+        import numpy as np
+
+        if length not in self._ranked:
+            scores = self.window_scores(length)
+            order = np.argsort(scores, kind="stable")
+            self._ranked[length] = (scores[order].tolist(), order)
+        return self._ranked[length]
+
+    def best_window(self, duration, top_fraction=TOP_FRACTION):
+        """
+        Returns:
+            float: start time (s) of a window of `duration` seconds, chosen at
+                random among those scoring within `top_fraction` of the best.
+        """
+        length = max(2, int(round(duration * self.fps)) + 1)
+        ranked, starts = self.ranked_windows(length)
+        best = ranked[-1]
+        first = bisect.bisect_left(ranked, best - abs(best) * (1 - top_fraction))
+        start = int(starts[random.randrange(first, len(ranked))]) / self.fps
+        return min(start, max(0.0, self.duration - duration))
+
+
+def content_key(path):
+    """
+    Size plus a hash of CONTENT_BLOCKS blocks spread over the file. A sparse
+    partial fetch (partial_fetch.py, zeros where nothing was fetched) has the
+    size of the full clip but not its key, so neither reuses the other's scores.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for i in range(CONTENT_BLOCKS):
+            f.seek(size * i // CONTENT_BLOCKS)
+            digest.update(f.read(BLOCK_BYTES))
+    return f"{size}:{digest.hexdigest()}"
+
+
+def _sample(path, start, duration, size, fps):
+    """Low-resolution luma (N, H, W) in [0, 1] for [start, start + duration)."""
+    import numpy as np
+
+    reader = ScaledClipReader(path, start, duration, size, fps)
+    try:
+        frames = np.stack([reader.get_frame(i / fps).copy() for i in range(reader.n_frames)])
+    finally:
+        reader.close()
+    return (frames.astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)) / 255.0
+
+
+def _index_from_luma(luma, fps, duration):
+    import numpy as np
+
+    diffs = np.abs(np.diff(luma, axis=0)).mean(axis=(1, 2)) if len(luma) > 1 else np.zeros(0)
+    median = float(np.median(diffs)) if len(diffs) else 0.0
+    cuts = (diffs > CUT_MIN) & (diffs > CUT_MEDIAN_FACTOR * max(median, 1e-3))
+    dark = luma.mean(axis=(1, 2)) < DARK_LUMA
+    return MotionIndex(fps, diffs, cuts, dark, duration)
+
+
+def analyze_clip(path, size=ANALYSIS_SIZE, fps=ANALYSIS_FPS):
+    """Samples the whole clip once at low resolution and computes motion/cut/dark scores."""
+    duration = probe_duration(path)
+    if duration <= 0:
+        raise Exception(f"Could not read clip duration: {path}")
+    return _index_from_luma(_sample(path, 0.0, duration, size, fps), fps, duration)
+
+
+def cached_index(path):
+    """The clip's MotionIndex from memory or a matching sidecar, or None (never analyses)."""
+    key = os.path.abspath(path)
+    with _memo_lock:
+        if key in _memo:
+            return _memo[key]
+
+    sidecar = sidecar_path(path)
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        with open(sidecar, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION or data.get("content_key") != content_key(path):
+            return None
+        index = MotionIndex(data["fps"], data["motion"], data["cuts"], data["dark"], data["duration"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+    with _memo_lock:
+        _memo[key] = index
+    return index
+
+
+def load_index(path):
+    """Returns the clip's MotionIndex, from memory, its sidecar, or a fresh analysis."""
+    index = cached_index(path)
+    if index is not None:
+        return index
+
+    index = analyze_clip(path)
+    data = index.to_json()
+    data["content_key"] = content_key(path)
+    sidecar = sidecar_path(path)
+    try:
+        os.makedirs(os.path.dirname(sidecar) or ".", exist_ok=True)
+        tmp = f"{sidecar}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, sidecar)
+    except OSError as e:
+        print(f"⚠️ Could not write motion index for {path}: {e}")
+
+    with _memo_lock:
+        _memo[os.path.abspath(path)] = index
+    return index
+
+
+def forget(root=None):
+    """Drops the in-memory indexes of clips under `root` (all when None), e.g. at job end."""
+    prefix = os.path.join(os.path.abspath(root), "") if root else ""
+    with _memo_lock:
+        for key in [k for k in _memo if k.startswith(prefix)]:
+            del _memo[key]
+
+
+def best_candidate_window(path, duration, clip_duration=None, candidates=CANDIDATE_WINDOWS,
+                          size=ANALYSIS_SIZE, fps=ANALYSIS_FPS):
+    """
+    Decodes only `candidates` windows of `duration` seconds (spread over the clip,
+    randomly offset) and returns the start of the best-scoring one.
+    """
+    if clip_duration is None:
+        clip_duration = probe_duration(path)
+    span = max(0.0, clip_duration - duration)
+    step = span / candidates
+    starts = [min(span, i * step + random.uniform(0, step)) for i in range(candidates)] if span else [0.0]
+
+    best_start, best_score = starts[0], None
+    for start in starts:
+        index = _index_from_luma(_sample(path, start, duration, size, fps), fps, duration)
+        score = float(index.window_scores(len(index.dark))[0])
+        if best_score is None or score > best_score:
+            best_start, best_score = start, score
+    return best_start
+
+
+def best_window(path, duration):
+    """
+    Start time of the best `duration`-second window of `path`: from the full index
+    when one is cached (see warm), else from a few candidate windows.
+    """
+    index = cached_index(path)
+    if index is not None:
+        return index.best_window(duration)
+    return best_candidate_window(path, duration)
+
+
+def warm(path):
+    """Analyses a clip off the critical path (e.g. right after a background download)."""
+    try:
+        load_index(path)
+    except Exception as e:
+        print(f"⚠️ Motion analysis failed for {os.path.basename(path)}: {e}")
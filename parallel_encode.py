@@ -0,0 +1,246 @@
+import os
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+
+import encoding
+from clip_reader import ffmpeg_binary, reader_pool
+
+# A single x264 process stops scaling after a few threads, and MoviePy renders
+# frames on one core in front of it. Here the timeline is cut into chunks (at
+# segment boundaries where we know them), each chunk is rendered and encoded by
+# its own forked process with identical settings and closed GOPs, and the chunks
+# are joined by stream copy with the audio muxed once.
+#
+# Children inherit the clip through fork(), so nothing is pickled: each call
+# hands its own job to its pool's initializer, so concurrent renders in one
+# process (daemon workers) never see each other's clip. Sources must be read
+# through clip_reader (its readers reopen their pipe after a fork); MoviePy's
+# own VideoFileClip readers would share one pipe between processes.
+#
+# fork() is only safe from a process that is effectively single-threaded: a
+# child inherits every lock held by another thread at that moment (stdout,
+# sqlite, reader_pool, MoviePy) and can deadlock on it. The daemon runs many
+# threads, so it calls disable_fork() and its renders encode in-process (one
+# ffmpeg subprocess per chunk, started with exec, which is unaffected).
+
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "0"))   # 0 = derive from core count
+MIN_CHUNK_SEC = 2.0
+CHUNKS_PER_WORKER = 2     # a few more chunks than workers evens out uneven segments
+
+_job = {}                 # set in each forked worker by _init_worker, never in the parent
+_fork_lock = threading.Lock()   # one pool forks at a time
+_fork_disabled = False
+
+
+def _init_worker(job):
+    _job.clear()
+    _job.update(job)
+
+
+def fork_available():
+    return not _fork_disabled and "fork" in multiprocessing.get_all_start_methods()
+
+
+def disable_fork():
+    """Renders in-process from now on (call before a multi-threaded process renders)."""
+    global _fork_disabled
+    _fork_disabled = True
+
+
+def default_workers():
+    return ENCODE_WORKERS or max(1, encoding.encoder_threads() // 2)
+
+
+def plan_chunks(duration, fps, workers, boundaries=None, min_chunk_sec=MIN_CHUNK_SEC):
+    """
+    Splits [0, duration) into frame-aligned chunks.
+
+    Args:
+        boundaries (list): Preferred cut times (e.g. segment starts). A uniform
+            grid is used when omitted.
+
+    Returns:
+        list: (first_frame, n_frames) per chunk, covering every frame once.
+    """
+    total = max(1, int(round(duration * fps)))
+    n_target = max(1, workers * CHUNKS_PER_WORKER)
+    target = max(int(min_chunk_sec * fps), total // n_target)
+
+    if boundaries:
+        cuts = sorted({int(round(b * fps)) for b in boundaries if 0 < b * fps < total})
+    else:
+        cuts = list(range(target, total, target))
+
+    chunks = []
+    first = 0
+    for cut in cuts:
+        if cut - first >= target and total - cut >= min_chunk_sec * fps:
+            chunks.append((first, cut - first))
+            first = cut
+    chunks.append((first, total - first))
+    return chunks
+
+
+def _chunk_command(out_path, size, fps, video_args):
+    w, h = size
+    return [
+        ffmpeg_binary(), "-y", "-loglevel", "error", "-nostdin",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}", "-r", str(fps),
+        "-i", "-",
+        "-an",
+    ] + video_args + [
+        "-flags", "+cgop",
+        "-video_track_timescale", str(fps * 512),
+        out_path
+    ]
+
+
+def _encode_chunk(task, job=None):
+    """
+    Renders frames [first, first + n) of the inherited clip into one file.
+
+    Returns:
+        (out_path, reader stats): this process's clip_reader pool report.
+    """
+    import numpy as np
+
+    index, first, n_frames, out_path = task
+    job = job or _job
+    clip, fps = job["clip"], job["fps"]
+    w, h = job["size"]
+
+    # stderr goes to a file: a pipe read only at the end could fill up and stall ffmpeg
+    with tempfile.TemporaryFile() as errors:
+        proc = subprocess.Popen(
+            _chunk_command(out_path, (w, h), fps, job["video_args"]),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=errors
+        )
+        try:
+            for i in range(first, first + n_frames):
+                frame = clip.get_frame(i / fps)
+                if frame.shape[2] > 3:
+                    frame = frame[:, :, :3]
+                proc.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass   # ffmpeg exited early; its error is reported below
+        except BaseException:
+            _kill(proc)
+            raise
+        finally:
+            # Pool workers run several chunks: don't keep this chunk's decoders alive
+            reader_pool.close_all()
+
+        if proc.wait() != 0:
+            errors.seek(0)
+            error = errors.read().decode(errors="ignore")
+            raise RuntimeError(f"chunk {index} encode failed: {error[-500:]}")
+    return out_path, reader_pool.report()
+
+
+def _kill(proc):
+    """Stops an encoder that is still being fed and reaps it."""
+    proc.kill()
+    proc.wait()
+    try:
+        proc.stdin.close()
+    except OSError:
+        pass
+
+
+def _write_clip_audio(clip, base):
+    if clip.audio is None:
+        return None
+    path = f"{base}_audio.wav"
+    clip.audio.write_audiofile(path, fps=44100, nbytes=2, codec="pcm_s16le", logger=None)
+    return path
+
+
+def _join_chunks(chunk_paths, output_path, audio_path, duration, profile):
+    list_path = os.path.splitext(output_path)[0] + "_chunks.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in chunk_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    cmd = [
+        ffmpeg_binary(), "-y", "-loglevel", "error", "-nostdin",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+    ]
+    if audio_path:
+        cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0?"]
+    cmd += ["-c:v", "copy"]
+    if audio_path:
+        cmd += encoding.audio_args(profile)
+    cmd += ["-t", f"{duration:.3f}", "-movflags", "+faststart", output_path]
+
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def write_parallel(clip, output_path, fps, audio_path=None, boundaries=None, workers=None,
+                   profile=None, intermediate=False):
+    """
+    Encodes a MoviePy clip across processes, then joins the chunks losslessly.
+
+    Args:
+        audio_path (str): File whose first audio track is muxed in. When omitted,
+            clip.audio (if any) is written once in the parent while chunks encode.
+        boundaries (list): Preferred chunk cut times, e.g. segment start times.
+        workers (int): Encoder processes (default: half the usable cores).
+
+    Returns:
+        str: output_path
+    """
+    workers = workers or default_workers()
+    if not fork_available():
+        workers = 1   # Windows / daemon: no fork, render the chunks in this process
+
+    duration = clip.duration
+    size = tuple(int(v) for v in clip.size)
+    chunks = plan_chunks(duration, fps, workers, boundaries)
+    workers = min(workers, len(chunks))
+    threads = max(1, encoding.encoder_threads() // workers)
+
+    base = os.path.splitext(output_path)[0]
+    tasks = [(i, first, n, f"{base}_chunk{i:03d}.mp4") for i, (first, n) in enumerate(chunks)]
+
+    job = {
+        "clip": clip, "fps": fps, "size": size,
+        "video_args": encoding.video_args(profile, intermediate=intermediate, threads=threads),
+    }
+    own_audio = None
+    print(f"🧩 Encoding {len(chunks)} chunk(s) with {workers} process(es) × {threads} thread(s)")
+    try:
+        if workers > 1:
+            # The pool forks its workers here; they get `job` in memory (fork, no pickling)
+            with _fork_lock:
+                pool = multiprocessing.get_context("fork").Pool(
+                    workers, initializer=_init_worker, initargs=(job,)
+                )
+            with pool:
+                pending = pool.map_async(_encode_chunk, tasks, chunksize=1)
+                if audio_path is None:
+                    own_audio = _write_clip_audio(clip, base)
+                results = pending.get()
+        else:
+            if audio_path is None:
+                own_audio = _write_clip_audio(clip, base)
+            results = [_encode_chunk(task, job) for task in tasks]
+
+        chunk_paths = [path for path, _ in results]
+        peak = max(stats["peak_open"] for _, stats in results)
+        print(f"📼 Decoders: peak {peak} open per process (cap {results[0][1]['max_open']})")
+        return _join_chunks(chunk_paths, output_path, audio_path or own_audio, duration, profile)
+    finally:
+        for _, _, _, path in tasks:
+            if os.path.exists(path):
+                os.remove(path)
+        if own_audio and os.path.exists(own_audio):
+            os.remove(own_audio)
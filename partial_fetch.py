@@ -0,0 +1,274 @@
+import os
+import bisect
+import struct
+
+# Downloads only the part of a remote MP4 that a short subclip needs.
+#
+# The moov atom is read with HTTP range requests, the time window is mapped to
+# sample byte ranges through the sample tables (stts/stss/stsc/stsz/stco), and
+# only those ranges are fetched. They are written at their original offsets
+# into a sparse local file next to ftyp/moov, so the container stays valid and
+# ffmpeg can seek into the window as if the whole file were present.
+
+PROBE_BYTES = 64 * 1024
+MERGE_GAP_BYTES = 256 * 1024   # fetch small gaps rather than issue another request
+WINDOW_MARGIN_SEC = 0.5        # covers edit-list offsets and B-frame reordering
+
+
+class PartialFetchUnsupported(Exception):
+    """The server or file layout does not allow a partial fetch."""
+
+
+# ============================
+# HTTP helpers
+# ============================
+def _get_range(session, url, start, end, timeout=30):
+    """Fetches bytes [start, end] (inclusive). Returns (data, total_size)."""
+    resp = session.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=timeout)
+    if resp.status_code != 206:
+        raise PartialFetchUnsupported(f"server ignored Range header (HTTP {resp.status_code})")
+
+    content_range = resp.headers.get("Content-Range", "")
+    total = int(content_range.rsplit("/", 1)[-1]) if "/" in content_range else None
+    return resp.content, total
+
+
+# ============================
+# MP4 box parsing
+# ============================
+def _box_header(data, pos):
+    """Returns (size, type, header_len) of the box starting at data[pos]."""
+    size, box_type = struct.unpack(">I4s", data[pos:pos + 8])
+    header = 8
+    if size == 1:
+        size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+        header = 16
+    return size, box_type, header
+
+
+def _iter_boxes(data, start, end):
+    pos = start
+    while pos + 8 <= end:
+        size, box_type, header = _box_header(data, pos)
+        if size == 0:
+            size = end - pos
+        if size < header:
+            break
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _find(data, start, end, path):
+    """Returns (payload_start, payload_end) of the first box matching a type path."""
+    for box_type, p_start, p_end in _iter_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return p_start, p_end
+            found = _find(data, p_start, p_end, path[1:])
+            if found:
+                return found
+    return None
+
+
+def _full_box(data, rng):
+    """Skips version/flags of a full box. Returns (version, body_start)."""
+    return data[rng[0]], rng[0] + 4
+
+
+def _parse_track(data, trak):
+    hdlr = _find(data, trak[0], trak[1], [b"mdia", b"hdlr"])
+    mdhd = _find(data, trak[0], trak[1], [b"mdia", b"mdhd"])
+    stbl = _find(data, trak[0], trak[1], [b"mdia", b"minf", b"stbl"])
+    if not (hdlr and mdhd and stbl):
+        return None
+
+    handler = data[hdlr[0] + 8:hdlr[0] + 12]
+    version, body = _full_box(data, mdhd)
+    timescale = struct.unpack(">I", data[body + (16 if version == 1 else 8):][:4])[0]
+
+    def table(name):
+        return _find(data, stbl[0], stbl[1], [name])
+
+    # Decode times (stts)
+    stts = table(b"stts")
+    _, body = _full_box(data, stts)
+    count = struct.unpack(">I", data[body:body + 4])[0]
+    times, t = [], 0
+    for i in range(count):
+        n, delta = struct.unpack(">II", data[body + 4 + 8 * i:body + 12 + 8 * i])
+        for _ in range(n):
+            times.append(t / timescale)
+            t += delta
+
+    # Sample sizes (stsz)
+    stsz = table(b"stsz")
+    _, body = _full_box(data, stsz)
+    fixed, n_samples = struct.unpack(">II", data[body:body + 8])
+    if fixed:
+        sizes = [fixed] * n_samples
+    else:
+        sizes = list(struct.unpack(f">{n_samples}I", data[body + 8:body + 8 + 4 * n_samples]))
+
+    # Chunk offsets (stco / co64)
+    stco = table(b"stco")
+    if stco:
+        _, body = _full_box(data, stco)
+        n_chunks = struct.unpack(">I", data[body:body + 4])[0]
+        chunk_offsets = list(struct.unpack(f">{n_chunks}I", data[body + 4:body + 4 + 4 * n_chunks]))
+    else:
+        co64 = table(b"co64")
+        _, body = _full_box(data, co64)
+        n_chunks = struct.unpack(">I", data[body:body + 4])[0]
+        chunk_offsets = list(struct.unpack(f">{n_chunks}Q", data[body + 4:body + 4 + 8 * n_chunks]))
+
+    # Sample → chunk mapping (stsc) gives each sample's byte offset
+    stsc = table(b"stsc")
+    _, body = _full_box(data, stsc)
+    n_entries = struct.unpack(">I", data[body:body + 4])[0]
+    entries = [struct.unpack(">III", data[body + 4 + 12 * i:body + 16 + 12 * i]) for i in range(n_entries)]
+
+    offsets = []
+    sample = 0
+    for e, (first_chunk, per_chunk, _) in enumerate(entries):
+        last_chunk = entries[e + 1][0] - 1 if e + 1 < n_entries else n_chunks
+        for chunk in range(first_chunk - 1, last_chunk):
+            pos = chunk_offsets[chunk]
+            for _ in range(per_chunk):
+                if sample >= n_samples:
+                    break
+                offsets.append(pos)
+                pos += sizes[sample]
+                sample += 1
+
+    # Sync samples (stss); absent means every sample is a keyframe
+    stss = table(b"stss")
+    if stss:
+        _, body = _full_box(data, stss)
+        n_sync = struct.unpack(">I", data[body:body + 4])[0]
+        sync = [s - 1 for s in struct.unpack(f">{n_sync}I", data[body + 4:body + 4 + 4 * n_sync])]
+    else:
+        sync = None
+
+    n = min(len(times), len(offsets), len(sizes))
+    return {
+        "handler": handler,
+        "times": times[:n],
+        "offsets": offsets[:n],
+        "sizes": sizes[:n],
+        "sync": sync,
+    }
+
+
+def _locate_moov(session, url):
+    """Walks top-level boxes with range requests. Returns (head_bytes, moov_bytes, moov_offset, total)."""
+    head, total = _get_range(session, url, 0, PROBE_BYTES - 1)
+    if total is None:
+        raise PartialFetchUnsupported("server did not report the file size")
+
+    pos = 0
+    while pos < total:
+        if pos + 16 <= len(head):
+            header = head[pos:pos + 16]
+        else:
+            header, _ = _get_range(session, url, pos, min(total, pos + 16) - 1)
+        size, box_type, _ = _box_header(header, 0)
+        if size == 0:
+            size = total - pos
+
+        if box_type == b"moof":
+            raise PartialFetchUnsupported("fragmented MP4")
+        if box_type == b"moov":
+            if pos + size <= len(head):
+                moov = head[pos:pos + size]
+            else:
+                moov, _ = _get_range(session, url, pos, pos + size - 1)
+            return head, moov, pos, total
+        if size < 8:
+            break
+        pos += size
+
+    raise PartialFetchUnsupported("no moov atom found")
+
+
+# ============================
+# Window → byte ranges
+# ============================
+def _window_ranges(tracks, start, end):
+    video = next((t for t in tracks if t["handler"] == b"vide"), None)
+    if video is None or not video["times"]:
+        raise PartialFetchUnsupported("no video track")
+
+    # Start decoding from the keyframe at or before the window start
+    first = max(0, bisect.bisect_right(video["times"], start) - 1)
+    if video["sync"]:
+        k = bisect.bisect_right(video["sync"], first) - 1
+        first = video["sync"][max(0, k)]
+    t_from = video["times"][first]
+
+    ranges = []
+    for track in tracks:
+        lo = bisect.bisect_left(track["times"], t_from - WINDOW_MARGIN_SEC)
+        hi = bisect.bisect_right(track["times"], end + WINDOW_MARGIN_SEC)
+        for i in range(lo, hi):
+            ranges.append((track["offsets"][i], track["offsets"][i] + track["sizes"][i]))
+
+    ranges.sort()
+    merged = []
+    for a, b in ranges:
+        if merged and a <= merged[-1][1] + MERGE_GAP_BYTES:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    return merged
+
+
+def fetch_window(url, out_path, start, duration, timeout=60):
+    """
+    Downloads just enough of a remote MP4 to decode [start, start + duration).
+
+    Returns:
+        int: Bytes transferred. Raises PartialFetchUnsupported when the server or
+        file layout does not allow it (caller should fall back to a full download).
+    """
+    import requests
+
+    with requests.Session() as session:
+        # Resolve redirects once so every range request hits the final host
+        try:
+            url = session.head(url, allow_redirects=True, timeout=timeout).url
+        except requests.RequestException:
+            pass
+
+        head, moov, moov_offset, total = _locate_moov(session, url)
+
+        tracks = []
+        try:
+            for box_type, p_start, p_end in _iter_boxes(moov, 0, len(moov)):
+                if box_type == b"moov":
+                    for t_type, t_start, t_end in _iter_boxes(moov, p_start, p_end):
+                        if t_type == b"trak":
+                            track = _parse_track(moov, (t_start, t_end))
+                            if track:
+                                tracks.append(track)
+        except (struct.error, TypeError, IndexError) as e:
+            raise PartialFetchUnsupported(f"unreadable sample tables: {e}")
+
+        ranges = _window_ranges(tracks, start, start + duration)
+        transferred = len(head) + (0 if moov_offset + len(moov) <= len(head) else len(moov))
+
+        # Sparse file: same layout and size as the original, holes where we skipped
+        with open(out_path, "wb") as f:
+            f.truncate(total)
+            f.seek(0)
+            f.write(head)
+            f.seek(moov_offset)
+            f.write(moov)
+            for a, b in ranges:
+                data, _ = _get_range(session, url, a, b - 1, timeout=timeout)
+                f.seek(a)
+                f.write(data)
+                transferred += len(data)
+
+    print(f"✂️ Partial fetch: {transferred / 1e6:.1f} MB of {total / 1e6:.1f} MB "
+          f"({len(ranges)} range(s)) → {os.path.basename(out_path)}")
+    return transferred
@@ -0,0 +1,248 @@
+import os
+import re
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The network sits idle while Gemini writes the script and speaks it (10-30 s).
+# As soon as the topic is known, a background pool searches Pexels for the
+# topic and downloads a few clips. Segment lookups later take a prefetched clip
+# whose page slug ("woman-doing-push-ups-...") shares words with the segment
+# keywords; whatever is never used is deleted, and the pool never holds more
+# unused bytes than its budget. With `window_sec`, only one window of that
+# length is range-fetched per clip (partial_fetch.py), as for segment lookups.
+
+PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")
+PREFETCH_CLIPS = 8
+PREFETCH_BYTES = 200 * 1024 * 1024
+PREFETCH_WORKERS = 2
+
+_STOPWORDS = {"the", "and", "for", "with", "video", "of", "a", "an", "in", "on", "to", "your"}
+
+
+def _tokens(text):
+    return {t for t in re.findall(r"[a-z]+", text.lower()) if len(t) > 2 and t not in _STOPWORDS}
+
+
+def slug_tokens(video):
+    """Words of the Pexels page slug, e.g. .../video/man-lifting-weights-123/ -> {man, lifting, weights}."""
+    slug = (video.get("url") or "").rstrip("/").rsplit("/", 1)[-1]
+    return _tokens(re.sub(r"-?\d+$", "", slug).replace("-", " "))
+
+
+class ClipPrefetcher:
+    """
+    Background pool of topic-level clips.
+
+    Usage:
+        prefetcher = ClipPrefetcher(topic, out_dir).start()
+        path = prefetcher.take(["push ups", "gym"])   # None when nothing matches
+        prefetcher.close()                              # deletes unused clips
+    """
+
+    def __init__(self, topic, out_dir, orientation="portrait", max_clips=PREFETCH_CLIPS,
+                 byte_budget=PREFETCH_BYTES, window_sec=None):
+        self.topic = topic
+        self.out_dir = out_dir
+        self.orientation = orientation
+        self.max_clips = max_clips
+        self.byte_budget = byte_budget
+        self.window_sec = window_sec   # partial fetch of one window per clip (None = whole file)
+        self.ready = []        # (video, path, size, tokens, window), oldest first, not yet taken
+        self.stats = {"downloaded": 0, "hits": 0, "misses": 0, "evicted_bytes": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="clip-prefetch", daemon=True)
+        self._thread.start()
+        return self
+
+    def _search(self):
+        import requests
+
+        resp = requests.get(
+            "https://api.pexels.com/videos/search",
+            params={"query": self.topic, "orientation": self.orientation,
+                    "per_page": self.max_clips * 2},
+            headers={"Authorization": PEXELS_API_KEY},
+            timeout=20
+        )
+        resp.raise_for_status()
+        return resp.json().get("videos") or []
+
+    def _run(self):
+        try:
+            videos = self._search()
+        except Exception as e:
+            print(f"⚠️ Prefetch search failed: {e}")
+            return
+
+        clip_index = None
+        try:
+            from clip_index import get_clip_index
+            clip_index = get_clip_index()
+        except ImportError:
+            pass
+
+        picked = []
+        for video in videos:
+            if len(picked) >= self.max_clips or self._stop.is_set():
+                break
+            if clip_index and clip_index.is_duplicate(video):
+                continue
+            picked.append(video)
+
+        if not self._stop.is_set():
+            list(self._executor.map(self._download, picked))
+
+    def _download(self, video):
+        if self._stop.is_set():
+            return
+        file_url = next((f["link"] for f in video.get("video_files", []) if f.get("file_type") == "video/mp4"), None)
+        if not file_url:
+            return
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"prefetch_{video['id']}.mp4")
+
+        size, window = self._fetch_window(video, file_url, path), self.window_sec
+        if size is None:
+            size, window = self._fetch_full(file_url, path), None
+            if size is not None:
+                self._analyze(path)
+        if size is None:
+            return
+
+        with self._lock:
+            self.ready.append((video, path, size, slug_tokens(video), window))
+            self.stats["downloaded"] += 1
+            self._evict()
+
+    def _analyze(self, path):
+        """Motion index for a full clip while nothing waits on it (see motion_index.warm)."""
+        from clip_reader import USE_MOTION_INDEX
+        if USE_MOTION_INDEX and not self._stop.is_set():
+            from motion_index import warm
+            warm(path)
+
+    def _fetch_window(self, video, file_url, path):
+        """Range-fetches one random window and pins it. Returns bytes transferred, or None."""
+        clip_len = float(video.get("duration") or 0)
+        if not self.window_sec or clip_len <= self.window_sec + 1:
+            return None
+
+        from partial_fetch import fetch_window
+        from clip_reader import register_window
+
+        start = random.uniform(0, clip_len - self.window_sec)
+        try:
+            transferred = fetch_window(file_url, path, start, self.window_sec)
+        except Exception as e:
+            if os.path.exists(path):
+                os.remove(path)
+            print(f"ℹ️ Prefetch partial fetch unavailable, downloading full clip: {e}")
+            return None
+        register_window(path, start)
+        return transferred        # the file is sparse: its size on disk is the full clip's
+
+    def _fetch_full(self, file_url, path):
+        """Downloads the whole clip. Returns its size, or None."""
+        import requests
+
+        try:
+            with requests.get(file_url, stream=True, timeout=60) as r:
+                r.raise_for_status()
+                with open(path, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=65536):
+                        if self._stop.is_set():
+                            raise InterruptedError("prefetch stopped")
+                        f.write(chunk)
+        except Exception as e:
+            if os.path.exists(path):
+                os.remove(path)
+            if not isinstance(e, InterruptedError):
+                print(f"⚠️ Prefetch download failed: {e}")
+            return None
+        return os.path.getsize(path)
+
+    def _evict(self):
+        """Drops the oldest unused clips while the pool is over its byte budget."""
+        while len(self.ready) > 1 and sum(entry[2] for entry in self.ready) > self.byte_budget:
+            _, path, size, _, _ = self.ready.pop(0)
+            self.stats["evicted_bytes"] += size
+            if os.path.exists(path):
+                os.remove(path)
+
+    def take(self, keywords, duration=None):
+        """
+        Hands over the prefetched clip whose slug best matches `keywords` (never
+        waits for downloads in flight). Partially fetched clips are only used for
+        segments of at most their window's length.
+
+        Returns:
+            str: clip path, or None if no ready clip shares a word with the keywords.
+        """
+        clip_index = None
+        try:
+            from clip_index import get_clip_index
+            clip_index = get_clip_index()
+        except ImportError:
+            pass
+
+        wanted = _tokens(" ".join(keywords))
+        while True:
+            with self._lock:
+                best, best_score = None, 0
+                for entry in self.ready:
+                    if entry[4] and duration and duration > entry[4]:
+                        continue
+                    score = len(wanted & entry[3])
+                    if score > best_score:
+                        best, best_score = entry, score
+                if best is None:
+                    self.stats["misses"] += 1
+                    return None
+                self.ready.remove(best)
+
+            video, path, size = best[0], best[1], best[2]
+            # Segments chosen since the download may already use this (or similar) footage
+            if clip_index and clip_index.is_duplicate(video):
+                print(f"♻️ Prefetched clip {os.path.basename(path)} is now a duplicate, dropping it")
+                with self._lock:
+                    self.stats["evicted_bytes"] += size
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            break
+
+        with self._lock:
+            self.stats["hits"] += 1
+        if clip_index:
+            clip_index.mark_chosen(video)
+        print(f"⚡ Prefetched clip for {keywords}: {os.path.basename(path)}")
+        return path
+
+    def close(self):
+        """Stops background work and deletes every clip that was never taken."""
+        self._stop.set()
+        # _run submits the downloads, so it must be finished before the executor goes
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            unused = self.ready
+            self.ready = []
+        for _, path, size, _, _ in unused:
+            self.stats["evicted_bytes"] += size
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"📦 Prefetch: {self.stats['hits']} hit(s), {self.stats['misses']} miss(es), "
+              f"{self.stats['downloaded']} downloaded, "
+              f"{self.stats['evicted_bytes'] / 1e6:.1f} MB unused")
+        return self.stats
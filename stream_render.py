@@ -0,0 +1,138 @@
+import os
+import tempfile
+import subprocess
+
+import encoding
+from clip_reader import ffmpeg_binary, choose_window, ScaledClipReader
+
+# Long-form render: frames are generated segment by segment and piped straight
+# into one ffmpeg encoder (which also muxes the narration). Only the current
+# segment's reader is open at any time and each source clip can be deleted as
+# soon as its last segment is done, so memory, file descriptors and scratch disk
+# stay flat no matter how many minutes of segments there are.
+
+LONGFORM_RESOLUTION = (1920, 1080)
+PLACEHOLDER_RGB = (20, 20, 20)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if os.uname().sysname == "Darwin" else 1024), 1)
+
+
+def _open_fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def iter_segment_frames(segments, clip_paths, size, fps, stats=None, delete_sources=False):
+    """
+    Yields RGB frames for the whole timeline, opening each segment's reader just
+    in time and closing it right after.
+
+    Frame counts come from the cumulative timeline, so rounding never drifts
+    against the audio.
+    """
+    import numpy as np
+
+    w, h = size
+    placeholder = np.empty((h, w, 3), dtype=np.uint8)
+    placeholder[:] = PLACEHOLDER_RGB
+    last_use = {path: i for i, path in enumerate(clip_paths) if path}
+
+    elapsed = 0.0
+    for i, ((_, seg_dur), path) in enumerate(zip(segments, clip_paths)):
+        first = int(round(elapsed * fps))
+        elapsed += seg_dur
+        n_frames = int(round(elapsed * fps)) - first
+
+        reader = None
+        try:
+            if path:
+                start, loop = choose_window(path, seg_dur)
+                reader = ScaledClipReader(path, start, seg_dur, size, fps, loop=loop)
+        except Exception as e:
+            print(f"⚠️ Segment {i + 1}: clip unusable, using placeholder: {e}")
+
+        try:
+            for k in range(n_frames):
+                yield reader.get_frame(k / fps) if reader else placeholder
+        finally:
+            if reader:
+                reader.close()
+            if stats is not None:
+                fds = _open_fds()
+                if fds is not None:
+                    stats["peak_fds"] = max(stats.get("peak_fds", 0), fds)
+                stats["segments"] = i + 1
+            if delete_sources and path and last_use.get(path) == i and os.path.exists(path):
+                os.remove(path)
+
+
+def stream_render(segments, clip_paths, audio_path, output_path, duration,
+                  size=LONGFORM_RESOLUTION, fps=24, profile=None, delete_sources=True, sampler=None):
+    """
+    Renders the segment timeline through a single ffmpeg encode. Frames are also
+    offered to `sampler` (frame_thumbnail.RenderSampler) when given.
+
+    Returns:
+        dict: {"frames", "segments", "peak_rss_mb", "peak_fds"}
+    """
+    w, h = size
+    cmd = [
+        ffmpeg_binary(), "-y", "-loglevel", "error", "-nostdin",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}", "-r", str(fps),
+        "-i", "-",
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+    ] + encoding.video_args(profile) + encoding.audio_args(profile) + [
+        "-t", f"{duration:.3f}",
+        "-movflags", "+faststart",
+        output_path
+    ]
+
+    stats = {"frames": 0, "segments": 0}
+    with tempfile.TemporaryFile() as errors:   # a stderr pipe read only at the end could stall ffmpeg
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=errors)
+        try:
+            for frame in iter_segment_frames(segments, clip_paths, size, fps, stats, delete_sources):
+                proc.stdin.write(frame.tobytes())
+                if sampler is not None:
+                    sampler.offer(stats["frames"], frame)
+                stats["frames"] += 1
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass   # ffmpeg exited early; its error is reported below
+        except BaseException:
+            # Bad clip / decode error: stop the encoder and drop the half-written file
+            proc.kill()
+            proc.wait()
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            _remove(output_path)
+            raise
+
+        if proc.wait() != 0:
+            errors.seek(0)
+            error = errors.read().decode(errors="ignore")
+            _remove(output_path)
+            raise RuntimeError(f"streaming encode failed: {error[-500:]}")
+
+    stats["peak_rss_mb"] = _peak_rss_mb()
+    print(f"📈 Streamed {stats['frames']} frames / {stats['segments']} segments — "
+          f"peak RSS {stats['peak_rss_mb']} MB, peak fds {stats.get('peak_fds')}")
+    return stats
@@ -1,32 +1,24 @@
-import google.genai as genai
-from google.genai import types
-from pydub import AudioSegment
-from io import BytesIO
 import os
-import requests
 import json
 import random
 import re
 import math
-import shutil
-from moviepy.editor import (
-    VideoFileClip,
-    AudioFileClip,
-    concatenate_videoclips,
-    ColorClip,
-    ImageClip,
-    vfx
-)
-from moviepy.video.fx.all import loop as loop_clip
-from transcribe import generate_subtitled_video, add_background_music_to_video
-from thumbnail import download_pexels_images
-from Overlay import generate_hook_text, overlay_text_on_image, append_thumbnail_to_video_with_audio
-from Upload import upload_to_youtube
+import argparse
 from dotenv import load_dotenv
 
+import encoding
+import llm_cache
+from workspace import JobWorkspace, scratch_path
+
+# Heavy dependencies (moviepy, Gemini SDK, pydub, faster-whisper, YouTube client)
+# are imported inside the stage that needs them, so `--help` and topic-only runs
+# start instantly. Track startup cost with `python import_benchmark.py`.
+
 load_dotenv()
 
 # --- Configuration ---
+# Intermediate names below are relative to the job's scratch directory (see
+# workspace.py); only the queued video and thumbnail go to outputs/<job_id>/.
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")   # 🔑 Your Gemini API key
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")   # 🔑 Your Pexels API key
 VIDEO_CLIPS_DIR = "downloaded_clips"
@@ -36,67 +28,49 @@ THUMBNAIL_PATH = "thumbnails/thumbnail.jpg"
 OUTPUT_THUMBNAIL_PATH = "thumbnails/thumbnail_with_text.jpg"
 VIDEO_PATH = "final_tiktok_video.mp4"
 OUTPUT_VIDEO_PATH = "final_video_with_text.mp4"
+FINAL_OUTPUT_FILE = "final_tiktok_video_with_background_music.mp4"  # kept in outputs/<job_id>/
 SEGMENT_TARGET_SEC = 3  # desired per-frame change (approx)
 RESOLUTION = (1080, 1920)  # portrait
+LONGFORM_RESOLUTION = (1920, 1080)  # --long-form: landscape, streamed render
 FPS = 24
+USE_MEZZANINE_ASSEMBLY = True  # normalise segments in the background, then stream-copy concat
+USE_PARTIAL_FETCH = True       # range-fetch only the subclip window instead of the whole file
+USE_TOPIC_PLANNER = True       # pop topic + script from the batch-planned queue (topic_queue.json)
+USE_CLIP_DEDUPE = True         # skip Pexels results that repeat footage already used (clip_index.json)
+USE_PREFETCH = True            # download topic clips in the background during script + TTS
+ENCODING_PROFILE = encoding.DEFAULT_PROFILE  # draft / standard / archival / auto (see encoding.py)
 BACKGROUND_MUSIC = "background_music.mp3"
 
-os.makedirs(VIDEO_CLIPS_DIR, exist_ok=True)
-
 
 # ============================
 # 1) SCRIPT & TTS generation
 # ============================
-def generate_script_and_speech(topic):
+def generate_script_and_speech(topic, script_text=None, workspace=None):
     """
+    The script comes from `script_text` (e.g. the topic planner queue) or from the
+    topic's content package (one call that also yields hook text and metadata).
+    The narration is written to AUDIO_FILE in the job's scratch directory.
+
     Returns:
       - script_text (the full Gemini script)
       - tts_text (the combined narrator text used for TTS)
       - audio_duration_sec (float)
+      - narration (float32 16 kHz array for Whisper, see transcribe.pcm_to_whisper_audio)
     """
-    try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        script_prompt = f"""
-                You are a professional scriptwriter for a fitness and healthy lifestyle YouTube & short-form content channel called "Healthy Stop".
-
-                Write a **30-second fast-paced, informational, science-backed** social media script about:
-                "{topic}"
-
-                Audience:
-                - Teenagers starting fitness
-                - Adults trying to lose fat, gain strength, and build healthy habits
-                - Busy people looking for simple, realistic health advice
-
-                The tone should be:
-                - Beginner-friendly (basic knowledge level)
-                - Educational but motivating
-                - Simple global English (no complex words)
-                - Practical and realistic
-                - Confident fitness-coach style
-
-                Content rules:
-                - Avoid medical or scientific jargon
-                - Focus on workouts, nutrition, fat loss, muscle building, or healthy habits
-                - Keep it short, punchy, and clear
-                - No fluff, only useful information
-                - Suitable for Instagram Reels, Shorts, and YouTube Shorts
-
-                Format exactly like this:
-                [NARRATOR]: line 1
-                [NARRATOR]: line 2
-                """
-
-
-        script_response = client.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=script_prompt
-        )
+    from google.genai import types
+    from pydub import AudioSegment
+    from io import BytesIO
 
-        if not script_response or not getattr(script_response, "text", None):
-            raise Exception("Failed to generate script.")
+    try:
+        client = llm_cache.get_client(GEMINI_API_KEY)
 
-        script_text = script_response.text.strip()
-        print("\n📝 Generated Script:\n", script_text)
+        if script_text:
+            script_text = script_text.strip()
+            print("\n📝 Planned Script:\n", script_text)
+        else:
+            from content_package import get_content_package
+            script_text = get_content_package(topic)["script"]
+            print("\n📝 Generated Script:\n", script_text)
 
         # Extract narrator lines and create the tts_text (single concatenated text)
         dialogue_pattern = r'\[NARRATOR\]: (.*?)(?:\n|$)'
@@ -124,7 +98,9 @@ def generate_script_and_speech(topic):
 
             Text: {tts_text}
             """
-        tts_response = client.models.generate_content(
+        tts_response = llm_cache.generate_content(
+            client,
+            site="tts",
             model="gemini-2.5-flash-preview-tts",
             contents=tts_prompt,
             config=types.GenerateContentConfig(
@@ -150,14 +126,19 @@ def generate_script_and_speech(topic):
         mixed = narration_audio
 
         # --- 5️⃣ Export final combined audio ---
-        mixed.export(AUDIO_FILE, format="mp3", bitrate="192k")
-        print(f"✅ Final TTS with background music saved: {AUDIO_FILE}")
+        audio_file = scratch_path(workspace, AUDIO_FILE)
+        mixed.export(audio_file, format="mp3", bitrate="192k")
+        print(f"✅ Final TTS with background music saved: {audio_file}")
 
-        return script_text, tts_text, audio_duration_sec
+        # Keep the clean PCM for the subtitle stage instead of decoding the render again
+        from transcribe import pcm_to_whisper_audio
+        narration = pcm_to_whisper_audio(audio_data, 24000)
+
+        return script_text, tts_text, audio_duration_sec, narration
 
     except Exception as e:
         print("❌ Error in generate_script_and_speech:", e)
-        return "", "", 0.0
+        return "", "", 0.0, None
 
 
 # ============================
@@ -201,7 +182,7 @@ def generate_visual_keywords_for_segment(segment_text, topic, max_keywords=3):
     Fallback returns top words from the segment.
     """
     try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        client = llm_cache.get_client(GEMINI_API_KEY)
         prompt = f"""
         You are selecting concise visual search keywords for stock videos.
         The main topic is: "{topic}".
@@ -212,7 +193,7 @@ def generate_visual_keywords_for_segment(segment_text, topic, max_keywords=3):
         Example: ["solar panels", "sunset", "wind turbine"]
         Return only the JSON array.
         """
-        response = client.models.generate_content(model="gemini-2.5-flash", contents=prompt)
+        response = llm_cache.generate_content(client, site="keywords", model="gemini-2.5-flash", contents=prompt)
         text = response.text.strip()
         # Try to parse JSON array
         try:
@@ -242,9 +223,70 @@ def generate_visual_keywords_for_segment(segment_text, topic, max_keywords=3):
 # ============================
 # 4) Download best-matching Pexels clip for given keywords
 # ============================
-def download_pexels_clip_for_segment(keywords, topic, prefer_topic=True):
+def _fetch_pexels_video(video, keywords, topic, segment_duration=None, clips_dir=VIDEO_CLIPS_DIR):
+    """Downloads one Pexels search result (just the segment window when possible)."""
+    import requests
+
+    file_url = next((f["link"] for f in video.get("video_files", []) if f.get("file_type") == "video/mp4"), None)
+    if not file_url:
+        return None
+
+    safe_name = "_".join([re.sub(r'\W+', '', k) for k in (keywords[:2] or [topic])])
+    file_path = os.path.join(clips_dir, f"{safe_name}_{video['id']}.mp4")
+
+    # Only ~SEGMENT_TARGET_SEC of the clip is used: try fetching just that window
+    clip_len = float(video.get("duration") or 0)
+    if USE_PARTIAL_FETCH and segment_duration and clip_len > segment_duration + 1:
+        from partial_fetch import fetch_window
+        from clip_reader import register_window
+
+        start = random.uniform(0, clip_len - segment_duration)
+        try:
+            fetch_window(file_url, file_path, start, segment_duration)
+            register_window(file_path, start)
+            return file_path
+        except Exception as e:
+            print("ℹ️ Partial fetch unavailable, downloading full clip:", e)
+
+    try:
+        with requests.get(file_url, stream=True, timeout=60) as r:
+            r.raise_for_status()
+            with open(file_path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=8192):
+                    f.write(chunk)
+        return file_path
+    except Exception as e:
+        print("⚠️ Failed to download clip:", e)
+        return None
+
+
+def download_pexels_clip_for_segment(keywords, topic, prefer_topic=True, segment_duration=None,
+                                     orientation="portrait", prefetcher=None, workspace=None):
+    """
+    Downloads a Pexels clip for the keywords. When `segment_duration` is given and
+    USE_PARTIAL_FETCH is on, only the bytes for one random window of that length
+    are fetched (HTTP range requests) and the window is pinned for the renderer.
+    With USE_CLIP_DEDUPE, results whose preview frames match a clip already used
+    (this video or recent ones) are skipped before anything is downloaded.
+    A matching clip from `prefetcher` (see prefetch.py) is used without a search.
+    """
+    import requests
+
+    if prefetcher:
+        path = prefetcher.take(keywords, segment_duration)
+        if path:
+            return path
+
+    clips_dir = scratch_path(workspace, VIDEO_CLIPS_DIR)
+    os.makedirs(clips_dir, exist_ok=True)
     headers = {"Authorization": PEXELS_API_KEY}
 
+    clip_index = None
+    if USE_CLIP_DEDUPE:
+        from clip_index import get_clip_index
+        clip_index = get_clip_index()
+    duplicates = []   # used only if every candidate repeats an earlier shot
+
     queries = []
     if prefer_topic:
         queries.append(f"{topic} {' '.join(keywords)}".strip())
@@ -255,7 +297,7 @@ def download_pexels_clip_for_segment(keywords, topic, prefer_topic=True):
         if not q:
             continue
 
-        url = f"https://api.pexels.com/videos/search?query={requests.utils.quote(q)}&orientation=portrait&per_page=6"
+        url = f"https://api.pexels.com/videos/search?query={requests.utils.quote(q)}&orientation={orientation}&per_page=6"
 
         try:
             resp = requests.get(url, headers=headers, timeout=20)
@@ -273,30 +315,36 @@ def download_pexels_clip_for_segment(keywords, topic, prefer_topic=True):
 
         random.shuffle(videos)
         for video in videos:
-            file_url = next((f["link"] for f in video.get("video_files", []) if f.get("file_type") == "video/mp4"), None)
-            if not file_url:
+            if clip_index and clip_index.is_duplicate(video):
+                duplicates.append(video)
                 continue
 
-            safe_name = "_".join([re.sub(r'\W+', '', k) for k in (keywords[:2] or [topic])])
-            file_path = os.path.join(VIDEO_CLIPS_DIR, f"{safe_name}_{video['id']}.mp4")
-
-            try:
-                with requests.get(file_url, stream=True, timeout=60) as r:
-                    r.raise_for_status()
-                    with open(file_path, "wb") as f:
-                        for chunk in r.iter_content(chunk_size=8192):
-                            f.write(chunk)
+            file_path = _fetch_pexels_video(video, keywords, topic, segment_duration, clips_dir)
+            if file_path:
+                if clip_index:
+                    clip_index.mark_chosen(video)
                 return file_path
-            except Exception as e:
-                print("⚠️ Failed to download clip:", e)
-                continue
+
+    if duplicates:
+        print("ℹ️ Only repeated footage found, reusing a similar clip.")
+    for video in duplicates:
+        file_path = _fetch_pexels_video(video, keywords, topic, segment_duration, clips_dir)
+        if file_path:
+            return file_path
 
     return None
 
 # ============================
 # 5) Build final video with per-segment clips (changes every ~3s)
 # ============================
-def create_segmented_contextual_video(topic, tts_text, audio_path, audio_duration):
+def create_segmented_contextual_video(topic, tts_text, audio_path, audio_duration, long_form=False,
+                                      prefetcher=None, workspace=None, sampler=None):
+    """
+    Builds FINAL_VIDEO_FILE (in the job's scratch directory) from one stock clip
+    per segment. Long-form videos are landscape and rendered through
+    stream_render (flat memory for any length), which also feeds `sampler`
+    (thumbnail candidates, see frame_thumbnail.RenderSampler).
+    """
     segments = split_text_into_time_segments(
         tts_text, audio_duration, SEGMENT_TARGET_SEC
     )
@@ -304,84 +352,138 @@ def create_segmented_contextual_video(topic, tts_text, audio_path, audio_duratio
         print("❌ No segments could be created.")
         return False
 
-    audio_clip = AudioFileClip(audio_path)
-    final_clips = []
+    if long_form:
+        return render_long_form(topic, segments, audio_path, audio_duration, prefetcher, workspace,
+                                sampler)
+
+    final_file = scratch_path(workspace, FINAL_VIDEO_FILE)
+    pool = None
+    if USE_MEZZANINE_ASSEMBLY:
+        from mezzanine import MezzaninePool
+        pool = MezzaninePool(scratch_path(workspace, os.path.join(VIDEO_CLIPS_DIR, "mezzanine")),
+                             size=RESOLUTION, fps=FPS)
 
+    clip_paths = []
     for idx, (seg_text, seg_dur) in enumerate(segments):
         print(f"\n🔸 Segment {idx + 1}/{len(segments)} — target {seg_dur:.2f}s")
 
         keywords = generate_visual_keywords_for_segment(seg_text, topic)
-        clip_path = download_pexels_clip_for_segment(keywords, topic)
+        clip_path = download_pexels_clip_for_segment(keywords, topic, segment_duration=seg_dur,
+                                                     prefetcher=prefetcher, workspace=workspace)
+        clip_paths.append(clip_path)
+
+        # Normalise in the background while the next segment downloads
+        if pool:
+            pool.submit(idx, clip_path, seg_dur)
+
+    if pool:
+        from mezzanine import concat_with_audio
 
         try:
-            if not clip_path:
-                raise Exception("No clip found")
+            print("\n⏱ Waiting for mezzanine segments...")
+            segment_files = pool.results()
+            print(f"\n💾 Stream-copy concat to: {final_file}")
+            concat_with_audio(segment_files, audio_path, final_file, duration=audio_duration,
+                              profile=ENCODING_PROFILE)
+            print("✅ Contextual segmented video created.")
+            return True
+        except Exception as e:
+            print("⚠️ Mezzanine assembly failed, falling back to MoviePy render:", e)
 
-            clip = VideoFileClip(clip_path)
+    return render_segments_with_moviepy(segments, clip_paths, audio_path, audio_duration, final_file)
 
-            # FIX 1: normalize FPS
-            clip = clip.set_fps(FPS)
 
-            # Duration handling
-            if clip.duration > seg_dur + 0.05:
-                start = random.uniform(0, max(0, clip.duration - seg_dur))
-                clip = clip.subclip(start, start + seg_dur)
-            elif clip.duration < seg_dur - 0.05:
-                clip = loop_clip(clip, duration=seg_dur)
-            else:
-                clip = clip.subclip(0, min(clip.duration, seg_dur))
+def render_long_form(topic, segments, audio_path, audio_duration, prefetcher=None, workspace=None,
+                     sampler=None):
+    from stream_render import stream_render
 
-            # FIX 2: force resolution
-            clip = clip.resize(RESOLUTION)
+    final_file = scratch_path(workspace, FINAL_VIDEO_FILE)
+    clip_paths = []
+    for idx, (seg_text, seg_dur) in enumerate(segments):
+        print(f"\n🔸 Segment {idx + 1}/{len(segments)} — target {seg_dur:.2f}s")
+        keywords = generate_visual_keywords_for_segment(seg_text, topic)
+        clip_paths.append(download_pexels_clip_for_segment(
+            keywords, topic, segment_duration=seg_dur, orientation="landscape",
+            prefetcher=prefetcher, workspace=workspace
+        ))
 
-            # FIX 3: force exact duration
-            clip = clip.set_duration(seg_dur)
+    print(f"\n💾 Streaming long-form render to: {final_file}")
+    try:
+        stream_render(segments, clip_paths, audio_path, final_file, audio_duration,
+                      size=LONGFORM_RESOLUTION, fps=FPS, profile=ENCODING_PROFILE, sampler=sampler)
+    except Exception as e:
+        print("❌ Long-form render failed:", e)
+        return False
+    print("✅ Long-form video created.")
+    return True
 
-            final_clips.append(clip)
 
-        except Exception as e:
-            print("⚠️ Clip error, using placeholder:", e)
-            placeholder = (
-                ColorClip(size=RESOLUTION, color=(20, 20, 20), duration=seg_dur)
-                .set_fps(FPS)
-            )
-            final_clips.append(placeholder)
+def render_segments_with_moviepy(segments, clip_paths, audio_path, audio_duration,
+                                 output_path=FINAL_VIDEO_FILE):
+    from moviepy.editor import ColorClip
+    from clip_reader import choose_window, open_segment_clip
+    from fast_concat import concatenate_clips
+    from parallel_encode import write_parallel
 
-    if not final_clips:
-        print("❌ No final clips created.")
-        return False
+    final_clips = []
+    final_video = None
 
-    print("\n⏱ Concatenating clips...")
-    final_video = concatenate_videoclips(final_clips, method="compose")
+    # Every segment reader is released on the way out, including error paths
+    try:
+        for (seg_text, seg_dur), clip_path in zip(segments, clip_paths):
+            try:
+                if not clip_path:
+                    raise Exception("No clip found")
 
-    final_video = (
-        final_video
-        .set_audio(audio_clip)
-        .set_duration(audio_duration)
-        .set_fps(FPS)
-    )
+                # Pick the window up front so ffmpeg seeks, trims, converts fps and
+                # scales/crops to RESOLUTION while decoding
+                start, loop = choose_window(clip_path, seg_dur)
+                clip = open_segment_clip(clip_path, start, seg_dur, RESOLUTION, FPS, loop=loop)
 
-    print(f"\n💾 Writing final video to: {FINAL_VIDEO_FILE}")
-
-    # FIX 4: FFmpeg stability (Windows-safe)
-    final_video.write_videofile(
-        FINAL_VIDEO_FILE,
-        fps=FPS,
-        codec="libx264",
-        audio_codec="aac",
-        preset="ultrafast",
-        bitrate="4000k",
-        threads=2,
-        temp_audiofile="temp-audio.m4a",
-        remove_temp=True
-    )
+                final_clips.append(clip)
 
-    audio_clip.close()
-    for c in final_clips:
-        try:
-            c.close()
-        except Exception:
-            pass
+            except Exception as e:
+                print("⚠️ Clip error, using placeholder:", e)
+                placeholder = (
+                    ColorClip(size=RESOLUTION, color=(20, 20, 20), duration=seg_dur)
+                    .set_fps(FPS)
+                )
+                final_clips.append(placeholder)
+
+        if not final_clips:
+            print("❌ No final clips created.")
+            return False
+
+        print("\n⏱ Concatenating clips...")
+        final_video = concatenate_clips(final_clips)
+
+        final_video = final_video.set_duration(audio_duration).set_fps(FPS)
+
+        print(f"\n💾 Writing final video to: {output_path}")
+
+        # Chunks are cut at segment starts; the narration is muxed once at the end.
+        # Intermediate: subtitles are burned in and re-encoded afterwards
+        segment_starts = []
+        t = 0.0
+        for _, seg_dur in segments:
+            segment_starts.append(t)
+            t += seg_dur
+
+        write_parallel(
+            final_video,
+            output_path,
+            FPS,
+            audio_path=audio_path,
+            boundaries=segment_starts,
+            profile=ENCODING_PROFILE,
+            intermediate=True
+        )
+    finally:
+        for c in final_clips + ([final_video] if final_video is not None else []):
+            try:
+                c.close()
+            except Exception:
+                pass
 
     print("✅ Contextual segmented video created.")
     return True
@@ -404,18 +506,14 @@ def select_topic_using_gemini():
         "Diet Plans", "Exercise Motivation", "Recovery Tips", "Mental Health Fitness"
     ]
 
-    used_topics_file = "used_topics.txt"
+    from topic_planner import load_used_topics, claim_topic
 
-    # Load previously used topics
-    if os.path.exists(used_topics_file):
-        with open(used_topics_file, "r", encoding="utf-8") as f:
-            used_topics = [line.strip() for line in f if line.strip()]
-    else:
-        used_topics = []
+    # Load previously used topics (locked: several pipelines may share the file)
+    used_topics = load_used_topics()
 
     try:
-        # ✅ Create Gemini client (as in your reference function)
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        # ✅ Shared Gemini client (created once per process)
+        client = llm_cache.get_client(GEMINI_API_KEY)
 
         prompt = f"""
         You are an expert social media content curator for a fitness and healthy lifestyle YouTube & short-form content channel called "Healthy Stop".
@@ -453,7 +551,9 @@ def select_topic_using_gemini():
         """
 
         # ✅ Use same correct model call pattern as your working function
-        response = client.models.generate_content(
+        response = llm_cache.generate_content(
+            client,
+            site="topic",
             model="gemini-3-flash-preview",
             contents=prompt
         )
@@ -463,14 +563,9 @@ def select_topic_using_gemini():
 
         topic = response.text.strip().replace('"', '').replace('.', '').title()
 
-        # ✅ Handle too many repeats
-        if used_topics.count(topic) >= 3:
-            available = [t for t in example_topic_list if used_topics.count(t) < 3]
-            topic = random.choice(available if available else example_topic_list)
-
-        # ✅ Save the new topic
-        with open(used_topics_file, "a", encoding="utf-8") as f:
-            f.write(topic + "\n")
+        # ✅ Handle too many repeats and save the topic, checked against the file
+        # under the same lock as the append so concurrent runs can't both pass
+        topic = claim_topic(topic, example_topic_list)
 
         print(f"✅ Selected topic: {topic}")
         return topic
@@ -484,53 +579,194 @@ def select_topic_using_gemini():
 # ============================
 # 6) MAIN pipeline
 # ============================
-if __name__ == "__main__":
+def run_pipeline(topic=None, long_form=False, script_text=None, workspace=None):
+    """
+    Runs the full pipeline for one video. Returns the upload queue key, or None.
+
+    Args:
+        long_form (bool): 16:9 landscape output with the streaming renderer.
+        script_text (str): Narration script to use instead of generating one.
+        workspace (JobWorkspace): job paths to use; by default a fresh one is
+            created and cleaned up when the run ends (success or failure).
+    """
     print("Starting video creation pipeline...")
-    topic = select_topic_using_gemini()
+    planned_script = script_text
+    # Planned packages are 30 s shorts scripts, so long-form runs don't use the queue
+    if not topic and USE_TOPIC_PLANNER and not long_form:
+        from topic_planner import pop_planned_topic
+        from content_package import register_package
+        planned = pop_planned_topic()
+        if planned:
+            register_package(planned)
+            topic, planned_script = planned["topic"], planned["script"]
+            print(f"✅ Planned topic: {topic}")
+    topic = topic or select_topic_using_gemini()
+
+    own_workspace = workspace is None
+    workspace = workspace or JobWorkspace()
+    print(f"🗂️ Job {workspace.job_id} — scratch: {workspace.scratch}")
+
+    job_key = None
+    try:
+        job_key = _produce_video(topic, long_form, planned_script, workspace)
+    finally:
+        # 7) cleanup: scratch always goes, outputs are kept only for a queued video
+        from content_package import clear_packages
+        from clip_reader import forget_windows
+        from motion_index import forget
+        clear_packages()
+        forget_windows(workspace.scratch)
+        forget(workspace.scratch)
+        if own_workspace:
+            workspace.cleanup(success=job_key is not None)
+            print("🧹 Job scratch cleaned.")
+
+    try:
+        stats = llm_cache.export_stats()
+        rates = {site: s["hit_rate"] for site, s in stats["sites"].items() if s["hit_rate"] is not None}
+        print(f"🧠 LLM cache hit rates: {rates}")
+    except Exception as e:
+        print("⚠️ Could not export LLM cache stats:", e)
+
+    return job_key
+
+
+def _produce_video(topic, long_form, planned_script, workspace):
+    """Stages 1-6 for one job; every intermediate lives in the workspace's scratch."""
+    from transcribe import generate_subtitled_video, add_background_music_to_video
+    from upload_queue import enqueue_upload
+
+    audio_file = workspace.scratch_path(AUDIO_FILE)
+    final_file = workspace.scratch_path(FINAL_VIDEO_FILE)
+    subtitled_file = workspace.scratch_path(VIDEO_PATH)
+    thumbnail_path = workspace.output_path(THUMBNAIL_PATH)
+    output_thumbnail_path = workspace.output_path(OUTPUT_THUMBNAIL_PATH)
+    output_file = workspace.output_path(FINAL_OUTPUT_FILE)
+    job_key = None
+
+    # Start downloading topic clips while the script and narration are generated
+    prefetcher = None
+    if USE_PREFETCH:
+        from prefetch import ClipPrefetcher
+        prefetcher = ClipPrefetcher(
+            topic, workspace.scratch_path(os.path.join(VIDEO_CLIPS_DIR, "prefetch")),
+            orientation="landscape" if long_form else "portrait",
+            window_sec=SEGMENT_TARGET_SEC if USE_PARTIAL_FETCH else None
+        ).start()
+
     # 1) script + TTS
-    script_text, tts_text, audio_duration = generate_script_and_speech(topic)
+    script_text, tts_text, audio_duration, narration = generate_script_and_speech(
+        topic, planned_script, workspace
+    )
 
     if audio_duration <= 0 or not tts_text:
         print("❌ Audio generation failed. Aborting pipeline.")
-    else:
-        # 2) build segmented contextual video (changes ~every SEGMENT_TARGET_SEC)
-        ok = create_segmented_contextual_video(topic, tts_text, AUDIO_FILE, audio_duration)
-        if ok:
-            print("🎬 Video creation complete.")
-
-            # 3) add subtitles using existing transcribe/generation (keeps your original behavior)
-            if os.path.exists(FINAL_VIDEO_FILE):
-                final_video_with_subs = generate_subtitled_video(
-                    video_path=FINAL_VIDEO_FILE,
-                    output_path="final_tiktok_video.mp4",
-                    platform="tiktok"
-                )
-                print("🔤 Subtitled video:", final_video_with_subs)
-
-            if os.path.exists("final_tiktok_video.mp4"):
-                final = add_background_music_to_video(
-                    video_path="final_tiktok_video.mp4",
-                    sound_path="background_music.mp3",
-                    output_path="final_tiktok_video_with_background_music.mp4",
-                    volume=0.6
-                )
-                print("🎵 Video with background music:", final) 
-
-            if os.path.exists("final_tiktok_video_with_background_music.mp4"):
-                video_id = upload_to_youtube(
-                    video_path="final_tiktok_video_with_background_music.mp4",
-                    thumbnail_path=OUTPUT_THUMBNAIL_PATH if os.path.exists(OUTPUT_THUMBNAIL_PATH) else THUMBNAIL_PATH,
-                    topic=script_text
-                )
-                print("📤 Uploaded video ID:", video_id)                       
-
-        else:
-            print("⚠️ Contextual video generation failed or returned nothing. Check logs.")
+        if prefetcher:
+            prefetcher.close()
+        return None
+
+    # Seed the Whisper calibration sample from real narration (first short job only)
+    from whisper_tuning import keep_job_sample
+    keep_job_sample(narration, tts_text)
+
+    # 2) build segmented contextual video (changes ~every SEGMENT_TARGET_SEC)
+    from frame_thumbnail import RenderSampler, extract_best_thumbnail
+    sample_size = (320, 180) if long_form else (180, 320)
+    # Long-form frames pass through Python while streaming: keep thumbnail candidates
+    sampler = RenderSampler(audio_duration, FPS, size=sample_size) if long_form else None
+    try:
+        ok = create_segmented_contextual_video(topic, tts_text, audio_file, audio_duration,
+                                               long_form, prefetcher, workspace, sampler)
+    finally:
+        if prefetcher:
+            prefetcher.close()
+    if not ok:
+        print("⚠️ Contextual video generation failed or returned nothing. Check logs.")
+        return None
+    print("🎬 Video creation complete.")
+
+    # 2b) thumbnail: best frame of the render (before subtitles) + hook text
+    if os.path.exists(final_file):
+        from Overlay import generate_hook_text, overlay_text_on_image
+
+        frames, times = (sampler.frames, sampler.times) if sampler else (None, None)
+        if extract_best_thumbnail(final_file, thumbnail_path, frames=frames, times=times, size=sample_size):
+            try:
+                hook_text = generate_hook_text(topic, GEMINI_API_KEY, script_text=script_text)
+                print(f"🧠 Hook text: {hook_text}")
+                overlay_text_on_image(thumbnail_path, hook_text, output_thumbnail_path,
+                                      assets_dir=workspace.scratch_dir("emoji_assets"))
+            except Exception as e:
+                print("⚠️ Hook text overlay failed, using plain frame:", e)
+
+    # 3) add subtitles using existing transcribe/generation (keeps your original behavior)
+    if os.path.exists(final_file):
+        final_video_with_subs = generate_subtitled_video(
+            video_path=final_file,
+            output_path=subtitled_file,
+            platform="longform" if long_form else "tiktok",
+            audio=narration,
+            workspace=workspace,
+            profile=ENCODING_PROFILE
+        )
+        print("🔤 Subtitled video:", final_video_with_subs)
+
+    if os.path.exists(subtitled_file):
+        final = add_background_music_to_video(
+            video_path=subtitled_file,
+            sound_path=BACKGROUND_MUSIC,
+            output_path=output_file,
+            volume=0.6,
+            workspace=workspace,
+            profile=ENCODING_PROFILE
+        )
+        print("🎵 Video with background music:", final)
 
-    # 7) cleanup temporary downloads
-    if os.path.exists(VIDEO_CLIPS_DIR):
+    if os.path.exists(output_file):
+        # Upload happens in the queue worker (python upload_queue.py), not here
+        from content_package import get_content_package
         try:
-            shutil.rmtree(VIDEO_CLIPS_DIR)
-            print("🧹 Temporary clip folder cleaned.")
+            # Same package as the hook text: built around the script that was narrated
+            package = get_content_package(topic, script_text=script_text, api_key=GEMINI_API_KEY)
         except Exception as e:
-            print("⚠️ Cleanup failed:", e)
+            print("⚠️ Content package unavailable, metadata will be generated at upload:", e)
+            package = None
+        metadata = {k: package[k] for k in ("title", "description", "tags")} if package else None
+        if metadata and long_form:
+            metadata["title"] = re.sub(r"\s*#shorts", "", metadata["title"], flags=re.I).strip()
+        job_key = enqueue_upload(
+            video_path=output_file,
+            thumbnail_path=output_thumbnail_path if os.path.exists(output_thumbnail_path) else thumbnail_path,
+            topic=script_text,
+            metadata=metadata
+        )
+        print("📤 Queued for upload:", job_key)
+
+    return job_key
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Healthy Stop short-video pipeline")
+    parser.add_argument("--topic", help="use this topic instead of asking Gemini")
+    parser.add_argument("--topic-only", action="store_true",
+                        help="select and record a topic, print it and exit")
+    parser.add_argument("--long-form", action="store_true",
+                        help="16:9 landscape video rendered with the streaming renderer")
+    parser.add_argument("--script-file",
+                        help="narration script ([NARRATOR]: lines) to use instead of generating one")
+    args = parser.parse_args(argv)
+
+    if args.topic_only:
+        print(args.topic or select_topic_using_gemini())
+        return
+
+    script_text = None
+    if args.script_file:
+        with open(args.script_file, "r", encoding="utf-8") as f:
+            script_text = f.read()
+
+    run_pipeline(topic=args.topic, long_form=args.long_form, script_text=script_text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compositor import IntervalIndex
+
+
+def _layer(name, start, end):
+    return SimpleNamespace(name=name, start=start, end=end)
+
+
+class IntervalIndexTest(unittest.TestCase):
+
+    def _names(self, index, t):
+        return [layer.name for layer in index.at(t)]
+
+    def test_start_inclusive_end_exclusive(self):
+        index = IntervalIndex([_layer("a", 1.0, 2.0)])
+        self.assertEqual(self._names(index, 0.5), [])
+        self.assertEqual(self._names(index, 1.0), ["a"])
+        self.assertEqual(self._names(index, 1.99), ["a"])
+        self.assertEqual(self._names(index, 2.0), [])
+
+    def test_overlaps_keep_stacking_order(self):
+        layers = [_layer("base", 0, None), _layer("caption", 2, 4), _layer("sticker", 1, 3)]
+        index = IntervalIndex(layers)
+        self.assertEqual(self._names(index, 0.0), ["base"])
+        self.assertEqual(self._names(index, 2.5), ["base", "caption", "sticker"])
+        self.assertEqual(self._names(index, 3.5), ["base", "caption"])
+        self.assertEqual(self._names(index, 100.0), ["base"])
+
+    def test_back_to_back_layers_do_not_overlap(self):
+        index = IntervalIndex([_layer("one", 0, 1), _layer("two", 1, 2)])
+        self.assertEqual(self._names(index, 0.999), ["one"])
+        self.assertEqual(self._names(index, 1.0), ["two"])
+
+    def test_negative_time_and_empty_index(self):
+        self.assertEqual(IntervalIndex([_layer("a", 0, 1)]).at(-0.1), [])
+        self.assertEqual(IntervalIndex([]).at(5.0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from long_transcribe import SAMPLE_RATE, FRAME_MS, find_speech_chunks
+
+FRAME = SAMPLE_RATE * FRAME_MS // 1000
+
+
+def _tone(sec, amplitude=0.3):
+    t = np.arange(int(sec * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _silence(sec):
+    return np.full(int(sec * SAMPLE_RATE), 1e-4, dtype=np.float32)
+
+
+class FindSpeechChunksTest(unittest.TestCase):
+
+    def test_short_audio_is_one_chunk(self):
+        audio = np.concatenate([_tone(5), _silence(1), _tone(5)])
+        self.assertEqual(find_speech_chunks(audio), [(0, len(audio))])
+
+    def test_cuts_inside_the_longest_pause(self):
+        # Speech with a short pause at 32s and a long one at 38-39s
+        audio = np.concatenate([_tone(32), _silence(0.3), _tone(5.7), _silence(1.0), _tone(20)])
+        chunks = find_speech_chunks(audio, target_sec=30, max_sec=45)
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], len(audio))
+        self.assertEqual(chunks[0][1], chunks[1][0])
+        cut_sec = chunks[0][1] / SAMPLE_RATE
+        self.assertGreater(cut_sec, 38.0)
+        self.assertLess(cut_sec, 39.0)
+        self.assertEqual(chunks[0][1] % FRAME, 0)
+
+    def test_no_pause_cuts_by_max_length(self):
+        audio = _tone(100)
+        chunks = find_speech_chunks(audio, target_sec=30, max_sec=45)
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(chunks[-1][1], len(audio))
+        for (a, b), (c, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(b, c)
+        for a, b in chunks:
+            self.assertLessEqual((b - a) / SAMPLE_RATE, 45 + FRAME_MS / 1000)
+
+    def test_silent_chunks_are_dropped(self):
+        audio = np.concatenate([_tone(20), _silence(80)])
+        chunks = find_speech_chunks(audio, target_sec=30, max_sec=45)
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0][0], 0)
+
+    def test_empty_audio(self):
+        self.assertEqual(find_speech_chunks(np.zeros(0, dtype=np.float32)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel_encode import plan_chunks
+
+FPS = 30
+
+
+class PlanChunksTest(unittest.TestCase):
+
+    def _assert_covers(self, chunks, total):
+        first = 0
+        for start, n in chunks:
+            self.assertEqual(start, first)
+            self.assertGreater(n, 0)
+            first = start + n
+        self.assertEqual(first, total)
+
+    def test_uniform_grid_covers_every_frame(self):
+        chunks = plan_chunks(60.0, FPS, workers=4)
+        self._assert_covers(chunks, 60 * FPS)
+        self.assertEqual(len(chunks), 8)
+
+    def test_cuts_on_segment_boundaries(self):
+        boundaries = [0, 10.0, 20.0, 30.0, 40.0, 50.0]
+        chunks = plan_chunks(60.0, FPS, workers=2, boundaries=boundaries)
+        self._assert_covers(chunks, 60 * FPS)
+        cut_frames = {int(b * FPS) for b in boundaries}
+        for start, _ in chunks:
+            self.assertIn(start, cut_frames)
+
+    def test_boundaries_are_rounded_to_frames(self):
+        chunks = plan_chunks(20.0, FPS, workers=1, boundaries=[10.01])
+        self.assertEqual(chunks, [(0, 300), (300, 300)])
+
+    def test_no_chunk_shorter_than_minimum(self):
+        chunks = plan_chunks(30.0, FPS, workers=8, boundaries=[0.5, 1.0, 29.0], min_chunk_sec=2.0)
+        self._assert_covers(chunks, 30 * FPS)
+        for _, n in chunks:
+            self.assertGreaterEqual(n, 2 * FPS)
+
+    def test_short_clip_is_one_chunk(self):
+        self.assertEqual(plan_chunks(1.5, FPS, workers=4), [(0, 45)])
+        self.assertEqual(plan_chunks(0.0, FPS, workers=4), [(0, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
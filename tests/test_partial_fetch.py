@@ -0,0 +1,168 @@
+import os
+import sys
+import struct
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import partial_fetch
+from partial_fetch import fetch_window, PartialFetchUnsupported
+
+# A synthetic single-track MP4: N_SAMPLES video samples of SAMPLE_BYTES each,
+# one per chunk, FPS per second, a keyframe every GOP samples. Sample i is
+# filled with byte i + 1, so skipped ranges (zeros) are easy to tell apart.
+N_SAMPLES = 120
+SAMPLE_BYTES = 20000
+FPS = 4
+GOP = 8
+TIMESCALE = 1000
+
+
+def _box(box_type, payload):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def _full_box(box_type, payload, version=0):
+    return _box(box_type, struct.pack(">I", version << 24) + payload)
+
+
+def _moov(chunk_offsets):
+    stbl = b"".join([
+        _full_box(b"stts", struct.pack(">III", 1, N_SAMPLES, TIMESCALE // FPS)),
+        _full_box(b"stss", struct.pack(">I", N_SAMPLES // GOP)
+                  + b"".join(struct.pack(">I", i + 1) for i in range(0, N_SAMPLES, GOP))),
+        _full_box(b"stsc", struct.pack(">IIII", 1, 1, 1, 1)),
+        _full_box(b"stsz", struct.pack(">II", SAMPLE_BYTES, N_SAMPLES)),
+        _full_box(b"stco", struct.pack(">I", N_SAMPLES)
+                  + b"".join(struct.pack(">I", o) for o in chunk_offsets)),
+    ])
+    mdia = b"".join([
+        _full_box(b"mdhd", struct.pack(">IIII", 0, 0, TIMESCALE, N_SAMPLES * TIMESCALE // FPS) + b"\0" * 4),
+        _full_box(b"hdlr", struct.pack(">I4s", 0, b"vide") + b"\0" * 12 + b"video\0"),
+        _box(b"minf", _box(b"stbl", stbl)),
+    ])
+    return _box(b"moov", _box(b"trak", _box(b"mdia", mdia)))
+
+
+def _samples():
+    return b"".join(bytes([i + 1]) * SAMPLE_BYTES for i in range(N_SAMPLES))
+
+
+def make_mp4(moov_at_end):
+    """Returns (file bytes, offset of sample 0)."""
+    ftyp = _box(b"ftyp", b"isom" + struct.pack(">I", 512) + b"isommp41")
+    mdat_header = 8
+    if moov_at_end:
+        first = len(ftyp) + mdat_header
+        moov = _moov([first + i * SAMPLE_BYTES for i in range(N_SAMPLES)])
+        return ftyp + _box(b"mdat", _samples()) + moov, first
+
+    moov_len = len(_moov([0] * N_SAMPLES))
+    first = len(ftyp) + moov_len + mdat_header
+    moov = _moov([first + i * SAMPLE_BYTES for i in range(N_SAMPLES)])
+    return ftyp + moov + _box(b"mdat", _samples()), first
+
+
+class _Handler(BaseHTTPRequestHandler):
+    payload = b""
+    ranges = True
+    range_requests = 0
+
+    def _send(self, body_too):
+        data = self.payload
+        rng = self.headers.get("Range")
+        if rng and self.ranges:
+            type(self).range_requests += 1
+            start, end = (int(v) for v in rng.split("=", 1)[1].split("-"))
+            end = min(end, len(data) - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            data = data[start:end + 1]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if body_too:
+            self.wfile.write(data)
+
+    def do_HEAD(self):
+        self._send(False)
+
+    def do_GET(self):
+        self._send(True)
+
+    def log_message(self, *args):
+        pass
+
+
+class PartialFetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = type("Handler", (_Handler,), {})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/clip.mp4"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, "clip.mp4")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def _sample(self, data, first, i):
+        return data[first + i * SAMPLE_BYTES:first + (i + 1) * SAMPLE_BYTES]
+
+    def _check_window(self, moov_at_end):
+        source, first = make_mp4(moov_at_end)
+        self.handler.payload = source
+
+        start, duration = 5.0, 1.0
+        transferred = fetch_window(self.url, self.out, start, duration)
+        with open(self.out, "rb") as f:
+            local = f.read()
+
+        self.assertEqual(len(local), len(source))
+        self.assertLess(transferred, len(source) // 2)
+        self.assertGreater(self.handler.range_requests, 1)
+
+        # Container boxes are intact wherever the moov is
+        moov_at = source.find(b"moov") - 4
+        moov_len = struct.unpack(">I", source[moov_at:moov_at + 4])[0]
+        self.assertEqual(local[:32], source[:32])
+        self.assertEqual(local[moov_at:moov_at + moov_len], source[moov_at:moov_at + moov_len])
+
+        # Every sample from the keyframe before the window to its end is present
+        keyframe = int(start * FPS) // GOP * GOP
+        last = int((start + duration + partial_fetch.WINDOW_MARGIN_SEC) * FPS)
+        for i in range(keyframe, last + 1):
+            self.assertEqual(self._sample(local, first, i), self._sample(source, first, i), f"sample {i}")
+
+        # Samples outside the window (past the probe and merge gaps) were never downloaded
+        after = last + partial_fetch.MERGE_GAP_BYTES // SAMPLE_BYTES + 2
+        before = range(partial_fetch.PROBE_BYTES // SAMPLE_BYTES + 1, keyframe - FPS)
+        skipped = list(before) + list(range(after, N_SAMPLES))
+        self.assertTrue(skipped)
+        for i in skipped:
+            self.assertEqual(self._sample(local, first, i), b"\0" * SAMPLE_BYTES, f"sample {i}")
+
+    def test_moov_at_front(self):
+        self._check_window(moov_at_end=False)
+
+    def test_moov_at_end(self):
+        self._check_window(moov_at_end=True)
+
+    def test_server_without_range_support(self):
+        self.handler.payload, _ = make_mp4(moov_at_end=False)
+        self.handler.ranges = False
+
+        with self.assertRaises(PartialFetchUnsupported):
+            fetch_window(self.url, self.out, 5.0, 1.0)
+        self.assertFalse(os.path.exists(self.out))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import upload_queue
+from upload_queue import _claim_next, _connect, enqueue_upload
+
+
+class UploadQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "jobs", "queue.db")
+        self.video = self._write("final.mp4", b"render one")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def _row(self, key):
+        conn = _connect(self.db)
+        try:
+            return conn.execute("SELECT * FROM uploads WHERE idem_key=?", (key,)).fetchone()
+        finally:
+            conn.close()
+
+    def test_enqueue_is_idempotent(self):
+        key = enqueue_upload(self.video, None, "topic", db_path=self.db)
+        queued = self._row(key)["video_path"]
+
+        # Same content under a new render: same key, one row, queued copy untouched
+        with open(queued, "ab") as f:
+            f.write(b" (uploading)")
+        again = self._write("final_copy.mp4", b"render one")
+        self.assertEqual(enqueue_upload(again, None, "topic", db_path=self.db), key)
+
+        self.assertEqual(upload_queue.queue_status(self.db), {"pending": 1})
+        with open(queued, "rb") as f:
+            self.assertEqual(f.read(), b"render one (uploading)")
+        self.assertEqual([n for n in os.listdir(os.path.dirname(queued)) if n.endswith(".tmp")], [])
+
+    def test_explicit_key_overrides_content_hash(self):
+        first = enqueue_upload(self.video, None, "a", idempotency_key="job-1", db_path=self.db)
+        second = enqueue_upload(self.video, None, "a", idempotency_key="job-2", db_path=self.db)
+        self.assertEqual((first, second), ("job-1", "job-2"))
+        self.assertEqual(upload_queue.queue_status(self.db), {"pending": 2})
+
+    def test_claim_then_expired_lease_goes_stale(self):
+        key = enqueue_upload(self.video, None, "topic", db_path=self.db)
+        conn = _connect(self.db)
+        try:
+            job = _claim_next(conn)
+            self.assertEqual(job["idem_key"], key)
+            row = self._row(key)
+            self.assertEqual((row["status"], row["attempts"]), ("uploading", 1))
+            self.assertGreater(row["lease_until"], time.time())
+
+            # Nothing else is due, and a live lease is left alone
+            self.assertIsNone(_claim_next(conn))
+            self.assertEqual(self._row(key)["status"], "uploading")
+
+            # The worker died: once the lease runs out the job is parked, not retried
+            conn.execute("UPDATE uploads SET lease_until=? WHERE idem_key=?", (time.time() - 1, key))
+            self.assertIsNone(_claim_next(conn))
+            self.assertEqual(self._row(key)["status"], "stale")
+        finally:
+            conn.close()
+
+        self.assertEqual(upload_queue.requeue(key[:8], self.db), 1)
+        self.assertEqual(self._row(key)["status"], "pending")
+
+    def test_claim_skips_jobs_in_backoff(self):
+        key = enqueue_upload(self.video, None, "topic", db_path=self.db)
+        conn = _connect(self.db)
+        try:
+            conn.execute("UPDATE uploads SET next_attempt_at=? WHERE idem_key=?", (time.time() + 60, key))
+            self.assertIsNone(_claim_next(conn))
+            conn.execute("UPDATE uploads SET next_attempt_at=0 WHERE idem_key=?", (key,))
+            self.assertEqual(_claim_next(conn)["idem_key"], key)
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
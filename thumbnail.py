@@ -1,8 +1,7 @@
 import os
-import requests
 import random
-from PIL import Image
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,67 +9,152 @@ load_dotenv()
 # --- Configuration ---
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")  # Put your valid API key here
 THUMBNAIL_DIR = "thumbnails"
+THUMBNAIL_SIZE = (1080, 1920)
+MAX_PER_PAGE = 80
+DOWNLOAD_WORKERS = 4
+SALIENCY_WIDTH = 128  # analysis width for smart crop
 
-# Ensure the thumbnail directory exists
-if not os.path.exists(THUMBNAIL_DIR):
-    os.makedirs(THUMBNAIL_DIR)
 
-def download_pexels_images(topic, num_images=5):
+def _crop_box(image, size, smart_crop=True):
     """
-    Downloads images from Pexels for a given topic and resizes them to 1080x1920.
-    
+    Returns the (left, top, right, bottom) box in source pixels that has the target
+    aspect ratio. Only one axis is ever free; with smart_crop the window slides
+    along it to the most detailed region (gradient energy), biased to the centre.
+    """
+    src_w, src_h = image.size
+    target_ratio = size[0] / size[1]
+
+    if src_w / src_h > target_ratio:
+        crop_w, crop_h = src_h * target_ratio, src_h   # slide horizontally
+    else:
+        crop_w, crop_h = src_w, src_w / target_ratio   # slide vertically
+
+    left, top = (src_w - crop_w) / 2, (src_h - crop_h) / 2
+
+    if smart_crop and (crop_w < src_w - 1 or crop_h < src_h - 1):
+        try:
+            import numpy as np
+
+            scale = SALIENCY_WIDTH / src_w
+            small = image.convert("L").resize((SALIENCY_WIDTH, max(1, int(src_h * scale))))
+            gray = np.asarray(small, dtype=np.float32)
+            energy = np.abs(np.diff(gray, axis=1))[:-1, :] + np.abs(np.diff(gray, axis=0))[:, :-1]
+
+            horizontal = crop_w < src_w - 1
+            profile = energy.sum(axis=0 if horizontal else 1)
+            window = max(1, int(round((crop_w if horizontal else crop_h) * scale)))
+            if window < len(profile):
+                sums = np.convolve(profile, np.ones(window), mode="valid")
+                positions = np.arange(len(sums))
+                centre = (len(sums) - 1) / 2
+                bias = 1.0 - 0.3 * np.abs(positions - centre) / max(centre, 1)
+                best = int(np.argmax(sums * bias))
+                if horizontal:
+                    left = min(src_w - crop_w, best / scale)
+                else:
+                    top = min(src_h - crop_h, best / scale)
+        except Exception as e:
+            print(f"⚠️ Smart crop failed, using centre crop: {e}")
+
+    return (left, top, left + crop_w, top + crop_h)
+
+
+def fit_image(data, size=THUMBNAIL_SIZE, smart_crop=True):
+    """
+    Decodes image bytes close to the target scale (JPEG draft mode) and returns an
+    aspect-preserving crop resized to `size`.
+    """
+    from PIL import Image
+
+    image = Image.open(BytesIO(data))
+
+    # Let the JPEG decoder skip detail we would throw away anyway (1/2, 1/4, 1/8 scale)
+    src_w, src_h = image.size
+    cover = max(size[0] / src_w, size[1] / src_h)
+    if cover < 1:
+        image.draft("RGB", (int(src_w * cover) + 1, int(src_h * cover) + 1))
+
+    image = image.convert("RGB")
+    box = _crop_box(image, size, smart_crop=smart_crop)
+    return image.resize(size, Image.LANCZOS, box=box, reducing_gap=3.0)
+
+
+def _fetch_candidate(photo, size, smart_crop):
+    import requests
+
+    file_path = os.path.join(THUMBNAIL_DIR, f"thumbnail_{photo['id']}.jpg")
+    response = requests.get(photo['src']['original'], timeout=30)
+    response.raise_for_status()
+
+    fit_image(response.content, size, smart_crop).save(file_path, quality=92)
+    return file_path
+
+
+def download_pexels_images(topic, num_images=5, size=THUMBNAIL_SIZE, smart_crop=True):
+    """
+    Downloads images from Pexels for a given topic and crops them to 1080x1920.
+
     Args:
         topic (str): Search query for images.
         num_images (int): Number of images to download.
-    
+        size (tuple): Output size (width, height).
+        smart_crop (bool): Slide the crop to the most detailed region instead of the centre.
+
     Returns:
-        list: Paths of downloaded and resized images.
+        list: Paths of downloaded and cropped images (unique per photo).
     """
+    import requests
+
+    # Ensure the thumbnail directory exists
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+
     headers = {'Authorization': PEXELS_API_KEY}
     downloaded_images = []
     page = 1
-    images = []
+    # A few spares so one bad download does not cost another search round trip
+    per_page = min(MAX_PER_PAGE, num_images * 2 + 2)
+    seen = set()
+
+    while len(downloaded_images) < num_images:
+        response = requests.get(
+            "https://api.pexels.com/v1/search",
+            params={"query": topic, "per_page": per_page, "page": page, "orientation": "portrait"},
+            headers=headers,
+            timeout=20
+        )
 
-    # Fetch images until we have enough
-    while len(images) < num_images:
-        url = f"https://api.pexels.com/v1/search?query={topic}&per_page=80&page={page}"
-        response = requests.get(url, headers=headers)
-        
         if response.status_code != 200:
             print(f"Pexels API error: {response.status_code}, {response.text}")
             break
-        
-        data = response.json()
-        if not data.get('photos'):
-            print("No more images found for this topic.")
-            break
-        
-        images.extend(data['photos'])
-        page += 1
-
-    random.shuffle(images)
 
-    for img in images:
-        if len(downloaded_images) >= num_images:
+        photos = [p for p in response.json().get('photos') or [] if p['id'] not in seen]
+        if not photos:
+            print("No more images found for this topic.")
             break
+        seen.update(p['id'] for p in photos)
+        random.shuffle(photos)
 
-        img_url = img['src']['original']
-        file_path = os.path.join(THUMBNAIL_DIR, f"thumbnail.jpg")
+        # Download and process candidates concurrently, keep results in candidate order
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+            futures = [(p, pool.submit(_fetch_candidate, p, size, smart_crop)) for p in photos]
+            for photo, future in futures:
+                enough = len(downloaded_images) >= num_images
+                if enough and future.cancel():
+                    continue
+                try:
+                    file_path = future.result()
+                except Exception as e:
+                    if not enough:
+                        print(f"Failed to download or process image {photo['id']}: {e}")
+                    continue
 
-        try:
-            response = requests.get(img_url, stream=True)
-            response.raise_for_status()
+                if enough:
+                    os.remove(file_path)  # spare that finished after we had enough
+                else:
+                    downloaded_images.append(file_path)
+                    print(f"Downloaded and cropped thumbnail: {file_path}")
 
-            # Open image, resize to 1080x1920
-            image = Image.open(BytesIO(response.content))
-            image = image.resize((1080, 1920))
-            image.save(file_path)
-            downloaded_images.append(file_path)
-
-            print(f"Downloaded and resized thumbnail: {file_path}")
-
-        except Exception as e:
-            print(f"Failed to download or process image {img['id']}: {e}")
+        page += 1
 
     return downloaded_images
 
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+import llm_cache
+
+load_dotenv()
+
+# --- Configuration ---
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+PLAN_QUEUE_FILE = "topic_queue.json"
+USED_TOPICS_FILE = "used_topics.txt"
+PLAN_BATCH_SIZE = 8       # topics (with full content packages) requested per Gemini call
+LOW_WATER = 2             # refill in the background when fewer than this remain
+MAX_REPEATS = 3           # a topic may be used (or queued) at most this many times
+LOCK_STALE_SEC = 120
+
+PLANNER_MODEL = "gemini-3-flash-preview"
+
+
+# ============================
+# Cross-process file lock
+# ============================
+@contextmanager
+def file_lock(path, timeout=60):
+    """
+    Exclusive lock shared by every process using the same `path` (works on Windows
+    and Linux). A lock file older than LOCK_STALE_SEC is treated as abandoned.
+    """
+    lock_path = path + ".lock"
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            owned = os.fstat(fd).st_ino
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                seen = os.stat(lock_path)
+                if time.time() - seen.st_mtime > LOCK_STALE_SEC:
+                    _take_over_stale(lock_path, seen)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(0.1)
+    try:
+        yield
+    finally:
+        try:
+            # Only remove our own lock (not one that replaced it after a stale takeover)
+            if os.stat(lock_path).st_ino == owned:
+                os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+
+def _take_over_stale(lock_path, seen):
+    """
+    Removes an abandoned lock file. It is first renamed atomically, so only one
+    process gets it; if the file renamed is not the stale one that was inspected
+    (another process already replaced it), it is put back.
+    """
+    moved = f"{lock_path}.{os.getpid()}.{threading.get_ident()}.stale"
+    os.rename(lock_path, moved)           # FileNotFoundError: someone else took it over
+    got = os.stat(moved)
+    if (got.st_ino, got.st_mtime) != (seen.st_ino, seen.st_mtime):
+        try:
+            os.link(moved, lock_path)     # a live lock: restore it unless yet another exists
+        except OSError:
+            pass
+    os.remove(moved)
+
+
+def _normalize_topic(topic):
+    return topic.strip().replace('"', '').replace('.', '').title()
+
+
+def _load_used_topics():
+    if not os.path.exists(USED_TOPICS_FILE):
+        return []
+    with open(USED_TOPICS_FILE, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _append_used_topic(topic):
+    with open(USED_TOPICS_FILE, "a", encoding="utf-8") as f:
+        f.write(topic + "\n")
+
+
+def load_used_topics():
+    """Used topics, oldest first, read under the shared lock."""
+    with file_lock(USED_TOPICS_FILE):
+        return _load_used_topics()
+
+
+def record_used_topic(topic):
+    """Appends a topic to used_topics.txt under the shared lock."""
+    with file_lock(USED_TOPICS_FILE):
+        _append_used_topic(topic)
+
+
+def claim_topic(topic, alternatives=()):
+    """
+    Records `topic` as used unless it already reached MAX_REPEATS, in which case a
+    random alternative still under the limit is recorded instead. The read, the
+    check and the append happen under one lock, so concurrent runs cannot both
+    take the last repeat.
+
+    Returns:
+        str: the topic that was recorded.
+    """
+    with file_lock(USED_TOPICS_FILE):
+        used = _load_used_topics()
+        if used.count(topic) >= MAX_REPEATS:
+            available = [t for t in alternatives if used.count(t) < MAX_REPEATS]
+            topic = random.choice(available or list(alternatives) or [topic])
+        _append_used_topic(topic)
+    return topic
+
+
+def _load_queue():
+    if not os.path.exists(PLAN_QUEUE_FILE):
+        return []
+    try:
+        with open(PLAN_QUEUE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Topic queue unreadable, starting fresh: {e}")
+        return []
+
+
+def _save_queue(queue):
+    tmp = PLAN_QUEUE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(queue, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, PLAN_QUEUE_FILE)
+
+
+# ============================
+# Batch planning (one Gemini call)
+# ============================
+def plan_topics(k=PLAN_BATCH_SIZE, recent_topics=()):
+    """
+    Asks Gemini for `k` distinct topics, each with its full content package
+    (script, hook text, title, description, tags).
+
+    Returns:
+        list: validated packages (see content_package.validate_package).
+    """
+    from google.genai import types
+    from content_package import CHANNEL_BRIEF, PACKAGE_FIELDS, validate_package
+
+    client = llm_cache.get_client(GEMINI_API_KEY)
+    prompt = f"""
+    You are the content planner, scriptwriter and YouTube strategist for this channel.
+    {CHANNEL_BRIEF}
+    Plan {k} DIFFERENT video topics and create the content package for each one.
+
+    Topic rules:
+    - "topic": one or two words, no punctuation (e.g. "Protein Powder", "Gut Health")
+    - Workouts, nutrition, fat loss, muscle building, or healthy habits
+    - Likely to trend or capture wide interest
+    - Prefer topics not in this recently used list: {', '.join(recent_topics)}
+    {PACKAGE_FIELDS}
+    Return a JSON array of {k} objects with the keys topic, script, hook_text, title, description, tags.
+    """
+
+    response = llm_cache.generate_content(
+        client,
+        site="plan",
+        model=PLANNER_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(response_mime_type="application/json")
+    )
+    if not response or not getattr(response, "text", None):
+        raise Exception("Planner returned no content.")
+
+    items = json.loads(response.text)
+    planned = []
+    for item in items if isinstance(items, list) else []:
+        try:
+            topic = _normalize_topic(str(item.get("topic", "")))
+            if topic:
+                planned.append(validate_package(item, topic))
+        except (AttributeError, ValueError) as e:
+            print(f"⚠️ Dropping invalid planned item: {e}")
+    return planned
+
+
+def refill_queue(batch_size=PLAN_BATCH_SIZE):
+    """
+    Plans a batch and merges it into the persistent queue. The repetition rule is
+    enforced here: a topic is dropped if used + queued copies would exceed MAX_REPEATS.
+
+    Returns:
+        int: Number of items added.
+    """
+    recent = load_used_topics()[-15:]
+    planned = plan_topics(batch_size, recent)   # slow call made outside the locks
+
+    # Lock order everywhere: queue file, then used-topics file
+    with file_lock(PLAN_QUEUE_FILE), file_lock(USED_TOPICS_FILE):
+        queue = _load_queue()
+        used = _load_used_topics()
+        counts = {}
+        for t in used + [item["topic"] for item in queue]:
+            counts[t] = counts.get(t, 0) + 1
+
+        added = 0
+        for item in planned:
+            if counts.get(item["topic"], 0) >= MAX_REPEATS:
+                continue
+            item["planned_at"] = time.time()
+            queue.append(item)
+            counts[item["topic"]] = counts.get(item["topic"], 0) + 1
+            added += 1
+        _save_queue(queue)
+
+    print(f"🗂️ Planned {added} new topic(s); {len(queue)} queued.")
+    return added
+
+
+_refill_thread = None
+
+
+def _refill_in_background():
+    global _refill_thread
+
+    if _refill_thread is not None and _refill_thread.is_alive():
+        return
+
+    def run():
+        try:
+            refill_queue()
+        except Exception as e:
+            print(f"⚠️ Background topic planning failed: {e}")
+
+    _refill_thread = threading.Thread(target=run, name="topic-planner")
+    _refill_thread.start()
+
+
+def pop_planned_topic(refill=True):
+    """
+    Takes the next planned topic off the queue and records it as used.
+
+    Returns:
+        dict: a content package ({"topic", "script", "hook_text", ...}) or None.
+    """
+    item = None
+    for attempt in range(2):
+        with file_lock(PLAN_QUEUE_FILE):
+            queue = _load_queue()
+            if queue:
+                item = queue.pop(0)
+                _save_queue(queue)
+                record_used_topic(item["topic"])
+            remaining = len(queue)
+
+        if item or not refill or attempt:
+            break
+        # Empty queue: this one time planning is on the critical path
+        try:
+            refill_queue()
+        except Exception as e:
+            print(f"⚠️ Topic planning failed: {e}")
+            return None
+
+    if refill and remaining < LOW_WATER:
+        _refill_in_background()
+
+    return item
+
+
+if __name__ == "__main__":
+    refill_queue()
+    print(json.dumps(_load_queue(), ensure_ascii=False, indent=2))
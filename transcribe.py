@@ -2,32 +2,44 @@ import os
 import re
 import shutil
 import random
-import requests
-import numpy as np
-
-import pysrt
-import ffmpeg
-
-from faster_whisper import WhisperModel
-from moviepy.editor import (
-    VideoFileClip,
-    TextClip,
-    CompositeVideoClip,
-    AudioFileClip,
-    CompositeAudioClip,
-    concatenate_audioclips,
-    ImageClip
-)
-
-# ✅ Configure ImageMagick for MoviePy
-from moviepy.config import change_settings
+import threading
+
+import encoding
+from workspace import scratch_path
+
+# moviepy, faster-whisper, pysrt and ffmpeg-python are imported inside the
+# functions that use them, so importing this module is cheap and side-effect free.
 
 IMAGEMAGICK_PATH = r"C:\Program Files\ImageMagick-7.1.2-Q16-HDRI\magick.exe"
 
-if os.path.exists(IMAGEMAGICK_PATH):
-    change_settings({"IMAGEMAGICK_BINARY": IMAGEMAGICK_PATH})
-else:
-    print("⚠️ ImageMagick not found.")
+# Defaults; `python whisper_tuning.py --calibrate` stores measured settings for this host
+WHISPER_MODEL_SIZE = "base"
+WHISPER_COMPUTE_TYPE = "int8"
+WHISPER_BEAM_SIZE = 1
+LONG_FORM_MIN_SEC = 120      # longer audio is VAD-chunked and transcribed in parallel
+
+_imagemagick_configured = False
+_whisper_models = {}          # (size, compute type, workers, threads) -> WhisperModel
+_emoji_png = {}               # twemoji code -> PNG bytes
+_model_lock = threading.Lock()
+
+
+def configure_imagemagick():
+    """Points MoviePy's TextClip at ImageMagick (once per process)."""
+    global _imagemagick_configured
+
+    if _imagemagick_configured:
+        return
+
+    # ✅ Configure ImageMagick for MoviePy
+    from moviepy.config import change_settings
+
+    if os.path.exists(IMAGEMAGICK_PATH):
+        change_settings({"IMAGEMAGICK_BINARY": IMAGEMAGICK_PATH})
+    else:
+        print("⚠️ ImageMagick not found.")
+
+    _imagemagick_configured = True
 
 
 # ===============================
@@ -35,7 +47,6 @@ else:
 # ===============================
 
 TEMP_ASSETS = "temp_assets"
-os.makedirs(TEMP_ASSETS, exist_ok=True)
 
 WORD_TO_EMOJI = {
     "egg": "1f95a",
@@ -49,36 +60,48 @@ WORD_TO_EMOJI = {
 }
 
 
-def download_emoji_png(code, name):
+def download_emoji_png(code, name, assets_dir=TEMP_ASSETS):
+
+    import requests
+
+    os.makedirs(assets_dir, exist_ok=True)
 
     url = f"https://twemoji.maxcdn.com/v/latest/72x72/{code}.png"
-    path = f"{TEMP_ASSETS}/{name}.png"
+    path = os.path.join(assets_dir, f"{name}.png")
 
     if not os.path.exists(path):
         try:
-            r = requests.get(url, timeout=10)
+            # Sprites are kept in memory, so later jobs in the process skip the download
+            if code not in _emoji_png:
+                r = requests.get(url, timeout=10)
+
+                if r.status_code == 200:
+                    _emoji_png[code] = r.content
 
-            if r.status_code == 200:
+            if code in _emoji_png:
                 with open(path, "wb") as f:
-                    f.write(r.content)
+                    f.write(_emoji_png[code])
         except:
             return None
 
     return path
 
 
-def get_sticker_for_word(word):
+def get_sticker_for_word(word, assets_dir=TEMP_ASSETS):
 
     word = word.lower().strip()
 
     if word in WORD_TO_EMOJI:
-        return download_emoji_png(WORD_TO_EMOJI[word], word)
+        return download_emoji_png(WORD_TO_EMOJI[word], word, assets_dir)
 
     return None
 
 
 def animated_sticker(path, start, duration, video_w, video_h):
 
+    import numpy as np
+    from moviepy.editor import ImageClip
+
     clip = ImageClip(path, transparent=True)
 
     base_size = int(video_h * 0.22)
@@ -122,39 +145,188 @@ def split_text_into_chunks(text, max_words=3):
     ]
 
 
-def generate_subtitled_video(video_path,
-                             output_path="final_output.mp4",
-                             platform="tiktok"):
+# ===============================
+# Whisper input audio (in memory)
+# ===============================
 
-    base_name = os.path.splitext(os.path.basename(video_path))[0]
+WHISPER_SAMPLE_RATE = 16000
 
-    audio_path = f"{base_name}_audio.mp3"
-    srt_path = f"{base_name}_subtitles.srt"
 
-    # 1️⃣ Extract audio
-    print("🎧 Extracting audio fast with FFmpeg...")
+def pcm_to_whisper_audio(pcm, sample_rate, channels=1):
+    """
+    Converts PCM (int16 bytes, or an int/float array) to the float32 mono 16 kHz
+    array faster-whisper takes directly, without touching disk.
+    """
+    import numpy as np
+    from math import gcd
 
-    (
+    if isinstance(pcm, (bytes, bytearray, memoryview)):
+        samples = np.frombuffer(pcm, dtype=np.int16)   # a view, no copy
+    else:
+        samples = np.asarray(pcm)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+
+    if samples.dtype.kind in "iu":
+        audio = samples.astype(np.float32) / 32768.0
+    else:
+        audio = samples.astype(np.float32, copy=False)
+
+    if sample_rate == WHISPER_SAMPLE_RATE:
+        return audio
+
+    g = gcd(int(sample_rate), WHISPER_SAMPLE_RATE)
+    up, down = WHISPER_SAMPLE_RATE // g, int(sample_rate) // g
+    try:
+        from scipy.signal import resample_poly
+        return resample_poly(audio, up, down).astype(np.float32, copy=False)
+    except ImportError:
+        n_out = int(round(len(audio) * up / down))
+        positions = np.arange(n_out, dtype=np.float64) * (down / up)
+        return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def load_whisper_audio(media_path):
+    """Decodes the audio track of a file straight to a 16 kHz float32 array (ffmpeg pipe)."""
+    import ffmpeg
+    import numpy as np
+
+    out, _ = (
         ffmpeg
-        .input(video_path)
-        .output(audio_path, ac=1, ar=16000, vn=None, loglevel="quiet")
-        .overwrite_output()
-        .run()
+        .input(media_path)
+        .output("pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=WHISPER_SAMPLE_RATE,
+                vn=None, loglevel="quiet")
+        .run(capture_stdout=True)
     )
+    return np.frombuffer(out, dtype=np.float32)
+
+
+def whisper_settings(audio=None):
+    """
+    Model settings from whisper_config.json (see whisper_tuning.py), else the defaults.
+
+    Args:
+        audio (np.ndarray): long-form audio; selects the calibrated worker split
+            (or long_transcribe.plan_workers without a calibration).
+
+    Returns:
+        dict: model_size, compute_type, num_workers, cpu_threads, beam_size.
+    """
+    from whisper_tuning import load_config
+
+    tuned = load_config() or {}
+    settings = {
+        "model_size": tuned.get("model_size", WHISPER_MODEL_SIZE),
+        "compute_type": tuned.get("compute_type", WHISPER_COMPUTE_TYPE),
+        "num_workers": 1,
+        "cpu_threads": tuned.get("cpu_threads", 0),
+        "beam_size": tuned.get("beam_size", WHISPER_BEAM_SIZE),
+    }
+    if audio is not None:
+        if "long_form" in tuned:
+            settings.update(tuned["long_form"])
+        else:
+            from long_transcribe import plan_workers
+            settings["num_workers"], settings["cpu_threads"] = plan_workers(audio)
+    return settings
+
+
+def load_whisper_model(num_workers=None, cpu_threads=None, model_size=None, compute_type=None):
+    """
+    Returns the Whisper model for these settings, loading it once per process.
+    Unset arguments come from whisper_settings() (the calibrated shorts setup).
+    """
+    from faster_whisper import WhisperModel
+
+    defaults = whisper_settings()
+    key = (
+        model_size or defaults["model_size"],
+        compute_type or defaults["compute_type"],
+        defaults["num_workers"] if num_workers is None else num_workers,
+        defaults["cpu_threads"] if cpu_threads is None else cpu_threads,
+    )
+    with _model_lock:
+        if key not in _whisper_models:
+            _whisper_models[key] = WhisperModel(
+                key[0],
+                device="cpu",
+                compute_type=key[1],
+                num_workers=key[2],
+                cpu_threads=key[3]
+            )
+        return _whisper_models[key]
 
-    # 2️⃣ Load Whisper
-    print("⚡ Loading faster-whisper model...")
 
-    model = WhisperModel("base", device="cpu", compute_type="int8")
+def transcribe_audio(audio):
+    """
+    Transcribes a 16 kHz float32 array. Short clips use one serial call; long
+    ones go through long_transcribe (VAD chunks on a worker pool).
 
-    print("🧠 Transcribing audio...")
+    Returns:
+        list: segments with .start, .end and .text (seconds, absolute).
+    """
+    audio_sec = len(audio) / WHISPER_SAMPLE_RATE
+    long_form = audio_sec >= LONG_FORM_MIN_SEC
+    settings = whisper_settings(audio if long_form else None)
+    options = {"beam_size": settings["beam_size"], "language": "en", "task": "transcribe"}
 
-    segments, _ = model.transcribe(
-        audio_path,
-        beam_size=1,
-        language="en",
-        task="transcribe"
-    )
+    if not long_form:
+        print(f"⚡ Loading faster-whisper model ({settings['model_size']}/{settings['compute_type']})...")
+        model = load_whisper_model(1, settings["cpu_threads"])
+        print("🧠 Transcribing audio...")
+        segments, _ = model.transcribe(audio, **options)
+        return list(segments)
+
+    from long_transcribe import transcribe_long
+
+    workers, cpu_threads = settings["num_workers"], settings["cpu_threads"]
+    print(f"⚡ Loading faster-whisper model ({settings['model_size']}/{settings['compute_type']}, "
+          f"{workers} workers × {cpu_threads} threads)...")
+    model = load_whisper_model(num_workers=workers, cpu_threads=cpu_threads)
+
+    print(f"🧠 Transcribing {audio_sec:.0f}s of audio in VAD chunks...")
+    segments, stats = transcribe_long(model, audio, workers, **options)
+    print(f"⏱ Transcribed {stats['audio_sec']}s in {stats['wall_sec']}s "
+          f"({stats['realtime_factor']}x realtime, {stats['chunks']} chunks)")
+    return segments
+
+
+def generate_subtitled_video(video_path,
+                             output_path="final_output.mp4",
+                             platform="tiktok",
+                             audio=None,
+                             workspace=None,
+                             profile=None):
+    """
+    Args:
+        audio (np.ndarray): float32 mono 16 kHz speech to transcribe (e.g. the
+            narration from pcm_to_whisper_audio). Decoded from `video_path` when omitted.
+        workspace (JobWorkspace): keeps the SRT and sticker images in the job's
+            scratch directory. Without one they go to the current directory.
+        profile (str): encoding profile of the job (None = encoding.DEFAULT_PROFILE).
+    """
+
+    import pysrt
+    import ffmpeg
+    from moviepy.editor import TextClip
+    from clip_reader import probe_duration, open_segment_clip
+    from parallel_encode import write_parallel
+    from compositor import composite_layers
+
+    configure_imagemagick()
+
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+
+    srt_path = scratch_path(workspace, f"{base_name}_subtitles.srt")
+    assets_dir = scratch_path(workspace, TEMP_ASSETS)
+
+    # 1️⃣ Audio for Whisper: the clean narration when we have it, else the render's track
+    if audio is None:
+        print("🎧 Decoding audio from the video...")
+        audio = load_whisper_audio(video_path)
+
+    # 2️⃣ Transcribe (parallel VAD chunks for long-form audio)
+    segments = transcribe_audio(audio)
 
     # 3️⃣ Generate SRT
     print("📝 Generating subtitles...")
@@ -195,9 +367,12 @@ def generate_subtitled_video(video_path,
     # 4️⃣ Aspect ratio fix
     print("🎬 Adjusting aspect ratio...")
 
-    video_clip = VideoFileClip(video_path)
-
-    width, height = video_clip.size
+    # The source is read through clip_reader: ffmpeg centre-crops while decoding,
+    # and the reader is safe to use from the parallel encoder's forked workers
+    stream = next(s for s in ffmpeg.probe(video_path)["streams"] if s["codec_type"] == "video")
+    width, height = int(stream["width"]), int(stream["height"])
+    num, den = stream.get("avg_frame_rate", "24/1").split("/")
+    source_fps = float(num) / float(den) if float(den) else 24.0
 
     if platform.lower() in ["tiktok", "shorts", "youtube"]:
         target_ratio = 9 / 16
@@ -210,100 +385,104 @@ def generate_subtitled_video(video_path,
 
         if target_ratio > current_ratio:
 
-            new_height = int(width / target_ratio)
-            y1 = (height - new_height) // 2
-
-            video_clip = video_clip.crop(y1=y1, y2=y1 + new_height)
+            height = int(width / target_ratio)
 
         else:
 
-            new_width = int(height * target_ratio)
-            x1 = (width - new_width) // 2
-
-            video_clip = video_clip.crop(x1=x1, x2=x1 + new_width)
+            width = int(height * target_ratio)
 
-    # 5️⃣ Subtitles + Stickers (EXTENDED)
-    print("🔥 Rendering centered subtitles...")
+    # yuv420p needs even dimensions
+    width -= width % 2
+    height -= height % 2
 
-    fontsize = int(video_clip.h * 0.085)
-    stroke_w = int(video_clip.h * 0.006)
-
-    subs = pysrt.open(srt_path, encoding="utf-8")
+    video_clip = open_segment_clip(
+        video_path, 0.0, probe_duration(video_path), (width, height), source_fps
+    )
 
     subtitle_clips = []
     sticker_clips = []   # ADDED
+    final = None
 
-    for sub in subs:
+    # The decoder and every overlay are released even if rendering fails
+    try:
+        # 5️⃣ Subtitles + Stickers (EXTENDED)
+        print("🔥 Rendering centered subtitles...")
 
-        txt = sub.text.replace("\n", " ")
+        fontsize = int(video_clip.h * 0.085)
+        stroke_w = int(video_clip.h * 0.006)
 
-        start = sub.start.ordinal / 1000.0
-        end = sub.end.ordinal / 1000.0
+        subs = pysrt.open(srt_path, encoding="utf-8")
 
-        duration = end - start
+        for sub in subs:
 
-        # Original subtitle
-        txt_clip = (
-            TextClip(
-                txt,
-                fontsize=fontsize,
-                font="Arial-Bold",
-                color="yellow",
-                stroke_color="black",
-                stroke_width=stroke_w,
-                method="caption",
-                size=(video_clip.w * 0.88, None),
-                align="center"
+            txt = sub.text.replace("\n", " ")
+
+            start = sub.start.ordinal / 1000.0
+            end = sub.end.ordinal / 1000.0
+
+            duration = end - start
+
+            # Original subtitle
+            txt_clip = (
+                TextClip(
+                    txt,
+                    fontsize=fontsize,
+                    font="Arial-Bold",
+                    color="yellow",
+                    stroke_color="black",
+                    stroke_width=stroke_w,
+                    method="caption",
+                    size=(video_clip.w * 0.88, None),
+                    align="center"
+                )
+                .set_position(("center", "center"))
+                .set_start(start)
+                .set_duration(duration)
             )
-            .set_position(("center", "center"))
-            .set_start(start)
-            .set_duration(duration)
-        )
 
-        subtitle_clips.append(txt_clip)
+            subtitle_clips.append(txt_clip)
 
-        # ADDED: keyword → sticker
-        words = re.findall(r"\w+", txt.lower())
+            # ADDED: keyword → sticker
+            words = re.findall(r"\w+", txt.lower())
 
-        for w in words:
+            for w in words:
 
-            img = get_sticker_for_word(w)
+                img = get_sticker_for_word(w, assets_dir)
 
-            if img and os.path.exists(img):
+                if img and os.path.exists(img):
 
-                sticker = animated_sticker(
-                    img,
-                    start,
-                    min(1.5, duration),
-                    video_clip.w,
-                    video_clip.h
-                )
+                    sticker = animated_sticker(
+                        img,
+                        start,
+                        min(1.5, duration),
+                        video_clip.w,
+                        video_clip.h
+                    )
 
-                sticker_clips.append(sticker)
+                    sticker_clips.append(sticker)
 
-    final = CompositeVideoClip(
-        [video_clip] + subtitle_clips + sticker_clips
-    )
+        # Only the captions/stickers on screen at t are visited and blended
+        final = composite_layers(video_clip, subtitle_clips + sticker_clips)
 
-    # 6️⃣ Export
-    print("💾 Exporting final video...")
+        # 6️⃣ Export
+        print("💾 Exporting final video...")
 
-    final.write_videofile(
-        output_path,
-        codec="libx264",
-        audio_codec="aac",
-        fps=video_clip.fps,
-        threads=4,
-        preset="medium"
-    )
+        write_parallel(final, output_path, video_clip.fps, audio_path=video_path, profile=profile)
+    finally:
+        for clip in subtitle_clips + sticker_clips + ([final] if final is not None else []):
+            try:
+                clip.close()
+            except Exception:
+                pass
+        video_clip.close()
 
     # 7️⃣ Cleanup
-    for f in [audio_path, srt_path]:
+    for f in [srt_path]:
         if os.path.exists(f):
             os.remove(f)
 
-    if os.path.exists(TEMP_ASSETS):
-        shutil.rmtree(TEMP_ASSETS)
+    if os.path.exists(assets_dir):
+        shutil.rmtree(assets_dir)
 
     print(f"✅ Final video exported: {output_path}")
 
@@ -317,41 +496,56 @@ def generate_subtitled_video(video_path,
 def add_background_music_to_video(video_path,
                                   sound_path,
                                   output_path="final_with_sound.mp4",
-                                  volume=0.1):
+                                  volume=0.1,
+                                  workspace=None,
+                                  profile=None):
+    """Mixes `sound_path` under the video's audio; the mix is encoded with `profile`."""
+
+    import ffmpeg
+    from moviepy.editor import (
+        VideoFileClip,
+        AudioFileClip,
+        CompositeAudioClip,
+        concatenate_audioclips
+    )
 
     print("🎵 Adding background sound effect...")
 
-    video = VideoFileClip(video_path)
-
-    original_audio = video.audio
-    bg_audio = AudioFileClip(sound_path)
+    # Lossless intermediate: the mix is encoded once, with the profile's settings
+    temp_audio = scratch_path(workspace, "temp_mixed_audio.wav")
 
-    if bg_audio.duration < video.duration:
+    video = VideoFileClip(video_path)
+    bg_source = None
+    final_audio = None
 
-        n_loops = int(video.duration // bg_audio.duration) + 1
+    # Both ffmpeg readers are closed even if mixing fails
+    try:
+        original_audio = video.audio
+        bg_source = bg_audio = AudioFileClip(sound_path)
 
-        bg_audio = concatenate_audioclips([bg_audio] * n_loops)
+        if bg_audio.duration < video.duration:
 
-    bg_audio = bg_audio.subclip(0, video.duration).volumex(volume)
+            n_loops = int(video.duration // bg_audio.duration) + 1
 
-    if original_audio:
-        final_audio = CompositeAudioClip([original_audio.volumex(1.0), bg_audio])
-    else:
-        final_audio = bg_audio
+            bg_audio = concatenate_audioclips([bg_audio] * n_loops)
 
-    temp_audio = "temp_mixed_audio.mp3"
+        bg_audio = bg_audio.subclip(0, video.duration).volumex(volume)
 
-    final_audio.write_audiofile(
-        temp_audio,
-        fps=44100,
-        nbytes=2,
-        codec="mp3",
-        bitrate="192k"
-    )
+        if original_audio:
+            final_audio = CompositeAudioClip([original_audio.volumex(1.0), bg_audio])
+        else:
+            final_audio = bg_audio
 
-    video.close()
-    bg_audio.close()
-    final_audio.close()
+        final_audio.write_audiofile(
+            temp_audio,
+            fps=44100,
+            nbytes=2,
+            codec="pcm_s16le"
+        )
+    finally:
+        for clip in (final_audio, bg_source, video):
+            if clip is not None:
+                clip.close()
 
     print("🎬 Merging final video and audio with FFmpeg...")
 
@@ -365,8 +559,8 @@ def add_background_music_to_video(video_path,
             audio_input,
             output_path,
             vcodec="copy",
-            acodec="aac",
-            audio_bitrate="192k",
+            acodec=encoding.AUDIO_CODEC,
+            audio_bitrate=encoding.get_profile(profile)["audio_bitrate"],
             ac=2,
             strict="experimental",
             shortest=None,
@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Configuration ---
+UPLOAD_JOBS_DIR = "upload_jobs"
+QUEUE_DB = os.path.join(UPLOAD_JOBS_DIR, "queue.db")
+MAX_ATTEMPTS = 5
+RETRY_BASE_SEC = 60          # backoff: 60s, 120s, 240s, ...
+LEASE_SEC = 2 * 60 * 60      # an upload still "running" after this is considered abandoned
+POLL_INTERVAL_SEC = 15
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    idem_key        TEXT PRIMARY KEY,
+    video_path      TEXT NOT NULL,
+    thumbnail_path  TEXT,
+    topic           TEXT,
+    metadata        TEXT,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    lease_until     REAL NOT NULL DEFAULT 0,
+    video_id        TEXT,
+    last_error      TEXT,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL
+)
+"""
+
+
+# ============================
+# Queue storage
+# ============================
+def _connect(db_path=QUEUE_DB):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(_SCHEMA)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(uploads)")}
+    if "metadata" not in columns:   # queues created before metadata was stored
+        conn.execute("ALTER TABLE uploads ADD COLUMN metadata TEXT")
+    return conn
+
+
+def _file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def enqueue_upload(video_path, thumbnail_path, topic, idempotency_key=None, db_path=QUEUE_DB,
+                   metadata=None):
+    """
+    Copies the rendered video (and thumbnail) into the job directory and queues it for upload.
+
+    The idempotency key defaults to the SHA-256 of the video file, so enqueueing the
+    same render twice never produces a second upload. `metadata` ({"title",
+    "description", "tags"}) is stored with the job so the worker needs no LLM call.
+
+    Returns:
+        str: The idempotency key of the queued job, or None if the video is missing.
+    """
+    if not os.path.exists(video_path):
+        print(f"❌ Cannot enqueue, video not found: {video_path}")
+        return None
+
+    key = idempotency_key or _file_sha256(video_path)
+    conn = _connect(db_path)
+    try:
+        if _job_exists(conn, key):
+            print(f"ℹ️ Upload already queued (key {key[:12]}), not adding it again.")
+            return key
+
+        job_dir = os.path.join(os.path.dirname(db_path) or ".", key[:16])
+        os.makedirs(job_dir, exist_ok=True)
+
+        # Keep our own copy: the pipeline reuses fixed output names on the next run.
+        # Copies go to temp names and are renamed only once the row is inserted, so
+        # a duplicate enqueue never overwrites a file a worker may be uploading.
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        files = [(video_path, os.path.join(job_dir, os.path.basename(video_path)))]
+        if thumbnail_path and os.path.exists(thumbnail_path):
+            files.append((thumbnail_path, os.path.join(job_dir, os.path.basename(thumbnail_path))))
+        queued_video = files[0][1]
+        queued_thumb = files[1][1] if len(files) > 1 else None
+
+        try:
+            for source, dest in files:
+                shutil.copy2(source, dest + suffix)
+
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if _job_exists(conn, key):   # queued by another process meanwhile
+                    conn.execute("ROLLBACK")
+                    print(f"ℹ️ Upload already queued (key {key[:12]}), not adding it again.")
+                    return key
+                conn.execute(
+                    "INSERT INTO uploads "
+                    "(idem_key, video_path, thumbnail_path, topic, metadata, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, queued_video, queued_thumb, topic,
+                     json.dumps(metadata) if metadata else None, now, now)
+                )
+                for _, dest in files:
+                    os.replace(dest + suffix, dest)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            for _, dest in files:
+                if os.path.exists(dest + suffix):
+                    os.remove(dest + suffix)
+    finally:
+        conn.close()
+
+    print(f"📥 Queued upload {key[:12]} → {queued_video}")
+    return key
+
+
+def _job_exists(conn, key):
+    return conn.execute("SELECT 1 FROM uploads WHERE idem_key=?", (key,)).fetchone() is not None
+
+
+def _claim_next(conn):
+    """Atomically moves one due job from pending to uploading and returns it."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Jobs whose worker died mid-upload may or may not have reached YouTube.
+        # Park them as 'stale' instead of retrying so nothing is uploaded twice.
+        conn.execute(
+            "UPDATE uploads SET status='stale', updated_at=? "
+            "WHERE status='uploading' AND lease_until < ?",
+            (now, now)
+        )
+        row = conn.execute(
+            "SELECT * FROM uploads WHERE status='pending' AND next_attempt_at <= ? "
+            "ORDER BY created_at LIMIT 1",
+            (now,)
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE uploads SET status='uploading', attempts=attempts+1, "
+                "lease_until=?, updated_at=? WHERE idem_key=?",
+                (now + LEASE_SEC, now, row["idem_key"])
+            )
+        conn.execute("COMMIT")
+        return row
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _mark_uploaded(conn, key, video_id):
+    """Records the video ID the moment YouTube accepts the insert, before any follow-up call."""
+    conn.execute(
+        "UPDATE uploads SET video_id=?, updated_at=? WHERE idem_key=?",
+        (video_id, time.time(), key)
+    )
+
+
+def _mark_done(conn, key, video_id):
+    conn.execute(
+        "UPDATE uploads SET status='done', video_id=?, last_error=NULL, updated_at=? "
+        "WHERE idem_key=?",
+        (video_id, time.time(), key)
+    )
+
+
+def _mark_failed(conn, job, error, max_attempts):
+    now = time.time()
+    attempts = job["attempts"] + 1
+    if attempts >= max_attempts:
+        status, next_at = "failed", 0
+    else:
+        status, next_at = "pending", now + RETRY_BASE_SEC * (2 ** (attempts - 1))
+    conn.execute(
+        "UPDATE uploads SET status=?, next_attempt_at=?, last_error=?, updated_at=? "
+        "WHERE idem_key=?",
+        (status, next_at, str(error)[:2000], now, job["idem_key"])
+    )
+    return status
+
+
+def requeue(key, db_path=QUEUE_DB):
+    """Moves a failed or stale job back to pending (use only after checking the channel)."""
+    conn = _connect(db_path)
+    try:
+        cur = conn.execute(
+            "UPDATE uploads SET status='pending', attempts=0, next_attempt_at=0, updated_at=? "
+            "WHERE idem_key LIKE ? AND status IN ('failed', 'stale')",
+            (time.time(), key + "%")
+        )
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def queue_status(db_path=QUEUE_DB):
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM uploads GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+    finally:
+        conn.close()
+
+
+# ============================
+# Worker
+# ============================
+def _process_job(job, db_path, max_attempts, keep_files):
+    # Imported here so enqueueing from the render process never loads the YouTube client
+    from Upload import upload_to_youtube
+
+    key = job["idem_key"]
+    conn = _connect(db_path)
+    try:
+        print(f"⏫ [{key[:12]}] attempt {job['attempts'] + 1}/{max_attempts}")
+        uploaded = {"video_id": job["video_id"]}
+
+        def on_uploaded(video_id):
+            uploaded["video_id"] = video_id
+            _mark_uploaded(conn, key, video_id)
+
+        try:
+            if uploaded["video_id"]:
+                # Inserted by an earlier attempt: never insert again
+                video_id = uploaded["video_id"]
+            else:
+                video_id = upload_to_youtube(
+                    video_path=job["video_path"],
+                    thumbnail_path=job["thumbnail_path"] or "",
+                    topic=job["topic"],
+                    metadata=json.loads(job["metadata"]) if job["metadata"] else None,
+                    on_uploaded=on_uploaded
+                )
+            if not video_id:
+                raise Exception("upload_to_youtube returned no video ID")
+        except Exception as e:
+            if uploaded["video_id"]:
+                # Failure after the insert succeeded: the video is live, don't retry
+                video_id = uploaded["video_id"]
+                print(f"⚠️ [{key[:12]}] post-upload step failed, keeping {video_id}: {e}")
+            else:
+                status = _mark_failed(conn, job, e, max_attempts)
+                print(f"⚠️ [{key[:12]}] upload failed ({status}): {e}")
+                return None
+
+        _mark_done(conn, key, video_id)
+        print(f"✅ [{key[:12]}] uploaded as {video_id}")
+
+        if not keep_files:
+            shutil.rmtree(os.path.dirname(job["video_path"]), ignore_errors=True)
+        return video_id
+    finally:
+        conn.close()
+
+
+def run_worker(concurrency=1, max_attempts=MAX_ATTEMPTS, once=False,
+               poll_interval=POLL_INTERVAL_SEC, keep_files=False, db_path=QUEUE_DB):
+    """
+    Drains the upload queue with at most `concurrency` uploads in flight.
+
+    Args:
+        once (bool): Exit when no job is due instead of polling forever.
+    """
+    conn = _connect(db_path)
+    slots = threading.Semaphore(concurrency)
+    print(f"🚚 Upload worker started (concurrency={concurrency}, db={db_path})")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            while True:
+                slots.acquire()
+                job = _claim_next(conn)
+                if job is None:
+                    slots.release()
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                future = pool.submit(_process_job, job, db_path, max_attempts, keep_files)
+                future.add_done_callback(lambda _: slots.release())
+        except KeyboardInterrupt:
+            print("🛑 Upload worker stopping, waiting for in-flight uploads...")
+        finally:
+            conn.close()
+
+    print(f"📊 Queue status: {queue_status(db_path)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="YouTube upload queue worker")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+    parser.add_argument("--once", action="store_true", help="drain due jobs and exit")
+    parser.add_argument("--keep-files", action="store_true", help="keep job files after upload")
+    parser.add_argument("--status", action="store_true", help="print queue counts and exit")
+    parser.add_argument("--requeue", metavar="KEY", help="retry a failed/stale job by key prefix")
+    args = parser.parse_args()
+
+    if args.status:
+        print(queue_status())
+    elif args.requeue:
+        print(f"🔁 Requeued {requeue(args.requeue)} job(s).")
+    else:
+        run_worker(
+            concurrency=args.concurrency,
+            max_attempts=args.max_attempts,
+            once=args.once,
+            keep_files=args.keep_files
+        )
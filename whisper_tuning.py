@@ -0,0 +1,324 @@
+import os
+import re
+import json
+import time
+import wave
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Picks the Whisper setup for this host by measurement instead of hard-coding
+# WhisperModel("base", compute_type="int8"). A calibration run transcribes a
+# sample narration with a known script under every candidate (model size,
+# compute type, cpu_threads, num_workers), keeps the ones whose word error rate
+# stays under the accuracy floor, and stores the fastest in whisper_config.json.
+# transcribe.py reads that file on every load (see transcribe.whisper_settings).
+
+CONFIG_FILE = os.getenv("WHISPER_CONFIG", "whisper_config.json")
+SAMPLE_AUDIO = os.path.join("calibration", "sample_narration.wav")
+SAMPLE_SCRIPT = os.path.join("calibration", "sample_narration.txt")
+MODELS = ("tiny", "base", "small")
+COMPUTE_TYPES = ("int8", "int8_float32")
+WORKER_OPTIONS = (1, 2, 4)         # concurrent transcriptions (long-form chunks)
+MAX_WER = 0.12                     # accuracy floor against the known script
+REPEATS = 2                        # best-of runs per candidate
+MAX_SAMPLE_SEC = 120               # longest job narration kept as the sample
+CONFIG_VERSION = 1
+
+# Narration for --make-sample (spoken by the pipeline's own TTS voice)
+SAMPLE_TEXT = (
+    "Want to build muscle without spending hours in the gym? Start with three full body "
+    "workouts a week. Focus on squats, push ups and rows, and add a little weight every "
+    "session. Eat protein with every meal, drink plenty of water and sleep at least seven "
+    "hours. Consistency beats intensity, so show up, track your progress and keep going."
+)
+
+_config = None
+_config_loaded = False
+
+
+# ============================
+# Accuracy
+# ============================
+def _words(text):
+    return re.findall(r"[a-z0-9']+", text.lower().replace("-", " "))
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length."""
+    ref, hyp = _words(reference), _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+# ============================
+# Benchmark
+# ============================
+def candidate_grid(cores, models=MODELS, compute_types=COMPUTE_TYPES):
+    """
+    Returns:
+        list: (model_size, compute_type, num_workers, cpu_threads). Single-worker
+            runs try several thread counts; multi-worker runs split the cores.
+    """
+    threads = sorted({cores, max(1, cores // 2), max(1, cores // 4)}, reverse=True)
+    grid = []
+    for model_size in models:
+        for compute_type in compute_types:
+            grid += [(model_size, compute_type, 1, t) for t in threads]
+            grid += [(model_size, compute_type, w, max(1, cores // w))
+                     for w in WORKER_OPTIONS if 1 < w <= cores]
+    return grid
+
+
+def benchmark(audio, reference, model_size, compute_type, num_workers, cpu_threads,
+              repeats=REPEATS):
+    """
+    Transcribes `audio` `num_workers` times concurrently with one model.
+
+    Returns:
+        dict: settings plus "wer", "realtime_factor" (audio seconds transcribed per
+            wall second, summed over workers) and "load_sec".
+    """
+    from faster_whisper import WhisperModel
+    from transcribe import WHISPER_SAMPLE_RATE
+
+    started = time.perf_counter()
+    model = WhisperModel(model_size, device="cpu", compute_type=compute_type,
+                         cpu_threads=cpu_threads, num_workers=num_workers)
+    load_sec = time.perf_counter() - started
+
+    def run(_):
+        segments, _ = model.transcribe(audio, beam_size=1, language="en", task="transcribe")
+        return " ".join(seg.text for seg in segments)
+
+    best_wall, text = None, ""
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            texts = list(pool.map(run, range(num_workers)))
+            wall = time.perf_counter() - t0
+            if best_wall is None or wall < best_wall:
+                best_wall, text = wall, texts[0]
+
+    audio_sec = len(audio) / WHISPER_SAMPLE_RATE
+    return {
+        "model_size": model_size,
+        "compute_type": compute_type,
+        "num_workers": num_workers,
+        "cpu_threads": cpu_threads,
+        "wer": round(word_error_rate(reference, text), 4),
+        "realtime_factor": round(num_workers * audio_sec / best_wall, 2),
+        "load_sec": round(load_sec, 2),
+    }
+
+
+def calibrate(audio_path=SAMPLE_AUDIO, script_path=SAMPLE_SCRIPT, max_wer=MAX_WER,
+              models=MODELS, compute_types=COMPUTE_TYPES, path=CONFIG_FILE):
+    """
+    Benchmarks the candidate grid and stores the fastest setup within `max_wer`.
+
+    The model and compute type are chosen by single-worker speed (the shorts
+    path); the long-form worker split is then the fastest one for that model.
+
+    Returns:
+        dict: the stored configuration, or None if no candidate met the floor.
+    """
+    from long_transcribe import core_budget
+    from transcribe import load_whisper_audio, WHISPER_SAMPLE_RATE
+
+    if not os.path.exists(audio_path) or not os.path.exists(script_path):
+        raise FileNotFoundError(
+            f"Calibration sample missing ({audio_path}, {script_path}); the first "
+            f"short job saves its narration there, or run `python whisper_tuning.py "
+            f"--make-sample`, or pass --audio/--script"
+        )
+    with open(script_path, "r", encoding="utf-8") as f:
+        reference = f.read()
+    audio = load_whisper_audio(audio_path)
+    cores = core_budget()
+    print(f"🎯 Calibrating Whisper on {len(audio) / WHISPER_SAMPLE_RATE:.1f}s of audio, "
+          f"{cores} cores, WER floor {max_wer:.0%}")
+
+    results, rejected = [], set()
+    for model_size, compute_type, workers, threads in candidate_grid(cores, models, compute_types):
+        # WER does not depend on threads/workers: skip the rest of a failing model
+        if (model_size, compute_type) in rejected:
+            continue
+        try:
+            result = benchmark(audio, reference, model_size, compute_type, workers, threads)
+        except Exception as e:
+            print(f"⚠️ {model_size}/{compute_type} ({workers}×{threads}) failed: {e}")
+            rejected.add((model_size, compute_type))
+            continue
+        results.append(result)
+        ok = result["wer"] <= max_wer
+        print(f"   {model_size:>5} {compute_type:<12} {workers}×{threads:<2} threads  "
+              f"WER {result['wer']:.1%}  {result['realtime_factor']}x realtime {'✅' if ok else '❌'}")
+        if not ok:
+            rejected.add((model_size, compute_type))
+
+    passing = [r for r in results if r["wer"] <= max_wer]
+    single = [r for r in passing if r["num_workers"] == 1]
+    if not single:
+        print("❌ No Whisper setup met the accuracy floor; keeping the defaults.")
+        return None
+
+    best = max(single, key=lambda r: r["realtime_factor"])
+    same_model = [r for r in passing
+                  if (r["model_size"], r["compute_type"]) == (best["model_size"], best["compute_type"])]
+    best_long = max(same_model, key=lambda r: r["realtime_factor"])
+
+    config = {
+        "version": CONFIG_VERSION,
+        "model_size": best["model_size"],
+        "compute_type": best["compute_type"],
+        "cpu_threads": best["cpu_threads"],
+        "beam_size": 1,
+        "long_form": {"num_workers": best_long["num_workers"], "cpu_threads": best_long["cpu_threads"]},
+        "wer": best["wer"],
+        "realtime_factor": best["realtime_factor"],
+        "max_wer": max_wer,
+        "cores": cores,
+        "sample_sec": round(len(audio) / WHISPER_SAMPLE_RATE, 2),
+        "calibrated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    reset_config()
+
+    print(f"✅ Whisper: {config['model_size']}/{config['compute_type']} with "
+          f"{config['cpu_threads']} threads ({config['realtime_factor']}x realtime, "
+          f"WER {config['wer']:.1%}); long-form {best_long['num_workers']}×"
+          f"{best_long['cpu_threads']} ({best_long['realtime_factor']}x) → {path}")
+    return config
+
+
+# ============================
+# Stored configuration
+# ============================
+def load_config(path=CONFIG_FILE):
+    """
+    Returns the calibrated configuration, or None when there is none or it was
+    measured with a different core budget (read once per process).
+    """
+    global _config, _config_loaded
+
+    if _config_loaded:
+        return _config
+    _config_loaded = True
+
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable {path}: {e}")
+        return None
+    if config.get("version") != CONFIG_VERSION:
+        return None
+
+    from long_transcribe import core_budget
+    if config.get("cores") != core_budget():
+        print(f"ℹ️ {path} was calibrated for {config.get('cores')} cores, this host has "
+              f"{core_budget()}; using defaults. Re-run `python whisper_tuning.py --calibrate`.")
+        return None
+
+    _config = config
+    return _config
+
+
+def reset_config():
+    global _config, _config_loaded
+    _config, _config_loaded = None, False
+
+
+# ============================
+# Sample narration
+# ============================
+def save_sample(narration, text, audio_path=SAMPLE_AUDIO, script_path=SAMPLE_SCRIPT):
+    """Writes a 16 kHz float narration as int16 WAV plus its spoken text."""
+    import numpy as np
+    from transcribe import WHISPER_SAMPLE_RATE
+
+    os.makedirs(os.path.dirname(audio_path) or ".", exist_ok=True)
+    pcm = (np.clip(narration, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(audio_path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(WHISPER_SAMPLE_RATE)
+        w.writeframes(pcm.tobytes())
+    with open(script_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    print(f"✅ Calibration sample saved: {audio_path} ({len(pcm) / WHISPER_SAMPLE_RATE:.1f}s), "
+          f"script: {script_path}")
+    return audio_path
+
+
+def keep_job_sample(narration, text, audio_path=SAMPLE_AUDIO, script_path=SAMPLE_SCRIPT):
+    """
+    Saves a finished job's narration as the calibration sample when there is
+    none yet, so --calibrate works without a separate --make-sample TTS call.
+    Narrations longer than MAX_SAMPLE_SEC are skipped (calibration would crawl).
+    """
+    from transcribe import WHISPER_SAMPLE_RATE
+
+    if narration is None or not text or os.path.exists(audio_path):
+        return None
+    if len(narration) > MAX_SAMPLE_SEC * WHISPER_SAMPLE_RATE:
+        return None
+    try:
+        return save_sample(narration, text, audio_path, script_path)
+    except Exception as e:
+        print(f"⚠️ Could not keep the narration as a calibration sample: {e}")
+        return None
+
+
+def make_sample(audio_path=SAMPLE_AUDIO, script_path=SAMPLE_SCRIPT, text=SAMPLE_TEXT):
+    """Speaks SAMPLE_TEXT with the pipeline's TTS voice and saves it as 16 kHz WAV + script."""
+    from test import generate_script_and_speech
+    from workspace import JobWorkspace
+
+    with JobWorkspace() as workspace:
+        _, tts_text, duration, narration = generate_script_and_speech(
+            "calibration", f"[NARRATOR]: {text}", workspace
+        )
+    if narration is None or duration <= 0:
+        raise RuntimeError("TTS failed; cannot create the calibration sample")
+    return save_sample(narration, tts_text, audio_path, script_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Whisper auto-tuning by measured realtime factor")
+    parser.add_argument("--make-sample", action="store_true",
+                        help="create the sample narration with the pipeline's TTS")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="benchmark models/settings and store the fastest accurate one")
+    parser.add_argument("--show", action="store_true", help="print the stored configuration")
+    parser.add_argument("--audio", default=SAMPLE_AUDIO)
+    parser.add_argument("--script", default=SAMPLE_SCRIPT)
+    parser.add_argument("--max-wer", type=float, default=MAX_WER)
+    parser.add_argument("--models", default=",".join(MODELS), help="e.g. tiny,base")
+    parser.add_argument("--compute-types", default=",".join(COMPUTE_TYPES))
+    args = parser.parse_args()
+
+    if args.make_sample:
+        make_sample(args.audio, args.script)
+    if args.calibrate:
+        calibrate(args.audio, args.script, args.max_wer,
+                  models=[m for m in args.models.split(",") if m],
+                  compute_types=[c for c in args.compute_types.split(",") if c])
+    if args.show or not (args.make_sample or args.calibrate):
+        config = load_config()
+        if config:
+            print(json.dumps({k: v for k, v in config.items() if k != "results"}, indent=2))
+        else:
+            print("ℹ️ No usable whisper_config.json; transcribe.py uses its defaults.")
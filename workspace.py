@@ -0,0 +1,94 @@
+import os
+import time
+import uuid
+import shutil
+import tempfile
+
+# Every pipeline run gets its own workspace: intermediates (narration, clips,
+# mezzanine segments, renders, subtitles, temp audio) live in a private scratch
+# directory on a fast path (tmpfs when available), and only final outputs are
+# written to disk under OUTPUT_ROOT/<job_id>/. Two runs never share a file name,
+# and scratch is removed whether the job succeeds or fails.
+
+OUTPUT_ROOT = os.getenv("OUTPUT_DIR", "outputs")
+SCRATCH_ROOT = os.getenv("SCRATCH_DIR")            # default: /dev/shm if usable, else the temp dir
+MIN_SCRATCH_FREE = 2 * 1024 * 1024 * 1024          # fall back to disk below this much free tmpfs
+KEEP_SCRATCH = os.getenv("KEEP_SCRATCH", "0") == "1"
+
+
+def default_scratch_root():
+    """SCRATCH_DIR, else /dev/shm when it exists, is writable and has room, else the temp dir."""
+    if SCRATCH_ROOT:
+        return SCRATCH_ROOT
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        try:
+            if shutil.disk_usage(shm).free >= MIN_SCRATCH_FREE:
+                return shm
+        except OSError:
+            pass
+    return tempfile.gettempdir()
+
+
+class JobWorkspace:
+    """
+    Paths for one pipeline job.
+
+    Usage:
+        with JobWorkspace() as ws:
+            audio = ws.scratch_path("narration.mp3")
+            final = ws.output_path("final.mp4")
+        # scratch is gone; outputs stay on success and are removed on failure
+    """
+
+    def __init__(self, job_id=None, scratch_root=None, output_root=OUTPUT_ROOT, keep_scratch=KEEP_SCRATCH):
+        self.job_id = job_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        root = scratch_root or default_scratch_root()
+        os.makedirs(root, exist_ok=True)
+        self.scratch = tempfile.mkdtemp(prefix=f"ytjob_{self.job_id}_", dir=root)
+        self.output_dir = os.path.join(output_root, self.job_id)
+        self.keep_scratch = keep_scratch
+        self.closed = False
+
+    def scratch_path(self, name):
+        """Path for an intermediate file (parent directories are created)."""
+        path = os.path.join(self.scratch, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def scratch_dir(self, name):
+        path = os.path.join(self.scratch, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def output_path(self, name):
+        """Path for a final output kept on disk after the job."""
+        path = os.path.join(self.output_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def cleanup(self, success=True):
+        if self.closed:
+            return
+        self.closed = True
+        if self.keep_scratch:
+            print(f"🗂️ Keeping scratch for job {self.job_id}: {self.scratch}")
+        else:
+            shutil.rmtree(self.scratch, ignore_errors=True)
+        if not success:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup(success=exc_type is None)
+        return False
+
+    def __repr__(self):
+        return f"JobWorkspace({self.job_id!r}, scratch={self.scratch!r}, output={self.output_dir!r})"
+
+
+def scratch_path(workspace, name):
+    """`workspace.scratch_path(name)`, or `name` in the current directory without a workspace."""
+    return workspace.scratch_path(name) if workspace else name